@@ -1,175 +1,638 @@
 import streamlit as st
-import firebase_admin
-from firebase_admin import credentials, auth
-import pyrebase
-import google.generativeai as genai
+import html
+import io
+import json
+import os
 import time
+from contextlib import contextmanager
 from streamlit_option_menu import option_menu
-import PyPDF2
-import requests
-from bs4 import BeautifulSoup
+from fake_model import FakeGenerativeModel
+from streaming import StreamStats, stream_response
+from prompts import KNOWLEDGE_BASE, build_role_models, build_turn_prompt, system_instruction_for
+from metrics import Metrics
+from conversation import THINKING_PLACEHOLDER, Conversation, memory_report
 from datetime import datetime, timedelta
+# Heavier modules (Gemini SDK, Firebase SDK, NumPy, asyncio, requests/BeautifulSoup) and the chat-page
+# services are imported only on the code paths that need them, so the login page loads quickly
 
 # ✅ **Set page configuration**
 st.set_page_config(page_title="AI Chatbots", page_icon="🤖", layout="wide")
 
+# ✅ **Model Settings (set backend = "fake" or CHATBOT_FAKE_MODEL=1 to run offline)**
+MODEL_SETTINGS = dict(st.secrets.get("model", {}))
+USE_FAKE_MODEL = os.environ.get("CHATBOT_FAKE_MODEL") == "1" or MODEL_SETTINGS.get("backend") == "fake"
+STREAM_RESPONSES = bool(MODEL_SETTINGS.get("stream", True))
+
+MODEL_NAME = MODEL_SETTINGS.get("name", "gemini-3-flash-preview")
+
+def fake_model_factory(model_name, system_instruction=None):
+    return FakeGenerativeModel(
+        model_name=model_name,
+        system_instruction=system_instruction,
+        first_token_latency=float(MODEL_SETTINGS.get("fake_first_token_seconds", 0.3)),
+        chunk_delay=float(MODEL_SETTINGS.get("fake_chunk_seconds", 0.05)),
+    )
+
 # ✅ **Load API Key from Streamlit Secrets**
-try:
-    API_KEY = st.secrets["api_keys"]["GEMINI_API_KEY"]
-except KeyError:
-    st.error("❌ Missing Gemini API Key in Streamlit secrets!")
-    st.stop()
+if not USE_FAKE_MODEL:
+    try:
+        API_KEY = st.secrets["api_keys"]["GEMINI_API_KEY"]
+    except KeyError:
+        st.error("❌ Missing Gemini API Key in Streamlit secrets!")
+        st.stop()
 
-# ✅ **Initialize Gemini AI**
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel("gemini-3-flash-preview")
-
-# ✅ **School Chatbot System Prompt**
-SCHOOL_SYSTEM_PROMPT = """You are an intelligent and friendly CIT University (Cebu Institute of Technology) Universal Assistant Chatbot.
-
-## Your Role:
-- Provide helpful information about CIT University to students, teachers, and staff
-- Answer questions about programs, admissions, scholarships, and campus life
-- Help with academic matters, assignments, and learning support
-- Assist teachers and staff with school policies, procedures, and administrative matters
-- Maintain a professional and welcoming tone
-- Be adaptive to the user's role (Student, Teacher, or Staff)
-
-## Key Information About CIT University:
-- Location: N. Bacalso Avenue, Cebu City, Philippines
-- Contact: +63 32 411 2000 (trunkline) | info@cit.edu
-- Website: https://cit.edu/
-
-## Programs Offered:
-- Basic Education (Elementary, Junior High School, Senior High School)
-- College of Engineering & Architecture (CEA)
-- College of Computer Studies (CCS)
-- College of Arts, Sciences & Education (CASE)
-- College of Management & Business Administration (CMBA)
-- College of Nursing, Allied Health Studies & Pharmacy (CNAHS)
-- College of Criminal Justice (CCJ)
-
-## Services Available:
-- Enrollment Portal: https://cituweb.pinnacle.com.ph/aims/applicants/
-- WITS (Student Portal): https://student.cituwits.com/
-- Payment Portal: https://cituonlinepayment.powerappsportals.com/Payment-Portal/
-- Scholarships Information: https://cit.edu/scholarships/
-
-## Teacher & Staff Information:
-- Leave Request Procedures: Contact HR Office at +63 32 411 2000
-- Staff Portal: https://student.cituwits.com/ (or contact IT for access)
-- School Policies: Refer to the Faculty Handbook or contact Administration
-- Professional Development: Contact Academic Affairs for training opportunities
-
-## Important Guidelines:
-- Always be helpful, professional, and courteous
-- If you don't have specific information, direct users to contact the appropriate office
-- For Students: Encourage academic success and school involvement
-- For Teachers/Staff: Provide information about policies, procedures, and professional matters
-- Be welcoming and supportive to all users
-- Do not provide false information about programs or policies
-"""
+# ✅ **Initialize Gemini AI once per process (cached resource, shared by all sessions)**
+@st.cache_resource
+def get_model_factory(use_fake_model):
+    if use_fake_model:
+        return fake_model_factory
+    import google.generativeai as genai
 
-# ✅ **Role-Specific System Prompts**
-ROLE_SPECIFIC_PROMPTS = {
-    "Student": """
-## Additional Guidelines for Students:
-- Help with schoolwork, assignments, and academic questions
-- Provide study tips and learning strategies
-- Direct to academic support services
-- Encourage participation in school activities
-- Provide information about student services and resources
-- Help navigate the enrollment and registration process
-""",
-    "Teacher": """
-## Additional Guidelines for Teachers:
-- Provide information about school policies and procedures
-- Help with administrative and classroom management matters
-- Assist with professional development information
-- Provide guidance on leave procedures and HR policies
-- Help with curriculum and teaching resources
-- Support with school events and activities coordination
-""",
-    "Staff": """
-## Additional Guidelines for Staff:
-- Provide information about school administrative procedures
-- Help with HR-related questions and policies
-- Assist with workplace matters and staff services
-- Direct to appropriate departments for specific requests
-- Provide information about staff benefits and opportunities
-- Help with facility and operational matters
-"""
+    genai.configure(api_key=API_KEY)
+    return genai.GenerativeModel
+
+# General-purpose model (e.g. summarization) without the school system instruction
+@st.cache_resource
+def get_base_model(model_name, use_fake_model):
+    return get_model_factory(use_fake_model)(model_name)
+
+# ✅ **One model per role with its static system prompt built once per process**
+@st.cache_resource
+def get_role_models(model_name, use_fake_model):
+    return build_role_models(get_model_factory(use_fake_model), model_name)
+
+# ✅ **Shared model client: concurrency limit, rate limiting, retries, deadlines and request coalescing**
+@st.cache_resource
+def get_model_client():
+    client_settings = dict(st.secrets.get("model_client", {}))
+    return ModelClient(
+        max_concurrency=int(client_settings.get("max_concurrency", 8)),
+        requests_per_second=float(client_settings.get("requests_per_second", 5)),
+        burst=int(client_settings.get("burst", 10)),
+        max_retries=int(client_settings.get("max_retries", 3)),
+        timeout=float(client_settings.get("timeout_seconds", 30)),
+    )
+
+# ✅ **Fair-share scheduler: per-user rate limits, daily token quotas and weighted fair queueing of model calls**
+SCHEDULER_SETTINGS = dict(st.secrets.get("scheduler", {}))
+DEFAULT_DAILY_TOKENS = {"Student": 200_000, "Teacher": 500_000, "Staff": 500_000}
+
+@st.cache_resource
+def get_scheduler():
+    if not SCHEDULER_SETTINGS.get("enabled", True):
+        return None
+    # Counters are per process by default; the Firestore store shares them between replicas
+    if SCHEDULER_SETTINGS.get("backend") == "firestore":
+        init_firebase_admin()
+        store = FirestoreCounterStore()
+    else:
+        store = MemoryCounterStore()
+    daily_tokens = SCHEDULER_SETTINGS.get("daily_tokens", DEFAULT_DAILY_TOKENS)
+    return FairScheduler(
+        store=store,
+        max_concurrent=int(SCHEDULER_SETTINGS.get("max_concurrent", get_model_client().max_concurrency)),
+        user_rate=float(SCHEDULER_SETTINGS.get("user_requests_per_minute", 12)) / 60,
+        user_burst=int(SCHEDULER_SETTINGS.get("user_burst", 5)),
+        max_rate_wait=float(SCHEDULER_SETTINGS.get("max_rate_wait_seconds", 30)),
+        daily_tokens=dict(daily_tokens) if hasattr(daily_tokens, "items") else int(daily_tokens),
+        weights=dict(SCHEDULER_SETTINGS["weights"]) if "weights" in SCHEDULER_SETTINGS else None,
+    )
+
+# ✅ **Hot-path metrics: spans, per-stage histograms and counters (shown on the admin Performance page)**
+METRICS_SETTINGS = dict(st.secrets.get("metrics", {}))
+ADMIN_EMAILS = set(METRICS_SETTINGS.get("admin_emails", []))
+
+@st.cache_resource
+def get_metrics():
+    return Metrics(
+        enabled=bool(METRICS_SETTINGS.get("enabled", True)),
+        window=int(METRICS_SETTINGS.get("window", 1024)),
+    )
+
+metrics = get_metrics()
+
+BUSY_MESSAGE = "⏳ The assistant is handling a lot of requests right now. Please try again in a moment."
+QUEUED_MESSAGE = "⏳ Queued (position {position}). Your question will be answered as soon as it is your turn."
+RATE_LIMITED_MESSAGE = "⏳ You're sending questions quickly. This one will be sent in {seconds:.0f} s."
+
+def quota_message(error):
+    minutes = max(1, round((error.retry_after or 60) / 60))
+    when = f"in about {minutes} minute(s)" if minutes < 120 else f"in about {minutes // 60} hours"
+    return f"🚦 {error} for your account. Please try again {when}."
+
+# Plain dict form of genai.types.GenerationConfig for the strong model tier (avoids importing the SDK at module level)
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": 1024,
+    "top_p": 0.95,
 }
 
+# ✅ **Model Cascade: quick questions go to a light model, complex or document-grounded ones to a stronger one**
+CASCADE_SETTINGS = dict(st.secrets.get("model_cascade", {}))
+
+@st.cache_resource
+def get_cascade_router():
+    # The strong tier is the configured model with the original generation settings
+    strong = DEFAULT_TIERS[-1]._replace(model=MODEL_NAME, **GENERATION_CONFIG)
+    # Off unless configured: the light tier's model may not be available to every API key
+    if not CASCADE_SETTINGS.get("enabled", "tiers" in CASCADE_SETTINGS):
+        return CascadeRouter(tiers=(strong,), thresholds=())
+    default_tiers = (DEFAULT_TIERS[0], strong)
+    tiers = tiers_from_settings(CASCADE_SETTINGS["tiers"], default_tiers) if "tiers" in CASCADE_SETTINGS else default_tiers
+    return CascadeRouter(
+        tiers=tiers,
+        thresholds=tuple(float(threshold) for threshold in CASCADE_SETTINGS.get("thresholds", [0.5])),
+        short_words=int(CASCADE_SETTINGS.get("short_words", 12)),
+        long_words=int(CASCADE_SETTINGS.get("long_words", 60)),
+        role_bias=dict(CASCADE_SETTINGS["role_bias"]) if "role_bias" in CASCADE_SETTINGS else None,
+        escalate=bool(CASCADE_SETTINGS.get("escalate", True)),
+        confidence_window=int(CASCADE_SETTINGS.get("confidence_window_chars", 200)),
+    )
+
+def count_model_route(stats):
+    if stats.model_tier is not None:
+        metrics.inc(f"model_tier_{stats.model_tier}")
+    if stats.escalated:
+        metrics.inc("model_escalations")
+
+# ✅ **Shared News Cache (one per server process, refreshed in the background)**
+@st.cache_resource
+def get_news_cache():
+    news_settings = dict(st.secrets.get("news_cache", {}))
+    cache = NewsCache(
+        url=news_settings.get("url", CIT_NEWS_URL),
+        ttl=float(news_settings.get("ttl_seconds", 600)),
+        max_stale=float(news_settings.get("max_stale_seconds", 86400)),
+        timeout=float(news_settings.get("timeout_seconds", 5)),
+    )
+    cache.refresh_async()  # Warm the cache without blocking the first page load
+    return cache
+
+# ✅ **CIT Website Index (allowlisted pages crawled in the background, searched locally per turn)**
+SITE_SETTINGS = dict(st.secrets.get("site_crawler", {}))
+
+@st.cache_resource
+def get_site_crawler():
+    if not SITE_SETTINGS.get("enabled", True):
+        return None
+    crawler = SiteCrawler(
+        urls=SITE_SETTINGS.get("pages", CIT_SITE_PAGES),
+        index=SiteIndex(SITE_SETTINGS.get("path", "site_index.sqlite3")),
+        max_workers=int(SITE_SETTINGS.get("workers", 4)),
+        min_interval=float(SITE_SETTINGS.get("min_interval_seconds", 1.0)),
+        timeout=float(SITE_SETTINGS.get("timeout_seconds", 10)),
+    )
+    crawler.start(interval=float(SITE_SETTINGS.get("refresh_seconds", 3600)))
+    return crawler
+
+def search_cit_site(user_message):
+    """Top matching CIT web pages from the local index (never makes an HTTP call)."""
+    crawler = get_site_crawler()
+    if crawler is None:
+        return []
+    try:
+        with metrics.span("site_search"):
+            return crawler.index.search(user_message, k=int(SITE_SETTINGS.get("top_k", 3)),
+                                        min_score=float(SITE_SETTINGS.get("min_score", 0.5)))
+    except Exception:
+        return []
+
+# ✅ **Shared PDF Text Cache (keyed by file content, survives reruns and sessions)**
+PDF_SETTINGS = dict(st.secrets.get("pdf_cache", {}))
+
+@st.cache_resource
+def get_pdf_cache():
+    return PdfTextCache(
+        max_bytes=int(PDF_SETTINGS.get("max_megabytes", 64)) * 1024 * 1024,
+        cache_dir=PDF_SETTINGS.get("cache_dir"),
+    )
+
+# ✅ **Shared PDF Extractor: parses uploads on a bounded process pool with per-upload limits**
+@st.cache_resource
+def get_pdf_extractor():
+    return PdfExtractor(
+        max_workers=int(PDF_SETTINGS.get("workers", 2)),
+        pages_per_task=int(PDF_SETTINGS.get("pages_per_task", 16)),
+        max_pages=int(PDF_SETTINGS.get("max_pages_per_upload", 500)),
+        max_bytes=int(PDF_SETTINGS.get("max_megabytes_per_upload", 50)) * 1024 * 1024,
+        timeout=float(PDF_SETTINGS.get("timeout_seconds", 60)),
+        cache=get_pdf_cache(),
+    )
+
+# ✅ **Shared Response Cache for repeated FAQ-style questions**
+@st.cache_resource
+def get_response_cache():
+    cache_settings = dict(st.secrets.get("response_cache", {}))
+    if not cache_settings.get("enabled", True):
+        return None
+    if cache_settings.get("backend") == "sqlite":
+        backend = SQLiteCacheBackend(cache_settings.get("path", "response_cache.sqlite3"))
+    else:
+        backend = MemoryCacheBackend()
+    return ResponseCache(
+        backend=backend,
+        ttl=float(cache_settings.get("ttl_seconds", 3600)),
+        max_entries=int(cache_settings.get("max_entries", 1000)),
+    )
+
+# ✅ **Intent Router: plain CIT fact lookups are answered from the knowledge base without the model**
+@st.cache_resource
+def get_intent_router():
+    kb_settings = dict(st.secrets.get("knowledge_base", {}))
+    if not kb_settings.get("enabled", True):
+        return None
+    return IntentRouter(
+        KNOWLEDGE_BASE,
+        threshold=float(kb_settings.get("threshold", 0.75)),
+        max_facts=int(kb_settings.get("max_facts", 3)),
+    )
+
+def route_intent(user_message, stats=None):
+    """Returns the knowledge-base Route for a question; `answer` is set when no model call is needed"""
+    intent_router = get_intent_router()
+    if intent_router is None:
+        return Route(None, None, [])
+    with metrics.span("intent_routing"):
+        route = intent_router.route(user_message)
+    if route.answer is not None:
+        metrics.inc("kb_answers")
+        if stats is not None:
+            stats.kb_hit = True
+    return route
+
+# ✅ **Chat View Settings**
+CHAT_VIEW_SETTINGS = dict(st.secrets.get("chat_view", {}))
+CHAT_WINDOW_SIZE = int(CHAT_VIEW_SETTINGS.get("window_size", 40))
+SIDEBAR_PREVIEW_MESSAGES = int(CHAT_VIEW_SETTINGS.get("sidebar_preview_messages", 20))
+UNCOMPRESSED_MESSAGES = int(CHAT_VIEW_SETTINGS.get("uncompressed_messages", 20))  # Older messages are compressed
+
+# ✅ **Conversation Memory Settings**
+MEMORY_SETTINGS = dict(st.secrets.get("memory", {}))
+
+# ✅ **Retrieval Settings & PDF Vector Index (one index per set of uploaded files)**
+RETRIEVAL_SETTINGS = dict(st.secrets.get("retrieval", {}))
+
+@st.cache_resource(max_entries=16)
+def get_pdf_index(pdf_versions, _documents):
+    """`pdf_versions` is (digest, extracted page count) per file; `_documents` are ExtractedPdf results."""
+    if RETRIEVAL_SETTINGS.get("embedder") == "gemini":
+        embedder = GeminiEmbedder()
+    else:
+        embedder = HashingEmbedder()
+    return build_index([(document.name, document.pages.text()) for document in _documents], embedder)
+
+def restore_pdf_documents(pdf_refs):
+    """ExtractedPdf results for `[name, digest]` references, from the PDF cache (shared when `cache_dir` is)"""
+    documents = []
+    for name, digest in pdf_refs:
+        pages = get_pdf_cache().get(digest)
+        if pages is not None and len(pages):
+            documents.append(ExtractedPdf(name, digest, pages, "cached"))
+    return documents
+
 def scrape_cit_info():
-    """Scrapes the CIT University website for recent news and updates."""
+    """Returns recent CIT news and updates from the shared cache (never blocks on cit.edu)."""
     try:
-        url = "https://cit.edu/news-and-updates/"
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=5)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Scrapes the first 5 news titles
-            news_items = soup.find_all(['h2', 'h3'], class_="entry-title") 
-            news_list = [item.get_text(strip=True) for item in news_items[:5]]
-            return {"status": "success", "news": news_list}
-            
-        return {"status": "error", "news": []}
+        with metrics.span("news"):
+            return get_news_cache().get()
     except Exception as e:
         return {"status": "error", "message": str(e), "news": []}
     
-# ✅ **Function to generate role-specific response**
-def generate_school_response(user_message, user_role="Student"):
-    """Generate response using role-specific system prompt and school information"""
-    try:
+# ✅ **Function to build the per-turn prompt (static role prompt is the model's system_instruction)**
+def build_school_prompt(user_message, user_role="Student", pdf_context="", history="", stats=None, facts=""):
+    """Combine relevant facts, latest news, PDF excerpts and conversation memory with the user message"""
+    started_at = time.perf_counter()
+
+    with metrics.span("prompt_assembly"):
         # Fetch latest school info
         school_info = scrape_cit_info()
-        
-        # Enhance system prompt with role-specific instructions
-        enhanced_prompt = SCHOOL_SYSTEM_PROMPT
-        if user_role in ROLE_SPECIFIC_PROMPTS:
-            enhanced_prompt += ROLE_SPECIFIC_PROMPTS[user_role]
-        
-        # Add latest news if available
-        if school_info["status"] == "success" and school_info["news"]:
-            enhanced_prompt += "\n\n## Recent News & Updates:\n"
-            for news in school_info["news"]:
-                enhanced_prompt += f"- {news}\n"
-        
-        # Generate response
-        role_context = f"User Role: {user_role}\n\n"
-        full_message = f"{enhanced_prompt}\n\n---\n\n{role_context}{user_role}: {user_message}\nAssistant:"
-        
-        response = model.generate_content(
-            full_message,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.7,
-                max_output_tokens=1024,
-                top_p=0.95,
-            )
+        news = school_info["news"] if school_info["status"] == "success" else []
+        site_pages = search_cit_site(user_message)
+
+        full_message = build_turn_prompt(user_message, user_role, news, pdf_context, history, facts, site_pages)
+    if stats is not None:
+        stats.assembly_seconds = time.perf_counter() - started_at
+        stats.prompt_bytes = len(full_message.encode("utf-8"))
+        stats.prompt_tokens = estimate_tokens(full_message)  # Replaced by the real count when reported
+    return full_message
+
+def get_role_model(user_role, model_name=MODEL_NAME):
+    role_models = get_role_models(model_name, USE_FAKE_MODEL)
+    return get_model_client().bind(role_models.get(user_role, role_models["Student"]))
+
+@contextmanager
+def scheduled_model_call(user_role, full_message, stats, on_queued=None, on_rate_limited=None):
+    """Waits for this user's fair-share model slot; on exit the tokens the call used count toward their quota"""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    queued_at = time.perf_counter()
+    ticket = scheduler.acquire(
+        current_uid(),
+        user_role,
+        cost=estimate_tokens(full_message),
+        timeout=float(SCHEDULER_SETTINGS.get("queue_timeout_seconds", 60)),
+        on_queued=on_queued,
+        on_rate_limited=on_rate_limited,
+    )
+    metrics.observe("queue_wait", time.perf_counter() - queued_at)
+    try:
+        yield
+    finally:
+        output_tokens = stats.output_tokens if stats.output_tokens is not None else stats.characters // 4
+        scheduler.release(ticket, (stats.prompt_tokens or 0) + output_tokens)
+
+def response_cache_version(user_role):
+    """Cached answers are only valid for the same role prompt, news and website snapshot"""
+    crawler = get_site_crawler()
+    site_generation = crawler.index.generation if crawler is not None else None
+    return cache_version(system_instruction_for(user_role), site_generation, *scrape_cit_info()["news"])
+
+# ✅ **Function to generate role-specific response**
+def generate_school_response(user_message, user_role="Student", pdf_context="", history="", stats=None, on_queued=None,
+                             on_rate_limited=None):
+    """Generate response using the role's model, school information, PDF excerpts and history"""
+    stats = stats if stats is not None else StreamStats()
+    try:
+        route = route_intent(user_message, stats)
+        if route.answer is not None:
+            return route.answer
+
+        # Answers grounded in uploaded PDFs or in earlier turns (a follow-up like "and for transferees?") are
+        # specific to this user, so they bypass the cache
+        response_cache = get_response_cache() if not pdf_context and not history else None
+        if response_cache is not None:
+            cache_key_version = response_cache_version(user_role)
+            cached_response = response_cache.lookup(user_role, user_message, cache_key_version)
+            if cached_response is not None:
+                metrics.inc("response_cache_hits")
+                stats.cache_hit = True
+                return cached_response
+            metrics.inc("response_cache_misses")
+
+        full_message = build_school_prompt(
+            user_message, user_role, pdf_context, history, stats, KNOWLEDGE_BASE.render_facts(route.facts)
         )
-        
+
+        def call(tier):
+            with scheduled_model_call(user_role, full_message, stats, on_queued, on_rate_limited):
+                with metrics.span("model_generate"):
+                    response = get_role_model(user_role, tier.model).generate_content(
+                        full_message, generation_config=generation_config(tier)
+                    )
+                stats.record_usage(response)
+            return response
+
+        router = get_cascade_router()
+        response = router.generate(router.classify(user_message, user_role, pdf_context), call, stats)
+        count_model_route(stats)
+        if response_cache is not None and response.text:
+            response_cache.store(user_role, user_message, cache_key_version, response.text)
         return response.text
+    except QuotaExceededError as e:
+        metrics.inc("quota_rejections")
+        return quota_message(e)
+    except ModelBusyError:
+        metrics.inc("model_busy")
+        return BUSY_MESSAGE
     except Exception as e:
+        metrics.inc("model_errors")
         return f"Sorry, I encountered an error: {str(e)}. Please try again."
 
-# ✅ **Initialize Firebase**
-if not firebase_admin._apps:
+# ✅ **Function to stream role-specific response chunk by chunk**
+def stream_school_response(user_message, user_role="Student", pdf_context="", history="", stats=None, cancel_event=None,
+                           on_queued=None, on_rate_limited=None):
+    """Same as generate_school_response, but yields text chunks as the model produces them"""
+    stats = stats if stats is not None else StreamStats()
     try:
+        route = route_intent(user_message, stats)
+        if route.answer is not None:
+            yield route.answer
+            return
+
+        response_cache = get_response_cache() if not pdf_context and not history else None
+        if response_cache is not None:
+            cache_key_version = response_cache_version(user_role)
+            cached_response = response_cache.lookup(user_role, user_message, cache_key_version)
+            if cached_response is not None:
+                metrics.inc("response_cache_hits")
+                stats.cache_hit = True
+                yield cached_response
+                return
+            metrics.inc("response_cache_misses")
+
+        full_message = build_school_prompt(
+            user_message, user_role, pdf_context, history, stats, KNOWLEDGE_BASE.render_facts(route.facts)
+        )
+
+        def open_stream(tier):
+            with scheduled_model_call(user_role, full_message, stats, on_queued, on_rate_limited):
+                yield from stream_response(
+                    get_role_model(user_role, tier.model), full_message, generation_config(tier), cancel_event, stats
+                )
+
+        router = get_cascade_router()
+        bot_response = ""
+        for chunk in router.stream(router.classify(user_message, user_role, pdf_context), open_stream, stats):
+            bot_response += chunk
+            yield chunk
+        count_model_route(stats)
+        metrics.observe("model_first_token", stats.time_to_first_token)
+        metrics.observe("model_stream", stats.total_time)
+
+        # Only complete answers are cached (the loop is not finished if the user pressed Stop)
+        cancelled = stats.cancelled or (cancel_event is not None and cancel_event.is_set())
+        if response_cache is not None and bot_response and not cancelled:
+            response_cache.store(user_role, user_message, cache_key_version, bot_response)
+    except QuotaExceededError as e:
+        metrics.inc("quota_rejections")
+        yield quota_message(e)
+    except ModelBusyError:
+        metrics.inc("model_busy")
+        yield BUSY_MESSAGE
+    except Exception as e:
+        metrics.inc("model_errors")
+        yield f"Sorry, I encountered an error: {str(e)}. Please try again."
+
+# ✅ **Initialize Firebase Admin SDK once per process, on first use**
+@st.cache_resource
+def init_firebase_admin():
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
         firebase_credentials = dict(st.secrets["service_account"])
         cred = credentials.Certificate(firebase_credentials)
         firebase_admin.initialize_app(cred)
-    except Exception as e:
-        st.error(f"🔥 Failed to initialize Firebase Admin SDK: {e}")
+    return firebase_admin.get_app()
+
+# ✅ Load Firebase Web App Config once per process (for authentication via Pyrebase)
+@st.cache_resource
+def get_pyrebase_auth():
+    import pyrebase
 
-# ✅ Load Firebase Web App Config (for authentication via Pyrebase)
-try:
     firebase_config = dict(st.secrets["firebase_config"])
     firebase = pyrebase.initialize_app(firebase_config)
-    auth_pyrebase = firebase.auth()
+    return firebase.auth()
+
+# ✅ **Session Tokens: ID tokens verified locally, refreshed in the background, optional "remember me"**
+AUTH_SETTINGS = dict(st.secrets.get("auth", {}))
+# Cookie carrying the opaque key that resumes a sign-in on any replica; kept out of URLs, and only outlives
+# the browser session with "remember me". It is set from a script, so it cannot be HttpOnly: chat content is
+# HTML-escaped before it is rendered, and the key is replaced each time it resumes a sign-in
+SESSION_COOKIE = "cit_session"
+
+def set_browser_cookie(name, value=None, max_age=None):
+    """Queues a cookie for the browser (`value=None` deletes it); Streamlit itself can only read cookies"""
+    st.session_state.setdefault("_pending_cookies", {})[name] = (value, max_age)
+
+def write_browser_cookies():
+    """Sets the queued cookies from a script in the page, once"""
+    pending = st.session_state.pop("_pending_cookies", None)
+    if not pending:
+        return
+    statements = []
+    for name, (value, max_age) in pending.items():
+        cookie = f"{name}={value or ''}; Path=/; SameSite=Strict"
+        if value is None:
+            cookie += "; Max-Age=0"
+        elif max_age is not None:
+            cookie += f"; Max-Age={int(max_age)}"
+        statements.append(f"document.cookie = {json.dumps(cookie)} + secure;")
+    st.html(
+        "<script>(() => { const secure = location.protocol === 'https:' ? '; Secure' : ''; "
+        + " ".join(statements) + " })();</script>",
+        unsafe_allow_javascript=True,
+    )
+
+@st.cache_resource
+def get_token_manager():
+    """Returns None when the Admin SDK is not configured; sign-in then works as before without token checks."""
+    from session_tokens import MemoryRememberStore, SQLiteRememberStore, TokenManager, TokenVerifier
+
+    if "service_account" not in st.secrets:
+        return None
+    init_firebase_admin()
+    store_path = AUTH_SETTINGS.get("remember_store_path")
+    return TokenManager(
+        TokenVerifier(),
+        refresh=lambda refresh_token: get_pyrebase_auth().refresh(refresh_token),
+        remember_store=SQLiteRememberStore(store_path) if store_path else MemoryRememberStore(),
+        refresh_margin=float(AUTH_SETTINGS.get("refresh_margin_seconds", 300)),
+        idle_timeout=float(AUTH_SETTINGS.get("idle_timeout_seconds", 3600)),
+        max_idle=float(AUTH_SETTINGS.get("max_idle_seconds", 86400)),
+        remember_ttl=float(AUTH_SETTINGS.get("remember_days", 30)) * 86400,
+        session_ttl=float(AUTH_SETTINGS.get("session_ttl_seconds", 86400)),
+    )
+
+# ✅ **Externalized Session State: any replica behind a load balancer can serve a session**
+SESSION_SETTINGS = dict(st.secrets.get("session_store", {}))
+SESSION_PARAM = "sid"  # Query parameter carrying the opaque session id (not a credential: see restore_session_state)
+# Never the login or its tokens: those come back only from the session cookie or a fresh login
+SESSION_KEYS = (
+    "user_role", "previous_user_role", "conversations", "conversation_meta",
+    "current_chat", "conversation_memory", "token_usage", "last_response_timing", "last_pdf_chunk_ids", "pdf_refs",
+    "chat_window", "chat_window_for",
+)
+
+@st.cache_resource
+def get_session_backend():
+    from session_store import MemorySessionBackend, RedisSessionBackend, SQLiteSessionBackend
+
+    # Off unless configured: a process-local copy of every session's chats only helps reloads on one replica
+    backend_name = SESSION_SETTINGS.get("backend", "none")
+    if backend_name == "redis":
+        return RedisSessionBackend(SESSION_SETTINGS.get("url", "redis://localhost:6379/0"))
+    if backend_name == "sqlite":
+        return SQLiteSessionBackend(SESSION_SETTINGS.get("path", "sessions.sqlite3"))
+    if backend_name == "memory":
+        return MemorySessionBackend()
+    return None
+
+def restore_session_state():
+    """Once signed in, loads the state another run (or replica) saved under the session id, if it is this user's"""
+    if "user" not in st.session_state or "_session_sync" in st.session_state or get_session_backend() is None:
+        return
+    from session_store import SessionStateSync
+
+    sync = SessionStateSync(
+        get_session_backend(), SESSION_KEYS, ttl=float(SESSION_SETTINGS.get("ttl_seconds", 86400)),
+        owner=st.session_state["user"]["uid"],
+    )
+    sync.session_id = st.query_params.get(SESSION_PARAM)
+    with metrics.span("session_restore"):
+        sync.restore(st.session_state)
+    # Sessions saved before conversations were Conversation objects hold lists of message dicts
+    if any(isinstance(conversation, list) for conversation in st.session_state.get("conversations", ())):
+        st.session_state.conversations = [
+            conversation if isinstance(conversation, Conversation) else Conversation(conversation)
+            for conversation in st.session_state.conversations
+        ]
+    st.session_state["_session_sync"] = sync
+
+def save_session_state():
+    """Persists the keys that changed in this run; called at the end of the script and before rerun/stop"""
+    sync = st.session_state.get("_session_sync")
+    if sync is None:
+        return
+    if sync.session_id is None:
+        if "user" not in st.session_state:
+            return  # Nothing worth keeping before login
+        from session_store import new_session_id
+
+        sync.session_id = new_session_id()
+        st.query_params[SESSION_PARAM] = sync.session_id
+    with metrics.span("session_save"):
+        sync.save(st.session_state)
+
+def rerun():
+    save_session_state()
+    st.rerun()
+
+def stop():
+    save_session_state()
+    st.stop()
+
+def sign_out():
+    token_manager = get_token_manager()
+    if token_manager is not None and "auth_session" in st.session_state:
+        token_manager.sign_out(st.session_state["auth_session"])
+    for key in ("user", "auth_session", "conversations", "conversation_meta", "current_chat",
+                "conversation_memory", "pdf_refs"):
+        st.session_state.pop(key, None)
+    set_browser_cookie(SESSION_COOKIE)
+    if st.session_state.get("_session_sync") is not None:
+        st.session_state.pop("_session_sync").clear()
+    st.query_params.pop(SESSION_PARAM, None)
+
+# Re-check the session's token (a cache lookup), or resume a sign-in from the session cookie
+try:
+    token_manager = get_token_manager()
 except Exception as e:
-    st.error(f"❌ Failed to initialize Firebase Web SDK: {e}")
+    token_manager = None
+    st.error(f"🔥 Failed to initialize Firebase Admin SDK: {e}")
+if token_manager is not None:
+    if "auth_session" in st.session_state:
+        if token_manager.current(st.session_state["auth_session"]) is None:
+            sign_out()
+            st.warning("⚠️ Your session expired. Please log in again.")
+    elif "user" not in st.session_state and "_cookie_checked" not in st.session_state:
+        # Signed in on another replica or remembered. Cookies are read once per browser session, so a key
+        # deleted on sign-out is not tried again
+        st.session_state["_cookie_checked"] = True
+        session_key = st.context.cookies.get(SESSION_COOKIE)
+        if session_key:
+            session, session_key = token_manager.resume(session_key)
+            if session is not None:
+                st.session_state["user"] = {"email": session.email, "uid": session.uid}
+                st.session_state["auth_session"] = session.id
+                set_browser_cookie(SESSION_COOKIE, session_key,
+                                   session.remember_until - time.time() if session.remember else None)
+            else:
+                set_browser_cookie(SESSION_COOKIE)
+write_browser_cookies()
+restore_session_state()
 
 # ✅ **Sidebar Navigation**
 if "user" not in st.session_state:
@@ -184,6 +647,11 @@ if "user" not in st.session_state:
 
 # ✅ **Handle Authentication**
 if "user" not in st.session_state:
+    try:
+        auth_pyrebase = get_pyrebase_auth()
+    except Exception as e:
+        st.error(f"❌ Failed to initialize Firebase Web SDK: {e}")
+
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
@@ -192,16 +660,23 @@ if "user" not in st.session_state:
             with st.form("Login Form", clear_on_submit=False):
                 email = st.text_input("Email", placeholder="Enter your email")
                 password = st.text_input("Password", placeholder="Enter your password", type="password")
+                remember_me = st.checkbox("Remember me", disabled=token_manager is None)
                 login_submit = st.form_submit_button("Login")
                 
                 if login_submit:
                     try:
                         user = auth_pyrebase.sign_in_with_email_and_password(email, password)
                         if "idToken" in user:
+                            if token_manager is not None:
+                                session, session_key = token_manager.sign_in(user, remember=remember_me)
+                                st.session_state["auth_session"] = session.id
+                                set_browser_cookie(SESSION_COOKIE, session_key,
+                                                   token_manager.remember_ttl if remember_me else None)
+                            # Only a sign-in whose token verified counts as logged in
                             st.session_state["user"] = {"email": email, "uid": user["localId"]}
                             st.success(f"✅ Logged in as {email}")
                             time.sleep(1)
-                            st.rerun()
+                            rerun()
                         else:
                             st.error("❌ Authentication failed. Please try again.")
                     except Exception as e:
@@ -237,24 +712,202 @@ if "user" not in st.session_state:
                 
                 if reset_submit:
                     try:
-                        # Check if email exists
-                        auth.get_user_by_email(email)
+                        # Firebase reports unknown emails itself, so no separate Admin SDK lookup is needed
                         auth_pyrebase.send_password_reset_email(email)
                         st.success(f"✅ Password reset email sent to **{email}**. Check your inbox!")
-                    except firebase_admin.auth.UserNotFoundError:
-                        st.error("❌ No user found with this email. Please register first.")
                     except Exception as e:
-                        st.error(f"❌ Failed to send reset email: {str(e)}")
+                        if "email_not_found" in str(e).lower():
+                            st.error("❌ No user found with this email. Please register first.")
+                        else:
+                            st.error(f"❌ Failed to send reset email: {str(e)}")
     st.stop()
 
 
+# ✅ **Chat-page imports (never loaded on the login page)**
+from pdf_cache import ExtractedPdf, PdfExtractor, PdfTextCache
+from model_client import ModelBusyError, ModelClient
+from model_router import DEFAULT_TIERS, CascadeRouter, generation_config, tiers_from_settings
+from fair_scheduler import FairScheduler, FirestoreCounterStore, MemoryCounterStore, QuotaExceededError
+from history_store import FirestoreHistoryStore, SQLiteHistoryStore, WriteBehindHistoryStore
+from news_cache import CIT_NEWS_URL, NewsCache
+from retrieval import GeminiEmbedder, HashingEmbedder, build_index, estimate_tokens, select_context
+from conversation_memory import ConversationMemory, ModelSummarizer
+from response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend, cache_version
+from knowledge_base import IntentRouter, Route
+from site_index import CIT_SITE_PAGES, SiteCrawler, SiteIndex
+
+# ✅ **Persistent Chat History (Firestore by default, SQLite for local/offline use)**
+HISTORY_SETTINGS = dict(st.secrets.get("history_store", {}))
+HISTORY_MEMORY_WINDOW = int(HISTORY_SETTINGS.get("memory_window", 200))  # Messages kept in session memory per chat
+HISTORY_PAGE_SIZE = int(HISTORY_SETTINGS.get("page_size", 50))
+
+@st.cache_resource
+def get_history_store():
+    backend_name = HISTORY_SETTINGS.get("backend", "firestore" if "service_account" in st.secrets else "none")
+    if backend_name == "firestore":
+        init_firebase_admin()
+        backend = FirestoreHistoryStore()
+    elif backend_name == "sqlite":
+        backend = SQLiteHistoryStore(HISTORY_SETTINGS.get("path", "chat_history.sqlite3"))
+    else:
+        return None
+    return WriteBehindHistoryStore(
+        backend,
+        batch_size=int(HISTORY_SETTINGS.get("batch_size", 100)),
+        flush_interval=float(HISTORY_SETTINGS.get("flush_interval_seconds", 1.0)),
+        retry_delay=float(HISTORY_SETTINGS.get("retry_delay_seconds", 1.0)),
+        max_retry_delay=float(HISTORY_SETTINGS.get("max_retry_delay_seconds", 60.0)),
+        max_retries=int(HISTORY_SETTINGS.get("max_retries", 8)),
+    )
+
+def current_uid():
+    return st.session_state["user"]["uid"]
+
+def new_conversation_meta():
+    # "offset" is the sequence number of the first message held in memory
+    return {"id": None, "offset": 0, "loaded": True}
+
+def new_conversation(records=()):
+    return Conversation(records, hot_messages=UNCOMPRESSED_MESSAGES)
+
+def init_conversations():
+    """Start with the user's most recent stored conversations (metadata only, messages load on open)"""
+    st.session_state.conversations = [new_conversation()]
+    st.session_state.conversation_meta = [new_conversation_meta()]
+    st.session_state.current_chat = 0
+    history_store = get_history_store()
+    if history_store is None:
+        return
+    try:
+        stored = history_store.list_conversations(current_uid(), int(HISTORY_SETTINGS.get("max_conversations", 20)))
+    except Exception as e:
+        st.warning(f"⚠️ Could not load chat history: {e}")
+        return
+    if stored:
+        st.session_state.conversations = [new_conversation() for _ in stored]
+        st.session_state.conversation_meta = [
+            {"id": conv["id"], "offset": conv["message_count"], "loaded": False} for conv in stored
+        ]
+        ensure_conversation_loaded(0)
+
+def ensure_conversation_loaded(i):
+    meta = st.session_state.conversation_meta[i]
+    if meta["loaded"]:
+        return
+    messages, first_seq = get_history_store().load_messages(current_uid(), meta["id"], HISTORY_PAGE_SIZE)
+    st.session_state.conversations[i] = new_conversation(messages)
+    meta.update(offset=first_seq, loaded=True)
+
+def load_older_from_store(i):
+    """Prepend the previous page of messages using the stored sequence number as cursor"""
+    meta = st.session_state.conversation_meta[i]
+    history_store = get_history_store()
+    if history_store is None or meta["id"] is None or meta["offset"] == 0:
+        return 0
+    messages, first_seq = history_store.load_messages(current_uid(), meta["id"], HISTORY_PAGE_SIZE, meta["offset"])
+    st.session_state.conversations[i].prepend(messages)
+    meta["offset"] = first_seq
+    return len(messages)
+
+def persist_message(i, msg):
+    """Append-only write of the conversation's latest message (queued, written in batches)"""
+    history_store = get_history_store()
+    if history_store is None:
+        return
+    meta = st.session_state.conversation_meta[i]
+    conversation = st.session_state.conversations[i]
+    if meta["id"] is None:
+        meta["id"] = history_store.create_conversation(current_uid(), st.session_state.get("user_role"))
+    history_store.append(current_uid(), meta["id"], meta["offset"] + len(conversation) - 1, msg.role, msg.content)
+
+    # Stored messages can be paged back in, so only a bounded window stays in session memory
+    if len(conversation) > HISTORY_MEMORY_WINDOW:
+        dropped = len(conversation) - HISTORY_MEMORY_WINDOW
+        del conversation[:dropped]
+        meta["offset"] += dropped
+
+def start_new_chat():
+    st.session_state.conversations.append(new_conversation())
+    st.session_state.conversation_meta.append(new_conversation_meta())
+    st.session_state.current_chat = len(st.session_state.conversations) - 1
+
+def delete_chat(i):
+    history_store = get_history_store()
+    conversation_id = st.session_state.conversation_meta[i]["id"]
+    if history_store is not None and conversation_id is not None:
+        history_store.delete_conversation(current_uid(), conversation_id)
+    del st.session_state.conversations[i]
+    del st.session_state.conversation_meta[i]
+
+    if not st.session_state.conversations:
+        st.session_state.conversations = [new_conversation()]
+        st.session_state.conversation_meta = [new_conversation_meta()]
+        st.session_state.current_chat = 0
+    elif st.session_state.current_chat >= len(st.session_state.conversations):
+        st.session_state.current_chat = len(st.session_state.conversations) - 1
+    elif i < st.session_state.current_chat:
+        st.session_state.current_chat -= 1
+
+def import_chat():
+    """Adds an uploaded JSON Lines export as a new chat, reading it line by line"""
+    uploaded = st.session_state.get("chat_import")
+    if uploaded is None:
+        return
+    lines = io.TextIOWrapper(uploaded, encoding="utf-8")
+    try:
+        imported = Conversation.from_jsonl(lines, hot_messages=UNCOMPRESSED_MESSAGES)
+    except ValueError as e:
+        st.session_state.chat_import_error = f"⚠️ Could not import {uploaded.name}: {e}"
+        return
+    finally:
+        lines.detach()
+    start_new_chat()
+    i = st.session_state.current_chat
+    conversation = st.session_state.conversations[i]
+    for msg in imported:
+        persist_message(i, conversation.append(msg.role, msg.content))
+
+def clear_all_chats():
+    history_store = get_history_store()
+    if history_store is not None:
+        history_store.delete_all(current_uid())
+    st.session_state.conversations = [new_conversation()]  # Ensure at least one empty conversation exists
+    st.session_state.conversation_meta = [new_conversation_meta()]
+    st.session_state.current_chat = 0  # Reset index to avoid out-of-range errors
+
+# Sidebar captions that change with every turn are drawn into placeholders, so a turn can update them in place
+def show_message_count(slot, i):
+    slot.caption(f"{st.session_state.conversation_meta[i]['offset'] + len(st.session_state.conversations[i])} message(s)")
+
+def show_memory_report(slot):
+    # Memory held by this session's chats, from each conversation's running totals
+    report = memory_report(st.session_state.conversations)
+    slot.caption(
+        f"💾 {report['messages']} message(s) in {report['conversations']} chat(s): "
+        f"{report['compact_bytes'] / 1024:,.1f} KiB in memory vs {report['dict_bytes'] / 1024:,.1f} KiB as plain "
+        f"dicts ({report['saved']:.0%} saved, {report['compressed']} compressed)"
+    )
+
 # ✅ **If Logged In, Show Chatbot**
 with st.sidebar:
     # Ensure chat state exists before role-switch logic
-    if "conversations" not in st.session_state:
-        st.session_state.conversations = [[]]
+    if "conversations" not in st.session_state or "conversation_meta" not in st.session_state:
+        init_conversations()
     if "current_chat" not in st.session_state:
         st.session_state.current_chat = 0
+    ensure_conversation_loaded(st.session_state.current_chat)
+
+    # ✅ **Admin Navigation (Performance dashboard)**
+    page = "Chat"
+    if st.session_state["user"]["email"] in ADMIN_EMAILS:
+        page = option_menu(
+            menu_title="Navigation",
+            options=["Chat", "Performance"],
+            icons=["chat-dots", "speedometer2"],
+            menu_icon="list",
+            default_index=0,
+            key="admin_navigation",
+        )
 
     # ✅ **User Role Selection (Appears Right After Login)**
     st.markdown("## 👤 Select Your Role")
@@ -272,19 +925,12 @@ with st.sidebar:
 
     # Start a fresh chat when role changes, while keeping old chat in history
     if user_role != st.session_state.previous_user_role:
-        current_conversation = st.session_state.conversations[st.session_state.current_chat]
-        has_real_messages = any(
-            str(msg.get("content", "")).strip() and str(msg.get("content", "")).strip() != "🤖 Thinking..."
-            for msg in current_conversation
-        )
-
-        # Only save/start a new chat if there is an actual conversation
-        if has_real_messages:
-            st.session_state.conversations.append([])
-            st.session_state.current_chat = len(st.session_state.conversations) - 1
+        # Only save/start a new chat if there is an actual conversation (a running count, no rescan)
+        if st.session_state.conversations[st.session_state.current_chat].has_real_messages:
+            start_new_chat()
         st.session_state.previous_user_role = user_role
         st.session_state.user_role = user_role
-        st.rerun()
+        rerun()
 
     st.session_state.user_role = user_role
     
@@ -298,30 +944,82 @@ with st.sidebar:
     st.markdown("## 📂 Upload PDF for Context")
     uploaded_pdfs = st.file_uploader("Upload PDFs", type=["pdf"], accept_multiple_files=True)
 
-    pdf_text = ""
+    pdf_index = None
+    pdf_documents = []
 
     if uploaded_pdfs:
-        def extract_text_from_pdfs(pdf_files):
-            """Extract and combine text from multiple uploaded PDF file"""
-            combined_text = ""
-            for pdf_file in pdf_files:
-                pdf_reader = PyPDF2.PdfReader(pdf_file)
-                text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-                combined_text += f"\n\n--- Extracted from {pdf_file.name} ---\n{text}"
-            return combined_text.strip()
-
-        pdf_text = extract_text_from_pdfs(uploaded_pdfs)
-        st.success(f"📄 {len(uploaded_pdfs)} PDF(s) uploaded and processed!")
+        # New files are parsed on the process pool; already-seen files come straight from the cache
+        progress_slot = st.empty()
+
+        def report_progress(pages_done, pages_total):
+            progress_slot.progress(
+                pages_done / pages_total if pages_total else 1.0,
+                text=f"📄 Reading PDFs... {pages_done}/{pages_total} pages",
+            )
+
+        pdf_extractor = get_pdf_extractor()
+        with metrics.span("pdf_extract"):
+            # Truncated results come from the cache too; a file is only parsed again when the user asks
+            extracted_pdfs = pdf_extractor.extract(uploaded_pdfs, report_progress,
+                                                   reparse=st.session_state.pop("pdf_reparse", ()))
+        progress_slot.empty()
+
+        for document in {document.digest: document for document in extracted_pdfs}.values():
+            if document.status == "skipped":
+                st.warning(f"⚠️ {document.name} was skipped (unreadable or over the upload size limit).")
+            elif document.pages.truncated:
+                st.warning(f"⚠️ Only {len(document.pages)} of {document.pages.total_pages} pages of "
+                           f"{document.name} were read (page or time limit reached).")
+                if pdf_extractor.stopped_early(document.pages) and st.button(
+                        f"🔄 Read {document.name} again", key=f"pdf_reparse_{document.digest}"):
+                    st.session_state.pdf_reparse = [document.digest]
+                    rerun()
+
+        # A file uploaded twice is parsed once by the extractor and indexed once here
+        unique_documents = {}
+        for document in extracted_pdfs:
+            if len(document.pages):
+                unique_documents.setdefault(document.digest, document)
+        pdf_documents = list(unique_documents.values())
+        # The session only references extracted text by content hash; the pages stay in the PDF cache
+        st.session_state.pdf_refs = [[document.name, document.digest] for document in pdf_documents]
+        st.session_state.pdf_uploaded_here = True
+        if pdf_documents:
+            st.success(f"📄 {len(pdf_documents)} PDF(s) uploaded and processed!")
+    elif st.session_state.get("pdf_uploaded_here"):
+        st.session_state.pdf_refs = []  # The files were removed from the uploader
+    elif st.session_state.get("pdf_refs"):
+        # The session moved here from another replica, whose uploader widget held the files
+        pdf_documents = restore_pdf_documents(st.session_state.pdf_refs)
+        if pdf_documents:
+            st.caption(f"📄 Using {len(pdf_documents)} PDF(s) uploaded earlier in this session")
+
+    if pdf_documents:
+        with metrics.span("pdf_index"):
+            pdf_index = get_pdf_index(
+                tuple((document.digest, len(document.pages)) for document in pdf_documents),
+                pdf_documents,
+            )
+
+        # Debug view of the chunks that were sent with the last answer
+        if st.session_state.get("last_pdf_chunk_ids"):
+            with st.expander("🔎 PDF context used in last answer"):
+                st.write(", ".join(st.session_state.last_pdf_chunk_ids))
 
     # ✅ **New Chat & Chat History**
     st.markdown("## 💬 Chat")
     if st.button("+ New Chat"):
-        st.session_state.conversations.append([])
-        st.session_state.current_chat = len(st.session_state.conversations) - 1
-        st.rerun()
+        start_new_chat()
+        rerun()
 
     # **Display Chat History**
     st.markdown("### Chat History")
+    if get_history_store() is not None and get_history_store().last_error is not None:
+        st.warning(f"⚠️ Chat history is not being saved right now ({get_history_store().last_error}). "
+                   "New messages are kept and will be saved once the store is reachable again.")
+    failed_writes = get_history_store().failed_writes(current_uid()) if get_history_store() is not None else []
+    if failed_writes:
+        st.warning(f"⚠️ {len(failed_writes)} chat history change(s) could not be saved ({failed_writes[-1][1]}).")
     for i, conv in enumerate(st.session_state.conversations):
         is_active_chat = i == st.session_state.current_chat
         conversation_label = f"Conversation {i+1}"
@@ -331,38 +1029,85 @@ with st.sidebar:
         with st.expander(conversation_label, expanded=is_active_chat):
             if st.button("Open", key=f"open_{i}", disabled=is_active_chat):
                 st.session_state.current_chat = i
-                st.rerun()
+                rerun()
 
-            for msg in conv:
-                role = "🧑" if msg["role"] == "user" else "🤖"
-                st.write(f"{role} {msg['content']}")
+            # Messages are only rendered on demand; the active chat is already shown in the main area
+            message_count = st.session_state.conversation_meta[i]["offset"] + len(conv)
+            message_count_slot = st.empty()
+            show_message_count(message_count_slot, i)
+            if is_active_chat:
+                active_message_count_slot = message_count_slot
+            if not is_active_chat and message_count and st.toggle("Show messages", key=f"show_{i}"):
+                ensure_conversation_loaded(i)
+                for msg in st.session_state.conversations[i][-SIDEBAR_PREVIEW_MESSAGES:]:
+                    role = "🧑" if msg.role == "user" else "🤖"
+                    st.write(f"{role} {msg.content}")
             if st.button("🗑 Delete", key=f"delete_{i}"):
-                del st.session_state.conversations[i]
+                delete_chat(i)
+                rerun()
 
-                if not st.session_state.conversations:
-                    st.session_state.conversations = [[]]
-                    st.session_state.current_chat = 0
-                elif st.session_state.current_chat >= len(st.session_state.conversations):
-                    st.session_state.current_chat = len(st.session_state.conversations) - 1
-                elif i < st.session_state.current_chat:
-                    st.session_state.current_chat -= 1
+    if st.button("🗑 Clear All Chats"):
+        clear_all_chats()
+        rerun()
 
-                st.rerun()
+    # Export/import one chat as JSON Lines; the export is only built when the button is clicked
+    active_conversation = st.session_state.conversations[st.session_state.current_chat]
+    st.download_button(
+        "⬇ Export active chat (.jsonl)", data=active_conversation.to_jsonl, file_name="cit_chat.jsonl",
+        mime="application/jsonl", on_click="ignore", disabled=not active_conversation,
+    )
+    st.file_uploader("Import a chat (.jsonl)", type=["jsonl"], key="chat_import", on_change=import_chat)
+    if "chat_import_error" in st.session_state:
+        st.warning(st.session_state.pop("chat_import_error"))
 
-    if st.button("🗑 Clear All Chats"):
-        st.session_state.conversations = [[]]  # Ensure at least one empty conversation exists
-        st.session_state.current_chat = 0  # Reset index to avoid out-of-range errors
-        st.rerun()
+    memory_report_slot = st.empty()
+    show_memory_report(memory_report_slot)
 
 
     # ✅ **Move "Logged in as" & Logout to the Bottom**
     st.markdown("---")  # Separator for clarity
     st.write(f"✅ Logged in as: **{st.session_state['user']['email']}**")
     if st.button("Logout"):
-        st.session_state.pop("user", None)
+        sign_out()
         st.success("Logged out successfully!")
         time.sleep(1)
-        st.rerun()
+        rerun()
+
+# ✅ **Performance Page (admins only): per-stage latency percentiles and counters**
+def display_performance_page():
+    st.title("📈 Performance")
+    if not metrics.enabled:
+        st.info("Metrics are disabled. Set `enabled = true` under `[metrics]` in the Streamlit secrets.")
+        return
+    summary = metrics.summary()
+    st.markdown("#### Latency per stage (ms, over the last "
+                f"{metrics.window} samples per stage)")
+    st.dataframe(
+        [
+            {
+                "stage": stage,
+                "count": row["count"],
+                "mean": round(row["mean"] * 1000, 1),
+                "p50": round(row["p50"] * 1000, 1),
+                "p95": round(row["p95"] * 1000, 1),
+                "p99": round(row["p99"] * 1000, 1),
+            }
+            for stage, row in summary["stages"].items()
+        ],
+        hide_index=True,
+        width="stretch",
+    )
+    st.markdown("#### Counters")
+    counter_columns = st.columns(4)
+    for i, (counter, value) in enumerate(summary["counters"].items()):
+        counter_columns[i % 4].metric(counter.replace("_", " "), f"{value:,}")
+    with st.expander("Prometheus text format"):
+        st.code(metrics.to_prometheus(), language="text")
+    st.download_button("Download JSON", metrics.to_json(), file_name="chatbot_metrics.json", mime="application/json")
+
+if page == "Performance":
+    display_performance_page()
+    stop()
 
 # ✅ Display logo and welcome message in the perfect center
 role_emoji = {"Student": "🎓", "Teacher": "👨‍🏫", "Staff": "👔"}
@@ -381,20 +1126,14 @@ st.markdown(
 )
 
 # ✅ **Chatbot Interface**
-if "conversations" not in st.session_state:
-    st.session_state.conversations = [[]]  
+# Conversation memory state per chat and per-turn token usage
+if "conversation_memory" not in st.session_state:
+    st.session_state.conversation_memory = {}
+if "token_usage" not in st.session_state:
+    st.session_state.token_usage = []
 
-if "current_chat" not in st.session_state:
-    st.session_state.current_chat = 0
-
-# ✅ **Display Chat History with Styling**
-chat_history_placeholder = st.empty()
-
-def display_chat_history():
-    chat_history_placeholder.empty()  # Clear before rendering
-
-    with chat_history_placeholder.container():
-        st.markdown("""
+# ✅ **Chat Styling (emitted once per run, outside the message list)**
+CHAT_CSS = """
     <style>
     /* Chat Bubble Styles */
     .chat-bubble {
@@ -453,65 +1192,215 @@ def display_chat_history():
         padding-bottom: 10px; /* Add space between input and chat */
     }
     </style>
-""", unsafe_allow_html=True)
-
+"""
+st.markdown(CHAT_CSS, unsafe_allow_html=True)
 
-        for msg in st.session_state.conversations[st.session_state.current_chat]:
-            role = msg["role"]
-            message_content = msg["content"]
+# ✅ **Windowed Chat History: only the last N messages, with "load older" paging**
+if st.session_state.get("chat_window_for") != st.session_state.current_chat:
+    st.session_state.chat_window_for = st.session_state.current_chat
+    st.session_state.chat_window = CHAT_WINDOW_SIZE
 
-            if role == "user":
-                st.markdown(f"""
-                <div class="chat-container">
-                    <div class="chat-bubble user-bubble">{message_content}</div>
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
+def chat_bubble_html(role, message_content):
+    # Messages are user and model text, never markup: escaped so they cannot run script in the page
+    bubble_class = "user-bubble" if role == "user" else "bot-bubble"
+    return f"""
                 <div class="chat-container">
-                    <div class="chat-bubble bot-bubble">{message_content}</div>
+                    <div class="chat-bubble {bubble_class}">{html.escape(message_content)}</div>
                 </div>
-                """, unsafe_allow_html=True)
+                """
+
+def render_chat_bubble(role, message_content):
+    """Append one bubble to the current container and return its slot so it can be updated in place"""
+    bubble = st.empty()
+    bubble.markdown(chat_bubble_html(role, message_content), unsafe_allow_html=True)
+    return bubble
+
+def load_older_messages():
+    st.session_state.chat_window += CHAT_WINDOW_SIZE
+    # Page older messages in from the history store once the in-memory ones are all visible
+    conversation = st.session_state.conversations[st.session_state.current_chat]
+    if st.session_state.chat_window > len(conversation):
+        load_older_from_store(st.session_state.current_chat)
+
+def display_chat_history():
+    """Render the visible window of the active conversation into a container that new bubbles can be appended to"""
+    conversation = st.session_state.conversations[st.session_state.current_chat]
+    hidden_messages = max(0, len(conversation) - st.session_state.chat_window)
+    stored_messages = st.session_state.conversation_meta[st.session_state.current_chat]["offset"]
+    if hidden_messages or stored_messages:
+        st.button(f"⬆ Load older messages ({hidden_messages + stored_messages} hidden)", on_click=load_older_messages)
+
+    chat_container = st.container()
+    with chat_container:
+        for msg in conversation[hidden_messages:]:
+            render_chat_bubble(msg.role, msg.content)
+    return chat_container
 
 
 # ✅ **Call function to display chat history**
-display_chat_history()
+with metrics.span("render_history"):
+    chat_container = display_chat_history()
+
+# Timing of the last streamed reply (first token vs. full answer), its prompt size and cache counters
+turn_stats_placeholder = st.empty()
+
+def display_turn_stats():
+    with turn_stats_placeholder.container():
+        if st.session_state.get("last_response_timing"):
+            timing = st.session_state.last_response_timing
+            st.caption(f"⏱ First token in {timing['first_token']:.2f} s · full reply in {timing['total']:.2f} s")
+        if st.session_state.token_usage and not st.session_state.token_usage[-1]["cache_hit"] \
+                and not st.session_state.token_usage[-1].get("kb_hit"):
+            usage = st.session_state.token_usage[-1]
+            st.caption(
+                f"🧮 Prompt tokens: {usage['prompt_tokens']} (history: {usage['history_tokens']}) · "
+                f"{usage['prompt_bytes']:,} bytes sent · assembled in {usage['assembly_ms']:.1f} ms"
+            )
+            if usage.get("model_tier"):
+                st.caption(f"🧭 Answered by the {usage['model_tier']} model"
+                           + (" after escalating a low-confidence draft" if usage.get("escalated") else ""))
+        if get_response_cache() is not None:
+            cache_stats = get_response_cache().stats
+            last_turn_cached = bool(st.session_state.token_usage) and st.session_state.token_usage[-1].get("cache_hit")
+            st.caption(
+                f"⚡ Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses"
+                + (" · last answer served from cache" if last_turn_cached else "")
+            )
+        scheduler = get_scheduler()
+        if scheduler is not None:
+            quota = scheduler.quota_for(st.session_state.user_role)
+            st.caption(
+                f"🎟 Tokens used today: {scheduler.usage(current_uid()):,.0f}" + (f" of {quota:,}" if quota else "")
+            )
+        if st.session_state.token_usage and st.session_state.token_usage[-1].get("kb_hit"):
+            st.caption(f"📚 Last answer served from the CIT knowledge base (v{KNOWLEDGE_BASE.version})")
+
+display_turn_stats()
 
+def stop_generation():
+    """Keep whatever was streamed so far when the user presses Stop"""
+    conversation = st.session_state.conversations[st.session_state.current_chat]
+    if conversation and conversation[-1].role == "assistant":
+        if conversation[-1].is_placeholder:
+            conversation.update(conversation[-1], "⏹ Generation stopped.")
+        else:
+            conversation.update(conversation[-1], conversation[-1].content + " ⏹")
+        persist_message(st.session_state.current_chat, conversation[-1])
 
 # **User Input**
 user_input = st.chat_input("Ask anything...")
 
 if user_input:
-    # Append user message to session state
-    st.session_state.conversations[st.session_state.current_chat].append({"role": "user", "content": user_input})
-    display_chat_history()
+    turn_started_at = time.perf_counter()
+    current_conversation = st.session_state.conversations[st.session_state.current_chat]
+    is_first_message = not current_conversation
+
+    # Append user message to session state and only its bubble to the page
+    persist_message(st.session_state.current_chat, current_conversation.append("user", user_input))
     
     # Append temporary bot response (spinner)
-    temp_bot_msg = {"role": "assistant", "content": "🤖 Thinking..."}
-    st.session_state.conversations[st.session_state.current_chat].append(temp_bot_msg)
-    display_chat_history()
-
-    # Construct conversation history for AI
-    conversation_history = "\n".join(
-        [f"User: {msg['content']}" if msg["role"] == "user" else msg['content']
-         for msg in st.session_state.conversations[st.session_state.current_chat]]
-    )
+    temp_bot_msg = current_conversation.append("assistant", THINKING_PLACEHOLDER)
+    with chat_container:
+        render_chat_bubble("user", user_input)
+        bot_bubble = render_chat_bubble("assistant", temp_bot_msg.content)
 
-    # Prepare the prompt with context
-    prompt = f"{conversation_history}\n\nUser: {user_input}"
-    if pdf_text:
-        prompt = f"Based on the following extracted information from uploaded PDFs:\n\n{pdf_text}\n\n{prompt}"
+    # Build bounded conversation memory: recent turns verbatim + running summary of older ones
+    memory = ConversationMemory(
+        recent_messages=int(MEMORY_SETTINGS.get("recent_messages", 6)),
+        token_budget=int(MEMORY_SETTINGS.get("token_budget", 1200)),
+        summary_budget=int(MEMORY_SETTINGS.get("summary_budget", 400)),
+        summarizer=ModelSummarizer(get_model_client().bind(get_base_model(MODEL_NAME, USE_FAKE_MODEL))) if MEMORY_SETTINGS.get("summarizer") == "model" else None,
+    ).load_state(st.session_state.conversation_memory.get(st.session_state.current_chat))
+    current_meta = st.session_state.conversation_meta[st.session_state.current_chat]
+    with metrics.span("memory"):
+        conversation_history, history_tokens = memory.context(
+            current_conversation[:-2], offset=current_meta["offset"], anchor=current_meta["id"]  # Exclude this turn
+        )
+    st.session_state.conversation_memory[st.session_state.current_chat] = memory.to_state()
+
+    # Select only the top-k relevant PDF chunks that fit the token budget
+    pdf_context = ""
+    st.session_state.last_pdf_chunk_ids = []
+    if pdf_index is not None:
+        with metrics.span("retrieval"):
+            pdf_context, st.session_state.last_pdf_chunk_ids = select_context(
+                pdf_index,
+                user_input,
+                k=int(RETRIEVAL_SETTINGS.get("top_k", 5)),
+                token_budget=int(RETRIEVAL_SETTINGS.get("token_budget", 1500)),
+            )
+
+    def show_queue_position(position):
+        """Shown in place of the spinner while other users' requests are ahead of this one"""
+        bot_bubble.markdown(chat_bubble_html("assistant", QUEUED_MESSAGE.format(position=position)), unsafe_allow_html=True)
+
+    def show_rate_limit_wait(seconds):
+        """Shown in place of the spinner while this user's own request rate holds the question back"""
+        bot_bubble.markdown(chat_bubble_html("assistant", RATE_LIMITED_MESSAGE.format(seconds=max(1, seconds))),
+                            unsafe_allow_html=True)
 
     # **Generate AI Response (with role-specific system prompt)**
-    try:
-        # Get response using role-specific system prompt
-        bot_response = generate_school_response(user_input, st.session_state.user_role)
-    except Exception as e:
-        bot_response = f"⚠️ Error: {str(e)}"
+    stream_stats = StreamStats()
+    if STREAM_RESPONSES:
+        # Update only the bot bubble as chunks arrive; the message is saved as it grows
+        # so pressing Stop (which interrupts this run) keeps the partial reply
+        stop_button_slot = st.empty()
+        stop_button_slot.button("⏹ Stop", on_click=stop_generation)
+        bot_response = ""
+        for chunk in stream_school_response(
+            user_input, st.session_state.user_role, pdf_context, conversation_history, stream_stats,
+            on_queued=show_queue_position, on_rate_limited=show_rate_limit_wait,
+        ):
+            bot_response += chunk
+            current_conversation.update(temp_bot_msg, bot_response)
+            bot_bubble.markdown(chat_bubble_html("assistant", bot_response), unsafe_allow_html=True)
+        stop_button_slot.empty()
+        if stream_stats.time_to_first_token is not None and not stream_stats.cache_hit and not stream_stats.kb_hit:
+            st.session_state.last_response_timing = {
+                "first_token": stream_stats.time_to_first_token,
+                "total": stream_stats.total_time,
+            }
+    else:
+        try:
+            # Get response using role-specific system prompt
+            bot_response = generate_school_response(
+                user_input, st.session_state.user_role, pdf_context, conversation_history, stream_stats,
+                on_queued=show_queue_position, on_rate_limited=show_rate_limit_wait,
+            )
+        except Exception as e:
+            bot_response = f"⚠️ Error: {str(e)}"
+
+    # Per-turn token accounting so prompt cost can be tracked
+    st.session_state.token_usage.append({
+        "prompt_tokens": stream_stats.prompt_tokens,
+        "history_tokens": history_tokens,
+        "prompt_bytes": stream_stats.prompt_bytes,
+        "assembly_ms": stream_stats.assembly_seconds * 1000,
+        "cache_hit": stream_stats.cache_hit,
+        "kb_hit": stream_stats.kb_hit,
+        "output_tokens": stream_stats.output_tokens,
+        "model_tier": stream_stats.model_tier,
+        "escalated": stream_stats.escalated,
+    })
+    del st.session_state.token_usage[:-100]  # Keep only recent turns
+    if not stream_stats.cache_hit and not stream_stats.kb_hit:
+        metrics.inc("tokens_in", stream_stats.prompt_tokens)
+        metrics.inc("tokens_out", stream_stats.output_tokens)
 
     # Replace the temporary message with the actual bot response
-    st.session_state.conversations[st.session_state.current_chat][-1]["content"] = bot_response
+    current_conversation.update(temp_bot_msg, bot_response or "⚠️ The model returned an empty response.")
+    persist_message(st.session_state.current_chat, temp_bot_msg)
 
-    # **Update UI**
-    display_chat_history()
-    st.rerun()
+    # **Update UI** in place: only the new bubble and the stats change
+    bot_bubble.markdown(chat_bubble_html("assistant", temp_bot_msg.content), unsafe_allow_html=True)
+    display_turn_stats()
+    metrics.observe("chat_turn", time.perf_counter() - turn_started_at)
+
+    # A first message changes the sidebar's layout (e.g. enables the export); later turns only its captions
+    if is_first_message:
+        rerun()
+    show_message_count(active_message_count_slot, st.session_state.current_chat)
+    show_memory_report(memory_report_slot)
+
+# Persist what this run changed so the next run can be served by any replica
+save_session_state()
@@ -0,0 +1,132 @@
+"""Session memory and per-run costs of chat history: lists of message dicts versus Conversation objects.
+
+Builds one session with --chats conversations of --messages messages each
+(long assistant answers), once as the original lists of {"role", "content"}
+dicts and once as Conversations (`__slots__` Message records, compressed
+beyond the last --hot messages). Reports for each:
+
+    memory    resident size measured with tracemalloc (and the Conversation's own estimate)
+    check     the "does this chat have real messages" check run on each role change
+    store     bytes (and time) the session store writes for the `conversations` key
+    rerun     SessionStateSync.save on a rerun that changed no chat
+    jsonl     export and streaming import of every chat as JSON Lines
+
+Run from the repository root:
+    python -m benchmarks.bench_conversations --chats 36 --messages 200
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+from conversation import THINKING_PLACEHOLDER, Conversation, memory_report
+from session_store import MemorySessionBackend, SessionStateSync, dumps, encode
+
+ANSWER = ("Enrollment for the first semester runs from June 1 to June 30 through the WITS student portal. "
+          "Bring your report card, birth certificate and two ID photos to the registrar. ")
+
+
+def messages(count):
+    for i in range(count):
+        if i % 2 == 0:
+            yield "user", f"Question {i}: what do I need for enrollment and scholarships this semester?"
+        else:
+            yield "assistant", f"Answer {i}. " + ANSWER * 6
+
+
+def build_dicts(args):
+    return [[{"role": role, "content": content} for role, content in messages(args.messages)]
+            for _ in range(args.chats)]
+
+
+def build_conversations(args):
+    conversations = []
+    for _ in range(args.chats):
+        conversation = Conversation(hot_messages=args.hot)
+        for role, content in messages(args.messages):
+            conversation.append(role, content)
+        conversations.append(conversation)
+    return conversations
+
+
+def has_real_messages_scan(conversation):
+    # The check app.py ran over the whole chat before conversations kept a running count
+    return any(
+        str(msg.get("content", "")).strip() and str(msg.get("content", "")).strip() != THINKING_PLACEHOLDER
+        for msg in conversation
+    )
+
+
+def measure(build, args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    conversations = build(args)
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return conversations, current, elapsed
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=36)
+    parser.add_argument("--messages", type=int, default=200, help="messages per chat")
+    parser.add_argument("--hot", type=int, default=20, help="most recent messages per chat kept uncompressed")
+    parser.add_argument("--repeat", type=int, default=200, help="repetitions of the has-real-messages check")
+    args = parser.parse_args()
+
+    dicts, dict_bytes, dict_build = measure(build_dicts, args)
+    conversations, compact_bytes, compact_build = measure(build_conversations, args)
+    report = memory_report(conversations)
+    print(f"{args.chats} chats x {args.messages} messages, {report['content_bytes'] / 1024:,.0f} KiB of text")
+    print(f"memory   dicts {dict_bytes / 1024:9,.0f} KiB   conversations {compact_bytes / 1024:9,.0f} KiB   "
+          f"({1 - compact_bytes / dict_bytes:.0%} less; estimate {report['compact_bytes'] / 1024:,.0f} vs "
+          f"{report['dict_bytes'] / 1024:,.0f} KiB, {report['compressed']} messages compressed)")
+    print(f"build    dicts {dict_build * 1000:9.1f} ms    conversations {compact_build * 1000:9.1f} ms")
+
+    # Worst case for the scan: a chat holding only placeholders is read to the end
+    placeholders = [{"role": "assistant", "content": THINKING_PLACEHOLDER}] * args.messages
+    scan = timed(lambda: has_real_messages_scan(placeholders), args.repeat)
+    count = timed(lambda: conversations[-1].has_real_messages, args.repeat)
+    print(f"check    scan  {scan * 1e6:9.1f} us    running count {count * 1e6:9.2f} us")
+
+    started = time.perf_counter()
+    dict_blob = encode(dumps(dicts))
+    dict_save = time.perf_counter() - started
+    started = time.perf_counter()
+    compact_blob = encode(dumps(conversations))
+    compact_save = time.perf_counter() - started
+    print(f"store    dicts {len(dict_blob) / 1024:9,.0f} KiB   conversations {len(compact_blob) / 1024:9,.0f} KiB   "
+          f"(serialized in {dict_save * 1000:.1f} / {compact_save * 1000:.1f} ms)")
+
+    sync = SessionStateSync(MemorySessionBackend(), ["conversations"], session_id="bench")
+    state = {"conversations": conversations}
+    sync.save(state)
+    noop_save = timed(lambda: sync.save(state), args.repeat)
+    conversations[-1].append("user", "One more question?")
+    started = time.perf_counter()
+    sync.save(state)
+    changed_save = time.perf_counter() - started
+    print(f"rerun    no chat changed {noop_save * 1e6:9.1f} us   one chat changed {changed_save * 1000:9.1f} ms")
+    del conversations[-1][-1]
+
+    started = time.perf_counter()
+    exports = ["".join(conversation.iter_jsonl()) for conversation in conversations]
+    export_s = time.perf_counter() - started
+    started = time.perf_counter()
+    imported = [Conversation.from_jsonl(io.StringIO(export), hot_messages=args.hot) for export in exports]
+    import_s = time.perf_counter() - started
+    assert all(a.to_jsonl() == b for a, b in zip(imported, exports))
+    print(f"jsonl    export {export_s * 1000:8.1f} ms   import {import_s * 1000:8.1f} ms   "
+          f"{sum(len(export) for export in exports) / 1024:,.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
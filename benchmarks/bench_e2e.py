@@ -0,0 +1,261 @@
+"""End-to-end chat benchmark: app.py driven through Streamlit's AppTest, fully offline.
+
+Every session is a real AppTest run of app.py with the deterministic fake
+model (latency set by --first-token/--chunk-delay), a local stub in place of
+cit.edu and no history store. AppTest keeps its runtime and secrets in process
+globals, so one process can only drive one script run at a time: each worker
+process interleaves its --sessions round-robin (they share st.cache_resource
+like sessions on one server), and --workers processes run in parallel.
+
+Scenarios:
+    short  a few turns in a fresh chat
+    long   a few turns on top of a 500-message conversation
+    pdf    10 large PDFs uploaded, then a few turns grounded in them
+
+Reported per scenario: throughput (turns/s), per-turn latency p50/p95/p99,
+script runs per turn (st.rerun included, read from the app's own metrics on
+the admin Performance page) and serialized session-state bytes per session
+(the pickled size of each picklable key, i.e. what a session store would
+hold, not resident memory; keys that cannot be pickled are listed instead).
+Since sessions within a worker never overlap, at most --workers turns run at
+once. Results are written as JSON so runs can be compared:
+
+    python -m benchmarks.bench_e2e --workers 4 --sessions 5 --output e2e.json
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.stub_server import start_news_server, start_site_server
+from conversation import Conversation
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SCENARIOS = ("short", "long", "pdf")
+ADMIN_EMAIL = "bench-admin@cit.edu"
+TOPICS = ["enrollment", "scholarships", "the library", "tuition fees", "the WITS portal", "exam schedules"]
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+
+
+def make_pdf(title, pages, lines_per_page=45):
+    """A minimal text PDF (Helvetica, one content stream per page) that PyPDF2 can extract."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page in range(pages):
+        lines = [f"{title} page {page + 1} line {line}: policies on {TOPICS[(page + line) % len(TOPICS)]} "
+                 f"for students and staff of CIT University." for line in range(lines_per_page)]
+        text = " T* ".join(f"({line})'" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 36 800 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {pages} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_at = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n".encode("latin-1")
+    return bytes(output)
+
+
+def long_conversation(messages):
+    conversation = Conversation()
+    for i in range(messages):
+        if i % 2 == 0:
+            conversation.append("user", f"Earlier question {i} about {TOPICS[i % len(TOPICS)]}?")
+        else:
+            conversation.append("assistant", f"Earlier answer {i}. " + "CIT University info. " * 20)
+    return conversation
+
+
+def new_session(args, news_url, email, uid, site_urls=()):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets["firebase_config"] = {"apiKey": "bench", "authDomain": "", "databaseURL": "", "storageBucket": "",
+                                     "projectId": "bench"}
+    at.secrets["model"] = {"backend": "fake", "fake_first_token_seconds": args.first_token,
+                           "fake_chunk_seconds": args.chunk_delay}
+    at.secrets["news_cache"] = {"url": news_url}
+    at.secrets["site_crawler"] = {"pages": list(site_urls), "path": ":memory:", "min_interval_seconds": 0}
+    at.secrets["history_store"] = {"backend": "none"}
+    at.secrets["scheduler"] = {"user_requests_per_minute": 6000}  # Measure the app, not the per-user rate limit
+    at.secrets["metrics"] = {"admin_emails": [ADMIN_EMAIL]}
+    at.session_state["user"] = {"email": email, "uid": uid}
+    return at
+
+
+def script_runs(args, news_url):
+    """Reads how often the chat page body ran in this process from the admin Performance page."""
+    at = new_session(args, news_url, ADMIN_EMAIL, "bench-admin")
+    at.session_state["admin_navigation"] = "Performance"
+    at.run()
+    for row in at.dataframe[0].value.to_dict("records") if at.dataframe else []:
+        if row["stage"] == "render_history":
+            return row["count"]
+    return 0
+
+
+def serialized_state_bytes(at):
+    """Pickled size of the session's state; returns (bytes, keys that could not be pickled)."""
+    size, skipped = 0, []
+    for key, value in at.session_state.to_dict().items():
+        try:
+            size += len(pickle.dumps(value))
+        except Exception:
+            skipped.append(key)
+    return size, skipped
+
+
+def worker(args):
+    news_url = start_news_server(delay=args.news_delay).url
+    site_urls = start_site_server(delay=args.news_delay).urls
+    sessions = []
+    for s in range(args.sessions):
+        at = new_session(args, news_url, f"user{args.worker_id}-{s}@cit.edu", f"user{args.worker_id}-{s}", site_urls)
+        if args.scenario == "long":
+            at.session_state["conversations"] = [long_conversation(args.long_messages)]
+            at.session_state["conversation_meta"] = [{"id": None, "offset": 0, "loaded": True}]
+        at.run()
+        if args.scenario == "pdf":
+            files = [(f"handbook{i}.pdf", make_pdf(f"Handbook {i}", args.pdf_pages), "application/pdf")
+                     for i in range(args.pdfs)]
+            started = time.perf_counter()
+            at.sidebar.file_uploader[0].set_value(files).run()
+            pdf_seconds = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"session setup failed: {at.exception}")
+        sessions.append(at)
+
+    runs_before = script_runs(args, news_url)
+    latencies = []
+    started = time.perf_counter()
+    for turn in range(args.turns):
+        for s, at in enumerate(sessions):
+            question = f"Question {turn} from session {s} about {TOPICS[(s + turn) % len(TOPICS)]}?"
+            turn_started = time.perf_counter()
+            at.chat_input[0].set_value(question).run()
+            latencies.append(time.perf_counter() - turn_started)
+            if at.exception:
+                raise RuntimeError(f"turn failed: {at.exception}")
+    elapsed = time.perf_counter() - started
+    runs = script_runs(args, news_url) - runs_before  # The admin page stops before the chat body
+
+    result = {
+        "turns": len(latencies),
+        "elapsed_s": elapsed,
+        "latencies_s": latencies,
+        "script_runs": runs,
+        "serialized_state": [serialized_state_bytes(at) for at in sessions],
+    }
+    if args.scenario == "pdf":
+        result["pdf_upload_s"] = pdf_seconds
+    print(json.dumps(result))
+
+
+def run_scenario(args, scenario):
+    command = [sys.executable, "-m", "benchmarks.bench_e2e", "--worker", "--scenario", scenario]
+    for name in ("sessions", "turns", "first_token", "chunk_delay", "news_delay", "long_messages", "pdfs", "pdf_pages"):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    started = time.perf_counter()
+    processes = [subprocess.Popen(command + ["--worker-id", str(w)], stdout=subprocess.PIPE, text=True,
+                                  stderr=subprocess.DEVNULL)
+                 for w in range(args.workers)]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"{scenario} worker failed with exit code {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    wall = time.perf_counter() - started
+
+    latencies = [latency for result in results for latency in result["latencies_s"]]
+    state_bytes = [size for result in results for size, _ in result["serialized_state"]]
+    unpicklable = sorted({key for result in results for _, skipped in result["serialized_state"] for key in skipped})
+    turns = sum(result["turns"] for result in results)
+    summary = {
+        "scenario": scenario,
+        "sessions": args.workers * args.sessions,
+        "max_concurrent_turns": args.workers,
+        "turns": turns,
+        "throughput_turns_per_s": turns / max(result["elapsed_s"] for result in results),
+        "wall_s": wall,
+        "latency_s": {"p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                      "p99": percentile(latencies, 0.99), "mean": statistics.fmean(latencies)},
+        "script_runs_per_turn": sum(result["script_runs"] for result in results) / turns,
+        "serialized_state_bytes_per_session": statistics.fmean(state_bytes),
+        "unpicklable_state_keys": unpicklable,
+    }
+    if scenario == "pdf":
+        summary["pdf_upload_s"] = statistics.fmean(result["pdf_upload_s"] for result in results)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--workers", type=int, default=2, help="parallel processes")
+    parser.add_argument("--sessions", type=int, default=5, help="interleaved sessions per worker")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--first-token", type=float, default=0.2, help="fake model time to first token (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="fake model delay between chunks (s)")
+    parser.add_argument("--news-delay", type=float, default=0.3, help="cit.edu stub response delay (s)")
+    parser.add_argument("--long-messages", type=int, default=500)
+    parser.add_argument("--pdfs", type=int, default=10)
+    parser.add_argument("--pdf-pages", type=int, default=40)
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--scenario", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ["CHATBOT_FAKE_MODEL"] = "1"
+
+    if args.worker:
+        worker(args)
+        return
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "config": {name: value for name, value in vars(args).items()
+                   if name not in ("worker", "worker_id", "scenario", "output")},
+        "scenarios": [],
+    }
+    print(f"Sessions run round-robin within each worker: at most {args.workers} turn(s) run at once "
+          f"({args.workers} process(es) x {args.sessions} interleaved session(s)).")
+    print(f"{'scenario':<8}{'turns':>7}{'turns/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'runs/turn':>11}"
+          f"{'serialized state/session':>26}")
+    for scenario in args.scenarios:
+        summary = run_scenario(args, scenario)
+        results["scenarios"].append(summary)
+        latency = summary["latency_s"]
+        print(f"{scenario:<8}{summary['turns']:>7}{summary['throughput_turns_per_s']:>9.2f}"
+              f"{latency['p50'] * 1000:>6.0f} ms{latency['p95'] * 1000:>6.0f} ms{latency['p99'] * 1000:>6.0f} ms"
+              f"{summary['script_runs_per_turn']:>11.2f}"
+              f"{summary['serialized_state_bytes_per_session'] / 1024:>22.1f} KiB"
+              + (f"  (not picklable: {', '.join(summary['unpicklable_state_keys'])})"
+                 if summary["unpicklable_state_keys"] else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Queue wait of ordinary users while one user floods the model, FIFO versus fair-share scheduling.
+
+One "spammer" fires --spam requests at once while --users other users (half
+Students, half Staff) each send one request shortly after. Model calls are
+simulated with a fixed --latency and --slots concurrent calls. With FIFO
+(one shared queue) everyone waits behind the spammer's backlog; with the
+FairScheduler the other users' requests go ahead of it.
+
+Run from the repository root:
+    python -m benchmarks.bench_fair_scheduler --spam 40 --users 6 --slots 2 --latency 0.1
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from fair_scheduler import FairScheduler
+
+
+def run(scheduler, args):
+    waits = {}
+    lock = threading.Lock()
+
+    def request(uid, role):
+        started = time.perf_counter()
+        ticket = scheduler.acquire(uid, role, cost=500, timeout=300)
+        with lock:
+            waits.setdefault(role if uid != "spammer" else "spammer", []).append(time.perf_counter() - started)
+        time.sleep(args.latency)
+        scheduler.release(ticket, tokens_used=500)
+
+    threads = [threading.Thread(target=request, args=("spammer", "Student")) for _ in range(args.spam)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.latency / 2)  # The spammer's backlog is already queued when the others arrive
+    others = [threading.Thread(target=request, args=(f"user{i}", "Staff" if i % 2 else "Student"))
+              for i in range(args.users)]
+    for thread in others:
+        thread.start()
+    for thread in threads + others:
+        thread.join()
+    return waits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spam", type=int, default=40, help="requests sent at once by one user")
+    parser.add_argument("--users", type=int, default=6, help="other users, one request each")
+    parser.add_argument("--slots", type=int, default=2, help="concurrent model calls")
+    parser.add_argument("--latency", type=float, default=0.1, help="simulated model call duration (s)")
+    args = parser.parse_args()
+
+    # FIFO: equal weights and one shared flow id reduce the scheduler to arrival order
+    fifo = FairScheduler(max_concurrent=args.slots, user_rate=0, weights={})
+    fifo_acquire = fifo.acquire
+    fifo.acquire = lambda uid, role, **kwargs: fifo_acquire("everyone", "Student", **kwargs)
+    fair = FairScheduler(max_concurrent=args.slots, user_rate=0)
+
+    for name, scheduler in (("fifo", fifo), ("fair", fair)):
+        waits = run(scheduler, args)
+        line = "  ".join(f"{group}: mean={statistics.mean(samples) * 1000:7.1f} ms max={max(samples) * 1000:7.1f} ms"
+                         for group, samples in sorted(waits.items()))
+        print(f"{name:<5} {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Session memory with and without the persistent history store, for 1k-message chats.
+
+"in-session" keeps every message of every conversation in session state (the
+original behaviour); "store-backed" appends each message to a SQLite
+HistoryStore through the write-behind queue and keeps only the last
+--memory-window messages per conversation in memory.
+
+Run from the repository root:
+    python -m benchmarks.bench_history_memory --sessions 20 --conversations 5 --messages 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from history_store import SQLiteHistoryStore, WriteBehindHistoryStore
+
+REPLY = "Here is what I found about enrollment at CIT University. " * 8
+
+
+def message(i):
+    if i % 2 == 0:
+        return {"role": "user", "content": f"Question {i} about scholarships and enrollment schedules?"}
+    return {"role": "assistant", "content": f"{REPLY} ({i})"}
+
+
+def in_session(sessions, conversations, messages, memory_window, store):
+    return [[[message(i) for i in range(messages)] for _ in range(conversations)] for _ in range(sessions)]
+
+
+def store_backed(sessions, conversations, messages, memory_window, store):
+    all_sessions = []
+    for s in range(sessions):
+        session = []
+        for _ in range(conversations):
+            conversation_id = store.create_conversation(f"user{s}", "Student")
+            window = []
+            for i in range(messages):
+                msg = message(i)
+                window.append(msg)
+                store.append(f"user{s}", conversation_id, i, msg["role"], msg["content"])
+                if len(window) > memory_window:
+                    del window[0]
+            session.append(window)
+        all_sessions.append(session)
+    store.flush(timeout=120)  # Queued writes are transient; measure what stays resident
+    return all_sessions
+
+
+def measure(name, build, args, store=None):
+    tracemalloc.start()
+    start = time.perf_counter()
+    sessions = build(args.sessions, args.conversations, args.messages, args.memory_window, store)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<13} memory per session={current / args.sessions / 1024:9.1f} KiB  build={elapsed:6.2f} s")
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--conversations", type=int, default=5)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--memory-window", type=int, default=200)
+    args = parser.parse_args()
+
+    measure("in-session", in_session, args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WriteBehindHistoryStore(SQLiteHistoryStore(os.path.join(tmp, "history.sqlite3")), batch_size=500)
+        measure("store-backed", store_backed, args, store)
+        print(f"write-behind stats={store.stats}")
+
+        conversation_id = store.list_conversations("user0", limit=1)[0]["id"]
+        start = time.perf_counter()
+        page, cursor = store.load_messages("user0", conversation_id, limit=50)
+        while cursor:
+            page, cursor = store.load_messages("user0", conversation_id, limit=50, before_seq=cursor)
+        print(f"paged through {args.messages} messages in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
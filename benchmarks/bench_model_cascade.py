@@ -0,0 +1,166 @@
+"""Offline evaluation of the model cascade: latency, cost and misroutes per route, against fake model tiers.
+
+A labelled set of CIT questions (easy lookups, hard reasoning/writing
+questions and questions about an uploaded PDF) is answered three ways:
+always by the light tier, always by the strong tier, and by the
+CascadeRouter. Both tiers are FakeGenerativeModels with their own latency
+(a full answer takes twice the time to first token); the light one gives
+short answers and hedges ("I'm not sure...") on the hard questions marked
+`hedges`, which the cascade escalates. Cost uses the tiers' per-million-token
+prices and the fake models' token counts.
+
+Per route ("light", "strong" or "light->strong" when escalated) it reports
+the number of questions, mean/p95 latency (time to first token with
+--stream), tokens and cost; "misrouted" counts hard questions answered by the
+light tier alone.
+
+Run from the repository root:
+    python -m benchmarks.bench_model_cascade --threshold 0.5 --stream
+"""
+import argparse
+import statistics
+import time
+from collections import namedtuple
+
+from fake_model import FakeGenerativeModel
+from model_router import DEFAULT_TIERS, CascadeRouter, call_cost, generation_config
+from prompts import build_turn_prompt, system_instruction_for
+from streaming import StreamStats, stream_response
+
+Query = namedtuple("Query", ["text", "role", "pdf", "hard", "hedges"])
+
+PDF_EXCERPT = ("[Faculty Handbook, page 12] Faculty members may take up to 15 days of paid study leave per academic "
+               "year with the approval of the department chair and the dean.")
+QUERIES = [
+    Query("What is the CIT email address?", "Student", False, False, False),
+    Query("Where is the campus?", "Student", False, False, False),
+    Query("When does enrollment start?", "Student", False, False, False),
+    Query("What programs does CIT offer?", "Student", False, False, False),
+    Query("Is there a library?", "Student", False, False, False),
+    Query("What is the registrar's phone number?", "Staff", False, False, False),
+    Query("How do I reset my portal password?", "Student", False, False, False),
+    Query("What time does the cashier open?", "Student", False, False, False),
+    Query("Who is the dean of engineering?", "Teacher", False, False, False),
+    Query("Are there scholarships for freshmen?", "Student", False, False, False),
+    Query("Can I overload units while on probation?", "Student", False, True, True),
+    Query("Is my capstone topic eligible for a research grant?", "Student", False, True, True),
+    Query("Explain the difference between the BS Computer Science and BS Information Technology curricula and "
+          "which one suits someone who likes hardware.", "Student", False, True, True),
+    Query("Compare the pros and cons of the academic and athletic scholarships.", "Student", False, True, True),
+    Query("Draft an email to my adviser asking to move my thesis defense to next week.", "Student", False, True, False),
+    Query("Why would my enrollment be on hold, and what should I do first? Who do I contact?", "Student", False, True,
+          True),
+    Query("Write a lesson plan outline for a two-week unit on data structures for second-year students.", "Teacher",
+          False, True, False),
+    Query("Summarize the study leave policy in the handbook.", "Teacher", True, True, True),
+    Query("How many days of leave can I take?", "Teacher", True, True, False),
+    Query("Does the handbook say who approves leave?", "Staff", True, True, True),
+]
+HEDGE = "I'm not sure about that. Please contact the registrar at registrar@cit.edu for details."
+
+
+def question_in(prompt):
+    return next(query for query in QUERIES if query.text in prompt)
+
+
+def make_tier_models(args):
+    """One fake model per tier: the light one answers briefly and hedges on the hard questions marked `hedges`."""
+    def light_reply(prompt):
+        query = question_in(prompt)
+        if query.hard and query.hedges:
+            return HEDGE
+        return f"Short answer about: {query.text} " + "Details are on https://cit.edu/. " * 4
+
+    def strong_reply(prompt):
+        return f"Detailed answer about: {question_in(prompt).text} " + "Here is a step by step explanation. " * 30
+
+    system_instruction = system_instruction_for("Student")
+    return {
+        "light": FakeGenerativeModel("light", reply=light_reply, latency=2 * args.light_latency,
+                                     first_token_latency=args.light_latency,
+                                     chunk_delay=args.light_latency / 20, system_instruction=system_instruction),
+        "strong": FakeGenerativeModel("strong", reply=strong_reply, latency=2 * args.strong_latency,
+                                      first_token_latency=args.strong_latency,
+                                      chunk_delay=args.strong_latency / 20, system_instruction=system_instruction),
+    }
+
+
+def answer(router, models, query, stream):
+    """Runs one question through `router`; returns (route, seconds, prompt_tokens, output_tokens, cost)."""
+    prompt = build_turn_prompt(query.text, query.role, pdf_context=PDF_EXCERPT if query.pdf else "")
+    decision = router.classify(query.text, query.role, PDF_EXCERPT if query.pdf else "")
+    usage = {"prompt": 0, "output": 0, "cost": 0.0, "tiers": []}
+    stats = StreamStats()
+
+    def charge(tier, prompt_tokens, output_tokens):
+        usage["prompt"] += prompt_tokens
+        usage["output"] += output_tokens
+        usage["cost"] += call_cost(tier, prompt_tokens, output_tokens)
+        usage["tiers"].append(tier.name)
+
+    def call(tier):
+        response = models[tier.name].generate_content(prompt, generation_config=generation_config(tier))
+        charge(tier, response.usage_metadata.prompt_token_count, response.usage_metadata.candidates_token_count)
+        return response
+
+    def open_stream(tier):
+        chunk_stats = StreamStats()
+        try:
+            yield from stream_response(models[tier.name], prompt, generation_config(tier), stats=chunk_stats)
+        finally:
+            # An abandoned stream is billed for what it produced before it was closed
+            charge(tier, chunk_stats.prompt_tokens or len(prompt) // 4,
+                   chunk_stats.output_tokens or chunk_stats.characters // 4)
+
+    started = time.perf_counter()
+    if stream:
+        first_token = None
+        for _ in router.stream(decision, open_stream, stats):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+        seconds = first_token
+    else:
+        router.generate(decision, call, stats)
+        seconds = time.perf_counter() - started
+    return "->".join(usage["tiers"]), seconds, usage["prompt"], usage["output"], usage["cost"]
+
+
+def evaluate(name, router, models, args):
+    routes = {}
+    misrouted = 0
+    for query in QUERIES:
+        route, seconds, prompt_tokens, output_tokens, cost = answer(router, models, query, args.stream)
+        routes.setdefault(route, []).append((seconds, prompt_tokens, output_tokens, cost))
+        misrouted += query.hard and route == "light"
+
+    rows = [sample for samples in routes.values() for sample in samples]
+    print(f"{name}: {len(rows)} questions, total cost ${sum(row[3] for row in rows):.6f}, "
+          f"mean {'first token' if args.stream else 'latency'} {statistics.mean(row[0] for row in rows) * 1000:.0f} ms, "
+          f"misrouted {misrouted}")
+    for route, samples in sorted(routes.items()):
+        latencies = sorted(sample[0] for sample in samples)
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"  {route:<14}{len(samples):>4}  mean={statistics.mean(latencies) * 1000:7.1f} ms  "
+              f"p95={p95 * 1000:7.1f} ms  tokens in/out={sum(s[1] for s in samples):>6}/{sum(s[2] for s in samples):<6}"
+              f"cost=${sum(s[3] for s in samples):.6f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold", type=float, default=0.5, help="score at which questions go to the strong tier")
+    parser.add_argument("--light-latency", type=float, default=0.05, help="light tier time to first token (s)")
+    parser.add_argument("--strong-latency", type=float, default=0.4, help="strong tier time to first token (s)")
+    parser.add_argument("--no-escalate", action="store_true", help="never retry low-confidence answers")
+    parser.add_argument("--stream", action="store_true", help="stream answers and report time to first token")
+    args = parser.parse_args()
+
+    models = make_tier_models(args)
+    evaluate("light only", CascadeRouter(DEFAULT_TIERS[:1], thresholds=()), models, args)
+    evaluate("strong only", CascadeRouter(DEFAULT_TIERS[1:], thresholds=()), models, args)
+    router = CascadeRouter(DEFAULT_TIERS, thresholds=(args.threshold,), escalate=not args.no_escalate)
+    evaluate("cascade", router, models, args)
+    print(f"cascade router stats: {router.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-turn news lookup latency with and without the shared NewsCache.
+
+Run from the repository root:
+    python -m benchmarks.bench_news_cache --turns 50 --delay 0.3
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.stub_server import start_news_server
+from news_cache import NewsCache, parse_news
+
+
+def uncached_turn(url, timeout):
+    # Mirrors the original scrape_cit_info: one blocking GET per chat turn
+    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=timeout)
+    return parse_news(response.text) if response.status_code == 200 else []
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"{name:<10} mean={statistics.mean(samples) * 1000:8.2f} ms  "
+          f"p50={statistics.median(samples) * 1000:8.2f} ms  p95={p95 * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.3, help="stub server response delay in seconds")
+    parser.add_argument("--ttl", type=float, default=1.0, help="cache TTL in seconds")
+    args = parser.parse_args()
+
+    server = start_news_server(delay=args.delay)
+    try:
+        uncached = []
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            uncached_turn(server.url, timeout=5)
+            uncached.append(time.perf_counter() - start)
+
+        cache = NewsCache(url=server.url, ttl=args.ttl)
+        cache.refresh()  # Same warm-up the app performs at startup
+        cached = []
+        for _ in range(args.turns):
+            start = time.perf_counter()
+            cache.get()
+            cached.append(time.perf_counter() - start)
+            time.sleep(0.05)  # Let TTL expire mid-run so background revalidation is exercised
+
+        summarize("uncached", uncached)
+        summarize("cached", cached)
+        print(f"cache stats: {cache.stats}  server hits: {server.hits}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Prompt assembly time and bytes sent per request, before and after system_instruction.
+
+"Before" rebuilds the full system prompt + role prompt + news into the user
+content on every request (the original generate_school_response); "after"
+formats only the per-turn template, with the static part attached to the
+role's model once.
+
+Run from the repository root:
+    python -m benchmarks.bench_prompt_assembly --requests 10000
+"""
+import argparse
+import time
+
+from prompts import ROLE_SPECIFIC_PROMPTS, SCHOOL_SYSTEM_PROMPT, build_turn_prompt
+
+NEWS = [f"CIT News Item {i}" for i in range(5)]
+MESSAGE = "How do I access the WITS student portal?"
+
+
+def legacy_prompt(user_message, user_role, news):
+    enhanced_prompt = SCHOOL_SYSTEM_PROMPT
+    if user_role in ROLE_SPECIFIC_PROMPTS:
+        enhanced_prompt += ROLE_SPECIFIC_PROMPTS[user_role]
+    if news:
+        enhanced_prompt += "\n\n## Recent News & Updates:\n"
+        for item in news:
+            enhanced_prompt += f"- {item}\n"
+    role_context = f"User Role: {user_role}\n\n"
+    return f"{enhanced_prompt}\n\n---\n\n{role_context}{user_role}: {user_message}\nAssistant:"
+
+
+def measure(build, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        prompt = build(MESSAGE, ("Student", "Teacher", "Staff")[i % 3], NEWS)
+    elapsed = time.perf_counter() - start
+    return elapsed / requests, len(prompt.encode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=10000)
+    args = parser.parse_args()
+
+    for name, build in (("before", legacy_prompt), ("after", build_turn_prompt)):
+        seconds, size = measure(build, args.requests)
+        print(f"{name:<7} assembly={seconds * 1e6:7.2f} us/request  bytes sent per request={size:>6}")
+
+
+if __name__ == "__main__":
+    main()
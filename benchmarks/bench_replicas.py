@@ -0,0 +1,148 @@
+"""Two app processes sharing one session store: a session survives switching replicas.
+
+Each step runs app.py through Streamlit's AppTest in its own Python process,
+like requests a load balancer sends to different replicas. The processes
+share only a SQLite session store and a PDF cache directory. Without the
+Admin SDK there is no session cookie, so every step signs in afresh (the
+login is never restored from the store).
+
+    replica A  signs in, uploads a PDF and asks --turns questions
+    replica B  the same user opens the same ?sid=..., sees the conversation, role and PDF, asks more
+    intruder   another user opens that ?sid=... and must get a new, empty session
+    replica A  a fresh process again, sees everything B added
+
+Reported per step: the fields restored from the store, the first run's
+time, the messages seen before and after the step's turns, and the bytes
+written to the store per save; the checks at the end compare each replica's
+view with what the previous one left.
+
+    python -m benchmarks.bench_replicas --turns 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_e2e import APP_PATH, make_pdf
+
+ROLE = "Teacher"
+OWNER = {"email": "teacher@cit.edu", "uid": "replica-demo"}
+INTRUDER = {"email": "student@cit.edu", "uid": "replica-intruder"}
+
+
+def new_replica(args, sid=None):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.secrets["firebase_config"] = {"apiKey": "bench", "authDomain": "", "databaseURL": "", "storageBucket": "",
+                                     "projectId": "bench"}
+    at.secrets["model"] = {"backend": "fake", "fake_first_token_seconds": 0.01, "fake_chunk_seconds": 0}
+    at.secrets["history_store"] = {"backend": "none"}
+    at.secrets["site_crawler"] = {"enabled": False}
+    at.secrets["session_store"] = {"backend": "sqlite", "path": os.path.join(args.state_dir, "sessions.sqlite3")}
+    at.secrets["pdf_cache"] = {"cache_dir": os.path.join(args.state_dir, "pdf_cache"), "workers": 0}
+    if sid:
+        at.query_params["sid"] = sid
+    return at
+
+
+def ask(at, question):
+    at.chat_input[0].set_value(question).run()
+    if at.exception:
+        raise RuntimeError(f"turn failed: {at.exception}")
+
+
+def step(args):
+    started = time.perf_counter()
+    at = new_replica(args, args.sid)
+    at.session_state["user"] = dict(INTRUDER if args.step == "intruder" else OWNER)
+    at.run()
+    first_run_s = time.perf_counter() - started
+    if at.exception:
+        raise RuntimeError(f"first run failed: {at.exception}")
+    sync = at.session_state["_session_sync"]
+    restored = sync.stats["restored_fields"]
+
+    if args.step == "login":
+        at.sidebar.radio[0].set_value(ROLE).run()
+        pdf = make_pdf("Faculty Handbook", 4)
+        at.sidebar.file_uploader[0].set_value([("handbook.pdf", pdf, "application/pdf")]).run()
+    conversation = at.session_state["conversations"][at.session_state["current_chat"]]
+    seen = {
+        "role": at.session_state["user_role"],
+        "messages": len(conversation),
+        "pdf_refs": len(at.session_state["pdf_refs"]) if "pdf_refs" in at.session_state else 0,
+    }
+
+    for turn in range(0 if args.step == "intruder" else args.turns):
+        ask(at, f"Question {turn} from the {args.step} step: what does the faculty handbook say about leave?")
+    print(json.dumps({
+        "step": args.step,
+        "sid": at.query_params.get("sid"),
+        "first_run_s": first_run_s,
+        "restored_fields": restored,
+        "rejected": sync.stats["rejected"],
+        "seen": seen,
+        "messages_after": len(at.session_state["conversations"][at.session_state["current_chat"]]),
+        "pdf_chunks_used": len(at.session_state["last_pdf_chunk_ids"]) if "last_pdf_chunk_ids" in at.session_state else 0,
+        "saves": sync.stats["saves"],
+        "fields_written": sync.stats["fields_written"],
+        "bytes_written": sync.stats["bytes_written"],
+    }))
+
+
+def run_step(args, name, sid=None):
+    command = [sys.executable, "-m", "benchmarks.bench_replicas", "--step", name, "--state-dir", args.state_dir,
+               "--turns", str(args.turns)]
+    if sid:
+        command += ["--sid", sid]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3, help="questions asked on each replica")
+    parser.add_argument("--state-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--step", choices=("login", "switch", "intruder", "switch-back"), help=argparse.SUPPRESS)
+    parser.add_argument("--sid", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ["CHATBOT_FAKE_MODEL"] = "1"
+
+    if args.step:
+        step(args)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="replicas-") as state_dir:
+        args.state_dir = state_dir
+        a = run_step(args, "login")
+        b = run_step(args, "switch", a["sid"])
+        intruder = run_step(args, "intruder", a["sid"])
+        a2 = run_step(args, "switch-back", a["sid"])
+
+    print(f"{'step':<12}{'restored':>9}{'first run':>11}{'messages':>10}{'role':>9}{'pdfs':>6}"
+          f"{'bytes/save':>12}")
+    for result in (a, b, intruder, a2):
+        seen = result["seen"]
+        print(f"{result['step']:<12}{result['restored_fields']:>9}{result['first_run_s'] * 1000:>8.0f} ms"
+              f"{seen['messages']:>5} -> {result['messages_after']:<3}{seen['role']:>9}{seen['pdf_refs']:>6}"
+              f"{result['bytes_written'] / max(1, result['saves']):>12.0f}")
+
+    checks = {
+        "B sees A's conversation": b["seen"]["messages"] == a["messages_after"],
+        "B keeps the role": b["seen"]["role"] == ROLE,
+        "B answers from A's PDF": b["pdf_chunks_used"] > 0,
+        "A sees B's turns": a2["seen"]["messages"] == b["messages_after"],
+        "another user's sid restores nothing": (intruder["restored_fields"] == 0 and intruder["rejected"] == 1
+                                                and intruder["sid"] != a["sid"]),
+    }
+    for check, passed in checks.items():
+        print(f"{'PASS' if passed else 'FAIL'}  {check}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Index build time, query latency and prompt size for synthetic PDF corpora.
+
+Run from the repository root:
+    python -m benchmarks.bench_retrieval --pages 1000 5000 10000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from retrieval import build_index, estimate_tokens, select_context
+
+WORDS_PER_PAGE = 350
+
+
+def synthetic_corpus(pages, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(20000)]
+    topics = ["enrollment", "scholarship", "tuition", "grading", "attendance", "library", "dormitory", "thesis"]
+    documents = []
+    pages_per_doc = 100
+    for doc in range(0, pages, pages_per_doc):
+        page_texts = []
+        for _ in range(min(pages_per_doc, pages - doc)):
+            topic = rng.choice(topics)
+            words = rng.choices(vocabulary, k=WORDS_PER_PAGE - 20) + [topic] * 20
+            rng.shuffle(words)
+            page_texts.append(" ".join(words))
+        documents.append((f"handbook{doc // pages_per_doc}.pdf", "\n".join(page_texts)))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--token-budget", type=int, default=1500)
+    args = parser.parse_args()
+
+    queries = ["scholarship requirements", "tuition payment deadline", "library hours", "thesis grading policy"]
+    for pages in args.pages:
+        documents = synthetic_corpus(pages)
+        full_prompt_tokens = sum(estimate_tokens(text) for _, text in documents)
+
+        start = time.perf_counter()
+        index = build_index(documents)
+        build_seconds = time.perf_counter() - start
+
+        latencies = []
+        context_tokens = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            context, _ = select_context(index, queries[i % len(queries)], args.top_k, args.token_budget)
+            latencies.append(time.perf_counter() - start)
+            context_tokens.append(estimate_tokens(context))
+
+        print(f"{pages:>6} pages  chunks={len(index):>6}  build={build_seconds:7.2f} s  "
+              f"query p50={statistics.median(latencies) * 1000:7.2f} ms  "
+              f"prompt tokens: full={full_prompt_tokens:>9}  top-k={statistics.mean(context_tokens):7.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""TokenManager against a stub ID-token verifier: per-rerun check cost, refresh, remember me and idle eviction.
+
+The stub stands in for `firebase_admin.auth.verify_id_token` (with --verify-ms
+of simulated certificate work) and for Pyrebase's refresh call, so the whole
+token lifecycle runs offline:
+
+    rerun     `current()` on every rerun of --sessions signed-in sessions (claims cache hits)
+    refresh   tokens that expire after --lifetime seconds are refreshed in the background
+    remember  a remembered session resumes from its key, which is then replaced; a signed-out one does not
+    evict     sessions idle past `max_idle` are dropped (with a fake clock)
+
+    python -m benchmarks.bench_session_tokens --sessions 200 --reruns 20
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import time
+
+from session_tokens import MemoryRememberStore, TokenManager, TokenVerifier
+
+_serial = itertools.count()
+
+
+def stub_token(uid, lifetime, clock=time.time):
+    return f"stub:{uid}:{clock() + lifetime:.3f}:{next(_serial)}"
+
+
+def make_stub_verify(verify_seconds, clock=time.time):
+    def verify(id_token):
+        time.sleep(verify_seconds)
+        kind, uid, exp, _ = id_token.split(":")
+        if kind != "stub" or float(exp) <= clock():
+            raise ValueError("invalid or expired ID token")
+        return {"uid": uid, "email": f"{uid}@cit.edu", "exp": float(exp)}
+    return verify
+
+
+def make_stub_refresh(lifetime, clock=time.time):
+    def refresh(refresh_token):
+        uid = refresh_token.split(":")[1]
+        return {"idToken": stub_token(uid, lifetime, clock), "refreshToken": refresh_token}
+    return refresh
+
+
+def sign_in_response(uid, lifetime, clock=time.time):
+    return {"idToken": stub_token(uid, lifetime, clock), "refreshToken": f"refresh:{uid}", "localId": uid,
+            "email": f"{uid}@cit.edu"}
+
+
+def bench_reruns(args):
+    verifier = TokenVerifier(verify=make_stub_verify(args.verify_ms / 1000))
+    manager = TokenManager(verifier, refresh=make_stub_refresh(3600))
+    sessions = [manager.sign_in(sign_in_response(f"user{i}", 3600))[0] for i in range(args.sessions)]
+    samples = []
+    for _ in range(args.reruns):
+        for session in sessions:
+            started = time.perf_counter()
+            manager.current(session.id)
+            samples.append(time.perf_counter() - started)
+    samples.sort()
+    print(f"rerun     {len(samples)} checks  mean={statistics.mean(samples) * 1e6:8.1f} us  "
+          f"p95={samples[int(0.95 * (len(samples) - 1))] * 1e6:8.1f} us  verifier {verifier.stats}")
+    return verifier.stats["verifications"] == args.sessions
+
+
+def bench_refresh(args):
+    verifier = TokenVerifier(verify=make_stub_verify(0))
+    manager = TokenManager(verifier, refresh=make_stub_refresh(args.lifetime), refresh_margin=args.lifetime / 2)
+    session, _ = manager.sign_in(sign_in_response("refresh-demo", args.lifetime))
+    first_token = session.id_token
+    time.sleep(args.lifetime * 1.5)
+    claims = manager.current(session.id)
+    print(f"refresh   after {args.lifetime * 1.5:.1f} s: refreshes={manager.stats['refreshes']}  "
+          f"token changed={session.id_token != first_token}  still signed in={claims is not None}")
+    return claims is not None and manager.stats["refreshes"] > 0
+
+
+def bench_remember(args):
+    verifier = TokenVerifier(verify=make_stub_verify(0))
+    manager = TokenManager(verifier, refresh=make_stub_refresh(3600), remember_store=MemoryRememberStore())
+    session, remember_key = manager.sign_in(sign_in_response("remember-demo", 3600), remember=True)
+    resumed, next_key = manager.resume(remember_key)
+    reused, _ = manager.resume(remember_key)
+    manager.sign_out(resumed.id)
+    after_sign_out, _ = manager.resume(next_key)
+    print(f"remember  resumed uid={resumed.uid if resumed else None}  old key again={reused}  "
+          f"after sign-out={after_sign_out}")
+    return resumed is not None and resumed.uid == session.uid and reused is None and after_sign_out is None
+
+
+def bench_evict(args):
+    now = [time.time()]
+    clock = lambda: now[0]
+    verifier = TokenVerifier(verify=make_stub_verify(0, clock), clock=clock)
+    manager = TokenManager(verifier, refresh=make_stub_refresh(10 * 86400, clock), max_idle=3600, clock=clock)
+    for i in range(args.sessions):
+        manager.sign_in(sign_in_response(f"idle{i}", 10 * 86400, clock))
+    now[0] += 7200
+    active, _ = manager.sign_in(sign_in_response("active", 10 * 86400, clock))
+    print(f"evict     {args.sessions} idle sessions -> evicted={manager.stats['evicted']}  "
+          f"live={len(manager._sessions)}")
+    return manager.stats["evicted"] == args.sessions and manager.current(active.id) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--reruns", type=int, default=20, help="reruns per session")
+    parser.add_argument("--verify-ms", type=float, default=5.0, help="simulated cost of one full token verification")
+    parser.add_argument("--lifetime", type=float, default=1.0, help="ID token lifetime in the refresh check (s)")
+    args = parser.parse_args()
+
+    checks = {
+        "reruns verify each token once": bench_reruns(args),
+        "background refresh keeps the session": bench_refresh(args),
+        "remember me resumes once per key until sign-out": bench_remember(args),
+        "idle sessions are evicted": bench_evict(args),
+    }
+    for check, passed in checks.items():
+        print(f"{'PASS' if passed else 'FAIL'}  {check}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
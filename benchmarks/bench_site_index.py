@@ -0,0 +1,101 @@
+"""Crawl and lookup costs of the cit.edu site index, against a local fixture site.
+
+Compares a first crawl with one worker and with several, then a recrawl
+(served by 304s), a recrawl after one page changed, and the per-turn cost of
+an index search versus fetching and parsing the allowlisted pages live.
+
+Run from the repository root:
+    python -m benchmarks.bench_site_index --delay 0.1 --workers 4 --queries 200
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+from benchmarks.stub_server import site_page, start_site_server
+from site_index import SiteCrawler, SiteIndex, parse_page
+
+QUERIES = [
+    "How do I apply for an academic scholarship?",
+    "What documents do transferees submit for admissions?",
+    "When was CIT founded?",
+    "Are there athletic scholarships for varsity players?",
+    "entrance examination requirements for freshmen",
+]
+
+
+def crawl(urls, workers, interval, index=None):
+    crawler = SiteCrawler(urls, index=index or SiteIndex(":memory:"), max_workers=workers, min_interval=interval)
+    started = time.perf_counter()
+    counts = crawler.crawl()
+    return crawler, time.perf_counter() - started, counts
+
+
+def live_turn(urls, query):
+    # What answering from the site would cost without an index: fetch and scan every page
+    texts = []
+    for url in urls:
+        response = requests.get(url, timeout=5)
+        if response.status_code == 200:
+            texts.append(parse_page(response.text)[1])
+    words = set(query.lower().split())
+    return max(texts, key=lambda text: len(words & set(text.lower().split())), default="")
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"{name:<14} mean={statistics.mean(samples) * 1000:8.2f} ms  "
+          f"p50={statistics.median(samples) * 1000:8.2f} ms  p95={p95 * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--delay", type=float, default=0.1, help="fixture site response delay in seconds")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=0.0, help="minimum seconds between requests to the host")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--live-queries", type=int, default=10)
+    args = parser.parse_args()
+
+    server = start_site_server(delay=args.delay)
+    try:
+        _, sequential_s, _ = crawl(server.urls, 1, args.interval)
+        crawler, concurrent_s, counts = crawl(server.urls, args.workers, args.interval)
+        print(f"first crawl    1 worker: {sequential_s * 1000:8.1f} ms   {args.workers} workers: "
+              f"{concurrent_s * 1000:8.1f} ms   {counts}")
+
+        started = time.perf_counter()
+        counts = crawler.crawl()
+        print(f"recrawl        {(time.perf_counter() - started) * 1000:8.1f} ms   {counts}")
+
+        server.pages["/scholarships/"] = site_page("Scholarships", ["Scholarship applications now close June 15."])
+        generation = crawler.index.generation
+        started = time.perf_counter()
+        counts = crawler.crawl()
+        print(f"one page edit  {(time.perf_counter() - started) * 1000:8.1f} ms   {counts}   "
+              f"generation {generation} -> {crawler.index.generation}")
+
+        indexed = []
+        for i in range(args.queries):
+            started = time.perf_counter()
+            crawler.index.search(QUERIES[i % len(QUERIES)])
+            indexed.append(time.perf_counter() - started)
+        live = []
+        for i in range(args.live_queries):
+            started = time.perf_counter()
+            live_turn(server.urls, QUERIES[i % len(QUERIES)])
+            live.append(time.perf_counter() - started)
+
+        summarize("index search", indexed)
+        summarize("live fetch", live)
+        for hit in crawler.index.search(QUERIES[0]):
+            print(f"  {hit.score:6.2f}  {hit.url}  {hit.snippet[:80]}")
+        print(f"crawler stats: {crawler.stats}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Cold-start and per-rerun wall time of app.py for the login and chat pages.
+
+Each page is measured in a fresh interpreter so the first run includes every
+import and cached-resource construction the page triggers; later runs are
+plain Streamlit reruns of the same session. The fake model and placeholder
+Firebase config keep the benchmark offline. Heavy modules Streamlit itself
+had already imported (asyncio) are listed in parentheses; on the login page
+numpy comes from the pyarrow import behind streamlit_option_menu's component.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup --reruns 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+FIREBASE_CONFIG = {"apiKey": "x", "authDomain": "x", "databaseURL": "", "storageBucket": "x", "projectId": "x"}
+HEAVY_MODULES = ["google.generativeai", "firebase_admin", "pyrebase", "PyPDF2", "bs4", "numpy", "asyncio", "requests"]
+
+
+def worker(page, reruns):
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_import = time.perf_counter() - started
+    preloaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["firebase_config"] = FIREBASE_CONFIG
+    at.secrets["history_store"] = {"backend": "none"}
+    if page == "chat":
+        at.session_state["user"] = {"email": "bench@cit.edu", "uid": "bench"}
+
+    start = time.perf_counter()
+    at.run()
+    first_run = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f"{page} page failed: {at.exception}")
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        rerun_times.append(time.perf_counter() - start)
+
+    print(json.dumps({
+        "page": page,
+        "streamlit_import_s": streamlit_import,
+        "first_run_s": first_run,
+        "rerun_median_s": statistics.median(rerun_times) if rerun_times else None,
+        "rerun_max_s": max(rerun_times) if rerun_times else None,
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in sys.modules and name not in preloaded],
+        "heavy_modules_preloaded": preloaded,
+    }))
+
+
+def measure(page, reruns):
+    env = dict(os.environ, CHATBOT_FAKE_MODEL="1")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--worker", page, "--reruns", str(reruns)],
+        capture_output=True, text=True, env=env, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--worker", choices=["login", "chat"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.reruns)
+        return
+
+    print(f"{'page':<8}{'streamlit import':>18}{'first run':>12}{'rerun p50':>12}{'rerun max':>12}  heavy modules loaded")
+    for page in ("login", "chat"):
+        result = measure(page, args.reruns)
+        print(f"{page:<8}{result['streamlit_import_s'] * 1000:>15.0f} ms{result['first_run_s'] * 1000:>9.0f} ms"
+              f"{result['rerun_median_s'] * 1000:>9.1f} ms{result['rerun_max_s'] * 1000:>9.1f} ms"
+              f"  {', '.join(result['heavy_modules_loaded']) or '-'}"
+              + (f" ({', '.join(result['heavy_modules_preloaded'])})" if result["heavy_modules_preloaded"] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Load test of ModelClient against a fake, capacity-limited Gemini backend.
+
+The fake service answers at most --capacity requests at once and rejects the
+rest with a 429, like Gemini does when a burst exceeds the quota. The test
+fires --requests calls from --users concurrent threads (questions drawn from a
+small FAQ pool, so some are identical) and compares calling the model directly
+with calling it through ModelClient.
+
+Run from the repository root:
+    python -m benchmarks.load_test_model_client --users 50 --requests 300
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_model import FakeGenerativeModel
+from model_client import ModelClient
+
+FAQ = [f"How do I access portal number {i}?" for i in range(20)]
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+class CapacityLimitedModel(FakeGenerativeModel):
+    def __init__(self, capacity, **kwargs):
+        super().__init__(**kwargs)
+        self._capacity = threading.BoundedSemaphore(capacity)
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        if not self._capacity.acquire(blocking=False):
+            raise RateLimited("429 Resource has been exhausted")
+        try:
+            return super().generate_content(contents, generation_config, stream, **kwargs)
+        finally:
+            self._capacity.release()
+
+
+def run(name, call, users, requests, seed=0):
+    rng = random.Random(seed)
+    prompts = [rng.choice(FAQ) for _ in range(requests)]
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(prompt):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(prompt)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        except Exception:
+            with lock:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(one, prompts))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] if latencies else float("nan")
+    p50 = statistics.median(latencies) if latencies else float("nan")
+    print(f"{name:<8} ok={len(latencies):>5} errors={errors:>5} throughput={len(latencies) / elapsed:7.1f} req/s  "
+          f"p50={p50 * 1000:8.1f} ms  p99={p99 * 1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests the fake backend accepts")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency in seconds")
+    args = parser.parse_args()
+
+    direct_model = CapacityLimitedModel(args.capacity, latency=args.latency)
+    run("direct", lambda prompt: direct_model.generate_content(prompt), args.users, args.requests)
+
+    client_model = CapacityLimitedModel(args.capacity, latency=args.latency)
+    client = ModelClient(max_concurrency=args.capacity, requests_per_second=args.capacity / args.latency,
+                         burst=args.capacity, base_delay=0.05, timeout=60)
+    run("client", lambda prompt: client.generate(client_model, prompt), args.users, args.requests)
+    print(f"client stats: {client.stats}  backend calls: {client_model.calls}")
+
+
+if __name__ == "__main__":
+    main()
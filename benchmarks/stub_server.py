@@ -0,0 +1,114 @@
+"""Local HTTP stubs used by the benchmarks so they never touch the real cit.edu."""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NEWS_HTML = "".join(
+    f'<article><h2 class="entry-title">CIT News Item {i}</h2><p>Body {i}</p></article>' for i in range(10)
+)
+
+
+def start_news_server(delay=0.3, html=NEWS_HTML):
+    """Serves `html` at every path after sleeping `delay` seconds. Supports ETag revalidation."""
+    etag = '"' + hashlib.sha1(html.encode()).hexdigest() + '"'
+    hits = {"200": 0, "304": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            if self.headers.get("If-None-Match") == etag:
+                hits["304"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            hits["200"] += 1
+            body = html.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.hits = hits
+    server.url = f"http://127.0.0.1:{server.server_port}/news-and-updates/"
+    return server
+
+
+SITE_ROBOTS = "User-agent: *\nDisallow: /private/\n"
+
+
+def site_page(title, paragraphs):
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    return (f"<html><head><title>{title}</title><script>var tracking = 1;</script></head><body>"
+            f"<nav>Home | About | Admissions</nav><main><h1>{title}</h1>{body}</main>"
+            f"<footer>Copyright CIT University</footer></body></html>")
+
+
+SITE_PAGES = {
+    "/news-and-updates/": NEWS_HTML,
+    "/scholarships/": site_page("Scholarships", [
+        "CIT University offers academic scholarships to incoming freshmen with a general weighted average of 90 or higher.",
+        "Athletic and cultural scholarships are granted to varsity players and performing arts members.",
+        "Applications for the first semester close every May 31 at the Office of Student Affairs.",
+    ]),
+    "/admissions/": site_page("Admissions", [
+        "Freshmen applicants take the CIT entrance examination and submit their Form 138 and birth certificate.",
+        "Transferees must submit their transcript of records and honorable dismissal.",
+    ]),
+    "/about/": site_page("About CIT University", [
+        "Cebu Institute of Technology was founded in 1946 and is located on N. Bacalso Avenue, Cebu City.",
+    ]),
+    "/private/staff-only/": site_page("Staff Only", ["Internal payroll schedule."]),
+}
+
+
+def start_site_server(delay=0.05, pages=None, robots=SITE_ROBOTS):
+    """Serves a small fixture copy of cit.edu: `pages` maps paths to HTML (edit it to simulate changes).
+
+    Pages carry an ETag and answer 304 to a matching If-None-Match; unknown
+    paths are 404. `server.hits` counts responses per status and path.
+    """
+    pages = dict(SITE_PAGES if pages is None else pages)
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            if self.path == "/robots.txt" and robots is not None:
+                status, body, etag = 200, robots, None
+            elif self.path in pages:
+                body = pages[self.path]
+                etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+                status = 304 if self.headers.get("If-None-Match") == etag else 200
+            else:
+                status, body, etag = 404, "Not found", None
+            hits[(status, self.path)] = hits.get((status, self.path), 0) + 1
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+            if status == 304:
+                self.end_headers()
+                return
+            data = body.encode()
+            self.send_header("Content-Type", "text/plain" if self.path == "/robots.txt" else "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.hits = hits
+    server.pages = pages
+    server.base_url = f"http://127.0.0.1:{server.server_port}"
+    server.urls = [server.base_url + path for path in pages] + [server.base_url + "/missing/"]
+    return server
@@ -0,0 +1,230 @@
+import itertools
+import json
+import sys
+import zlib
+
+THINKING_PLACEHOLDER = "🤖 Thinking..."
+ROLES = ("user", "assistant")
+HOT_MESSAGES = 20
+COMPRESS_MIN_BYTES = 256
+
+# One counter for all conversations, so a version number is never reused by another conversation
+_versions = itertools.count(1)
+
+
+def _is_real(text):
+    stripped = text.strip()
+    return bool(stripped) and stripped != THINKING_PLACEHOLDER
+
+
+class Message:
+    """One chat message. `role` is interned; `content` may be held zlib-compressed once the message is old.
+
+    Content is read-only here: change it through `Conversation.update` so the
+    conversation's totals stay right.
+    """
+
+    __slots__ = ("role", "_text", "_packed", "size")
+
+    def __init__(self, role, content=""):
+        self.role = sys.intern(role)
+        self._set(content)
+
+    def _set(self, content):
+        self._text = content
+        self._packed = None
+        self.size = len(content.encode("utf-8"))
+
+    def _compress(self):
+        """Compresses the content if that saves space; returns True if it did."""
+        if self._packed is not None or self.size < COMPRESS_MIN_BYTES or not _is_real(self._text):
+            return False
+        packed = zlib.compress(self._text.encode("utf-8"), 6)
+        if len(packed) >= self.size:
+            return False
+        self._packed, self._text = packed, None
+        return True
+
+    @property
+    def content(self):
+        if self._packed is not None:
+            return zlib.decompress(self._packed).decode("utf-8")
+        return self._text
+
+    @property
+    def compressed(self):
+        return self._packed is not None
+
+    @property
+    def stored_bytes(self):
+        return len(self._packed) if self._packed is not None else self.size
+
+    @property
+    def real(self):
+        """True unless the message is empty or the placeholder (only real messages are ever compressed)."""
+        return self._packed is not None or _is_real(self._text)
+
+    @property
+    def is_placeholder(self):
+        # Compressed messages are far longer than the placeholder, so this never decompresses
+        return self._packed is None and self._text.strip() == THINKING_PLACEHOLDER
+
+    def to_dict(self):
+        return {"role": self.role, "content": self.content}
+
+    def __repr__(self):
+        return f"Message({self.role!r}, {self.size} bytes{', compressed' if self._packed is not None else ''})"
+
+
+# Rough per-message footprint of the {"role", "content"} dicts this replaces, and of a Message
+DICT_MESSAGE_BYTES = sys.getsizeof({"role": "user", "content": ""})
+SLOTS_MESSAGE_BYTES = sys.getsizeof(Message("user"))
+STR_OVERHEAD = sys.getsizeof("")
+BYTES_OVERHEAD = sys.getsizeof(b"")
+
+
+def read_jsonl(lines):
+    """Yields (role, content) from JSON Lines (`{"role": ..., "content": ...}` per line), one line at a time."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {number}: invalid JSON ({e})") from None
+        if not isinstance(record, dict) or record.get("role") not in ROLES or not isinstance(record.get("content"), str):
+            raise ValueError(f'line {number}: expected {{"role": "user" or "assistant", "content": "..."}}')
+        yield record["role"], record["content"]
+
+
+class Conversation:
+    """The messages of one chat, with counts and sizes kept up to date as it changes.
+
+    Every message older than the last `hot_messages` is compressed once it
+    is at least COMPRESS_MIN_BYTES long; it is decompressed on each read of
+    its `content`. Indexing and slicing work like a list of Messages. State
+    round-trips through `to_state`/`from_state` and through JSON Lines with
+    `iter_jsonl`/`from_jsonl`. `version` changes on every change to the
+    messages, so callers can tell whether a conversation changed without
+    reading it.
+    """
+
+    def __init__(self, records=(), hot_messages=HOT_MESSAGES):
+        self.messages = []
+        self.hot_messages = hot_messages
+        self.real_messages = 0
+        self.role_counts = dict.fromkeys(ROLES, 0)
+        self.content_bytes = 0
+        self.stored_bytes = 0
+        self.compressed_messages = 0
+        self.version = next(_versions)
+        for record in records:
+            self.append(record["role"], record["content"])
+
+    def _add(self, message, sign):
+        self.version = next(_versions)
+        self.real_messages += sign * message.real
+        self.role_counts[message.role] = self.role_counts.get(message.role, 0) + sign
+        self.content_bytes += sign * message.size
+        self.stored_bytes += sign * message.stored_bytes
+        self.compressed_messages += sign * message.compressed
+
+    def _compress(self, message):
+        stored_bytes = message.stored_bytes
+        if message._compress():
+            self.stored_bytes += message.stored_bytes - stored_bytes
+            self.compressed_messages += 1
+
+    def _compress_cold(self):
+        for message in self.messages[:max(0, len(self.messages) - self.hot_messages)]:
+            self._compress(message)
+
+    def append(self, role, content=""):
+        """Adds a message at the end and returns it."""
+        message = Message(role, content)
+        self.messages.append(message)
+        self._add(message, 1)
+        if len(self.messages) > self.hot_messages:
+            self._compress(self.messages[-self.hot_messages - 1])
+        return message
+
+    def prepend(self, records):
+        """Adds older messages (e.g. a page loaded from the history store) before the current first one."""
+        messages = [Message(record["role"], record["content"]) for record in records]
+        self.messages[:0] = messages
+        for message in messages:
+            self._add(message, 1)
+        self._compress_cold()
+
+    def update(self, message, content):
+        """Replaces the content of `message` (e.g. the placeholder while a reply streams in)."""
+        self._add(message, -1)
+        message._set(content)
+        self._add(message, 1)
+
+    @property
+    def has_real_messages(self):
+        return self.real_messages > 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def __delitem__(self, index):
+        removed = self.messages[index] if isinstance(index, slice) else [self.messages[index]]
+        for message in removed:
+            self._add(message, -1)
+        del self.messages[index]
+
+    def memory_report(self):
+        return memory_report([self])
+
+    def to_state(self):
+        # Plain text: the session store compresses the whole field, which beats per-message blobs in base64
+        return {"hot_messages": self.hot_messages, "messages": [[message.role, message.content] for message in self]}
+
+    @classmethod
+    def from_state(cls, state):
+        conversation = cls(hot_messages=state.get("hot_messages", HOT_MESSAGES))
+        conversation.prepend({"role": role, "content": content} for role, content in state["messages"])
+        return conversation
+
+    def iter_jsonl(self):
+        """Yields one JSON line per message; only one message is decompressed at a time."""
+        for message in self.messages:
+            yield json.dumps(message.to_dict(), ensure_ascii=False) + "\n"
+
+    def to_jsonl(self):
+        return "".join(self.iter_jsonl())
+
+    @classmethod
+    def from_jsonl(cls, lines, hot_messages=HOT_MESSAGES):
+        """Reads a conversation from an iterable of JSON lines (e.g. an open file); raises ValueError on bad lines."""
+        conversation = cls(hot_messages=hot_messages)
+        for role, content in read_jsonl(lines):
+            conversation.append(role, content)
+        return conversation
+
+
+def memory_report(conversations):
+    """Memory held by `conversations` next to the same messages as plain dicts, from the running totals."""
+    report = {"conversations": 0, "messages": 0, "compressed": 0, "content_bytes": 0, "stored_bytes": 0,
+              "dict_bytes": 0, "compact_bytes": 0}
+    for conversation in conversations:
+        messages = len(conversation)
+        report["conversations"] += 1
+        report["messages"] += messages
+        report["compressed"] += conversation.compressed_messages
+        report["content_bytes"] += conversation.content_bytes
+        report["stored_bytes"] += conversation.stored_bytes
+        report["dict_bytes"] += messages * (DICT_MESSAGE_BYTES + STR_OVERHEAD) + conversation.content_bytes
+        report["compact_bytes"] += (messages * SLOTS_MESSAGE_BYTES + conversation.stored_bytes
+                                    + (messages - conversation.compressed_messages) * STR_OVERHEAD
+                                    + conversation.compressed_messages * BYTES_OVERHEAD)
+    report["saved"] = 1 - report["compact_bytes"] / report["dict_bytes"] if report["dict_bytes"] else 0.0
+    return report
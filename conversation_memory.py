@@ -0,0 +1,120 @@
+import hashlib
+
+from retrieval import estimate_tokens
+
+
+def _speaker(role):
+    return "User" if role == "user" else "Assistant"
+
+
+def fit_summary(text, token_budget):
+    """Drops the oldest lines of `text` past `token_budget`, then cuts a lone overlong line to fit."""
+    lines = text.splitlines()
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > token_budget:
+        lines.pop(0)
+    text = "\n".join(lines)
+    if estimate_tokens(text) > token_budget:
+        text = text[:token_budget * 4].rsplit(" ", 1)[0]
+    return text
+
+
+def extractive_summarizer(summary, messages, token_budget):
+    """Appends one short line per folded message, dropping the oldest lines past `token_budget`."""
+    lines = summary.splitlines() if summary else []
+    for msg in messages:
+        content = " ".join(msg.content.split())
+        first_sentence = content.split(". ")[0][:160]
+        lines.append(f"- {_speaker(msg.role)}: {first_sentence}")
+    return fit_summary("\n".join(lines), token_budget)
+
+
+class ModelSummarizer:
+    """Asks the model to fold new messages into the existing summary (one call per fold).
+
+    A summary longer than `token_budget` is not trusted to be trimmed
+    sensibly: the extractive summary is used for that fold instead.
+    """
+
+    def __init__(self, model, generation_config=None):
+        self.model = model
+        self.generation_config = generation_config
+
+    def __call__(self, summary, messages, token_budget):
+        new_lines = "\n".join(f"{_speaker(msg.role)}: {msg.content}" for msg in messages)
+        prompt = (f"Update the running summary of a conversation with a CIT University assistant.\n"
+                  f"Keep it under {max(1, int(token_budget * 0.75))} words and keep names, dates, links and decisions.\n\n"
+                  f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{new_lines}\n\nUpdated summary:")
+        try:
+            response = self.model.generate_content(prompt, generation_config=self.generation_config)
+            text = response.text.strip()
+        except Exception:
+            return extractive_summarizer(summary, messages, token_budget)
+        if estimate_tokens(text) > token_budget:
+            return extractive_summarizer(summary, messages, token_budget)
+        return text
+
+
+class ConversationMemory:
+    """Context for the model: a running summary of old turns plus the last few messages verbatim.
+
+    Older messages are folded into the summary once, as they leave the recent
+    window, so the assembled context stays under `token_budget` no matter how
+    long the conversation gets. State round-trips through `to_state`/`load_state`
+    so it can live in `st.session_state`.
+    """
+
+    def __init__(self, recent_messages=6, token_budget=1200, summary_budget=400, summarizer=None):
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.summarizer = summarizer or extractive_summarizer
+        self.summary = ""
+        self.folded = 0
+        self.anchor = None
+
+    def to_state(self):
+        return {"summary": self.summary, "folded": self.folded, "anchor": self.anchor}
+
+    def load_state(self, state):
+        if state:
+            self.summary = state.get("summary", "")
+            self.folded = state.get("folded", 0)
+            self.anchor = state.get("anchor")
+        return self
+
+    @staticmethod
+    def _anchor_for(messages):
+        if not messages:
+            return None
+        return hashlib.sha1(messages[0].content.encode("utf-8")).hexdigest()
+
+    def context(self, messages, offset=0, anchor=None):
+        """Returns (context_text, token_count) for `messages` (conversation.Message records), folding any that
+        left the recent window.
+
+        `offset` is the position of `messages[0]` in the full conversation when
+        older messages are no longer held in memory; pass a stable `anchor`
+        (e.g. the conversation id) in that case, since the first message changes.
+        """
+        messages = [msg for msg in messages if not msg.is_placeholder]
+
+        # A different anchor means this state belongs to another conversation
+        anchor = anchor or self._anchor_for(messages)
+        if anchor != self.anchor or self.folded > offset + len(messages):
+            self.summary, self.folded, self.anchor = "", offset, anchor
+
+        fold_until = offset + max(0, len(messages) - self.recent_messages)
+        if fold_until > self.folded:
+            new_messages = messages[max(0, self.folded - offset):fold_until - offset]
+            # Custom summarizers may overshoot; the summary never takes more than its share of the context
+            self.summary = fit_summary(self.summarizer(self.summary, new_messages, self.summary_budget),
+                                       self.summary_budget)
+            self.folded = fold_until
+
+        recent_lines = [f"{_speaker(msg.role)}: {msg.content}" for msg in messages[self.folded - offset:]]
+        summary_block = f"Summary of earlier conversation:\n{self.summary}\n\n" if self.summary else ""
+        while recent_lines and estimate_tokens(summary_block + "\n".join(recent_lines)) > self.token_budget:
+            recent_lines.pop(0)
+
+        text = summary_block + "\n".join(recent_lines)
+        return text, estimate_tokens(text) if text else 0
@@ -0,0 +1,355 @@
+import datetime
+import itertools
+import threading
+import time
+
+from model_client import ModelBusyError
+
+ROLE_WEIGHTS = {"Student": 1.0, "Teacher": 2.0, "Staff": 2.0}
+DAY_SECONDS = 86400
+
+
+class QuotaExceededError(Exception):
+    """Raised when a user is over their daily token quota or sending requests faster than their rate limit."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(ModelBusyError):
+    """Raised when a queued request was not given a model slot before its deadline."""
+
+
+def gcra(tat, now, interval, capacity):
+    """Generic cell rate algorithm: returns (new_tat, wait_seconds) for one more request.
+
+    `tat` is the bucket's theoretical arrival time; a bucket allows bursts of
+    `capacity` requests and refills one request every `interval` seconds.
+    """
+    new_tat = max(tat, now) + interval
+    return new_tat, new_tat - now - interval * capacity
+
+
+def seconds_until_utc_midnight(now):
+    return DAY_SECONDS - now % DAY_SECONDS
+
+
+def utc_day(now):
+    return datetime.datetime.fromtimestamp(now, tz=datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+class MemoryCounterStore:
+    """Process-local counters with expiry; limits only hold within one server process."""
+
+    def __init__(self, clock=time.time):
+        self._values = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def _live(self, key, now):
+        entry = self._values.get(key)
+        if entry is None:
+            return 0.0
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._values[key]
+            return 0.0
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key, self._clock())
+
+    def incr(self, key, amount, ttl=None):
+        with self._lock:
+            now = self._clock()
+            self._values[key] = (self._live(key, now) + amount, None if ttl is None else now + ttl)
+
+    def reserve(self, key, interval, capacity, max_wait):
+        """Takes one request from the `key` bucket; returns seconds to wait first, or None if over `max_wait`."""
+        with self._lock:
+            now = self._clock()
+            new_tat, wait = gcra(self._live(key, now), now, interval, capacity)
+            if wait > max_wait:
+                return None
+            self._values[key] = (new_tat, new_tat)
+            return max(0.0, wait)
+
+    def refund(self, key, interval):
+        """Gives back one request taken from the `key` bucket by `reserve`."""
+        with self._lock:
+            now = self._clock()
+            tat = self._live(key, now)
+            if tat > now:
+                self._values[key] = (tat - interval, tat - interval)
+
+
+class FirestoreCounterStore:
+    """Counters in Firestore (`rate_limits/{key}`), shared by every server replica.
+
+    Buckets are updated in a transaction and daily usage with an atomic
+    increment. `expires_at` is a timestamp field, so a Firestore TTL policy on
+    it can delete old documents.
+    """
+
+    def __init__(self, client=None, collection="rate_limits", clock=time.time):
+        if client is None:
+            from firebase_admin import firestore
+
+            client = firestore.client()
+        self.client = client
+        self.collection = collection
+        self._clock = clock
+
+    def _doc(self, key):
+        return self.client.collection(self.collection).document(key.replace("/", "_"))
+
+    @staticmethod
+    def _timestamp(seconds):
+        return datetime.datetime.fromtimestamp(seconds, tz=datetime.timezone.utc)
+
+    def _value(self, snapshot, now):
+        data = snapshot.to_dict() if snapshot.exists else None
+        if not data or (data.get("expires_at") is not None and data["expires_at"].timestamp() <= now):
+            return 0.0
+        return float(data.get("value", 0))
+
+    def get(self, key):
+        return self._value(self._doc(key).get(), self._clock())
+
+    def incr(self, key, amount, ttl=None):
+        from google.cloud.firestore import Increment
+
+        fields = {"value": Increment(amount)}
+        if ttl is not None:
+            fields["expires_at"] = self._timestamp(self._clock() + ttl)
+        self._doc(key).set(fields, merge=True)
+
+    def reserve(self, key, interval, capacity, max_wait):
+        from google.cloud import firestore
+
+        doc = self._doc(key)
+
+        @firestore.transactional
+        def take(transaction):
+            now = self._clock()
+            new_tat, wait = gcra(self._value(doc.get(transaction=transaction), now), now, interval, capacity)
+            if wait > max_wait:
+                return None
+            transaction.set(doc, {"value": new_tat, "expires_at": self._timestamp(new_tat)})
+            return max(0.0, wait)
+
+        return take(self.client.transaction())
+
+    def refund(self, key, interval):
+        from google.cloud import firestore
+
+        doc = self._doc(key)
+
+        @firestore.transactional
+        def give_back(transaction):
+            now = self._clock()
+            tat = self._value(doc.get(transaction=transaction), now)
+            if tat > now:
+                transaction.set(doc, {"value": tat - interval, "expires_at": self._timestamp(tat - interval)})
+
+        give_back(self.client.transaction())
+
+
+class Ticket:
+    """One request waiting for, or holding, a model slot."""
+
+    __slots__ = ("uid", "role", "cost", "start_tag", "finish_tag", "seq", "ready_at", "queued_at", "granted")
+
+    def __init__(self, uid, role, cost, start_tag, finish_tag, seq, ready_at, queued_at):
+        self.uid = uid
+        self.role = role
+        self.cost = cost
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.seq = seq
+        self.ready_at = ready_at
+        self.queued_at = queued_at
+        self.granted = False
+
+    @property
+    def order(self):
+        return (self.finish_tag, self.seq)
+
+
+class FairScheduler:
+    """Admits model calls per user (`uid`) and role.
+
+    Before queueing, a request is checked against the user's daily token
+    quota (`daily_tokens`, an int or a per-role dict) and takes one request
+    from the user's token bucket (`user_rate` per second, bursts of
+    `user_burst`); a request that would have to wait more than
+    `max_rate_wait` seconds for its bucket is refused, and a request that
+    times out or is abandoned before it gets a slot gives its bucket request
+    back. Both counters live in `store`, so with a shared store the limits
+    hold across replicas.
+
+    Admitted requests wait for one of this process's `max_concurrent` slots in
+    weighted fair queueing order: each is tagged with its user's previous
+    finish tag (or the current virtual time, if later) plus `cost / weight`,
+    and the lowest tag goes next. A user who sends many requests only delays
+    their own, and Teacher/Staff requests (weight 2) get twice the share.
+    """
+
+    def __init__(self, store=None, max_concurrent=4, user_rate=0.2, user_burst=5, max_rate_wait=30.0,
+                 daily_tokens=None, weights=None, clock=time.time):
+        self.store = store if store is not None else MemoryCounterStore(clock=clock)
+        self.max_concurrent = max_concurrent
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_rate_wait = max_rate_wait
+        self.daily_tokens = daily_tokens
+        self.weights = dict(ROLE_WEIGHTS if weights is None else weights)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._queue = []
+        self._active = 0
+        self._virtual_time = 0.0
+        self._finish_tags = {}
+        self._seq = itertools.count()
+        self.stats = {"admitted": 0, "queued": 0, "rate_limited": 0, "quota_rejections": 0, "rate_rejections": 0,
+                      "timeouts": 0, "refunds": 0, "max_queue": 0}
+
+    def quota_for(self, role):
+        if isinstance(self.daily_tokens, dict):
+            return self.daily_tokens.get(role)
+        return self.daily_tokens
+
+    @staticmethod
+    def _usage_key(uid, now):
+        return f"tokens:{uid}:{utc_day(now)}"
+
+    def usage(self, uid):
+        """Tokens `uid` has used today (UTC)."""
+        return self.store.get(self._usage_key(uid, self._clock()))
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queue)
+
+    def _position(self, ticket, now):
+        # Only tickets past their bucket wait compete for a slot
+        return 1 + sum(1 for other in self._queue if other.ready_at <= now and other.order < ticket.order)
+
+    def position(self, ticket):
+        """1-based place of a waiting ticket among the requests ready for a slot (0 once it holds one)."""
+        with self._cond:
+            if ticket.granted:
+                return 0
+            return self._position(ticket, self._clock())
+
+    def _check_limits(self, uid, role, now):
+        quota = self.quota_for(role)
+        if quota and self.store.get(self._usage_key(uid, now)) >= quota:
+            self.stats["quota_rejections"] += 1
+            raise QuotaExceededError(f"Daily limit of {quota:,} tokens reached",
+                                     retry_after=seconds_until_utc_midnight(now))
+        if not self.user_rate:
+            return 0.0
+        wait = self.store.reserve(f"bucket:{uid}", 1.0 / self.user_rate, self.user_burst, self.max_rate_wait)
+        if wait is None:
+            self.stats["rate_rejections"] += 1
+            raise QuotaExceededError("Too many requests in a short time", retry_after=self.max_rate_wait)
+        return wait
+
+    def _dispatch(self, now):
+        """Grants free slots to ready tickets, lowest finish tag first. Caller holds the lock."""
+        while self._active < self.max_concurrent:
+            ready = [ticket for ticket in self._queue if ticket.ready_at <= now]
+            if not ready:
+                return
+            ticket = min(ready, key=lambda t: t.order)
+            self._queue.remove(ticket)
+            ticket.granted = True
+            self._active += 1
+            self._virtual_time = max(self._virtual_time, ticket.start_tag)
+            self._cond.notify_all()
+
+    def acquire(self, uid, role, cost=1.0, timeout=60.0, on_queued=None, on_rate_limited=None):
+        """Blocks until the request may call the model and returns its Ticket; pass it to `release`.
+
+        `on_rate_limited(seconds)` is called from this thread when the request
+        first has to wait for its user's token bucket, and `on_queued(position)`
+        whenever its place among the requests waiting for a slot changes.
+        Raises QuotaExceededError or, after `timeout` seconds, QueueTimeoutError.
+        """
+        now = self._clock()
+        wait = self._check_limits(uid, role, now)
+        with self._cond:
+            start_tag = max(self._virtual_time, self._finish_tags.get(uid, 0.0))
+            finish_tag = start_tag + max(cost, 1.0) / self.weights.get(role, 1.0)
+            self._finish_tags[uid] = finish_tag
+            ticket = Ticket(uid, role, cost, start_tag, finish_tag, next(self._seq), now + wait, now)
+            self._queue.append(ticket)
+            self.stats["max_queue"] = max(self.stats["max_queue"], len(self._queue))
+            self._dispatch(now)
+
+        deadline = now + timeout
+        reported = None
+        rate_limited = queued = False
+        try:
+            while True:
+                with self._cond:
+                    now = self._clock()
+                    self._dispatch(now)
+                    if ticket.granted:
+                        break
+                    if now >= deadline:
+                        self.stats["timeouts"] += 1
+                        raise QueueTimeoutError(f"No model slot became free within {timeout:.0f} s")
+                    # 0 while the request waits for its own bucket rather than for other users
+                    position = 0 if ticket.ready_at > now else self._position(ticket, now)
+                if position != reported:
+                    reported = position
+                    if position == 0:
+                        rate_limited = True
+                        if on_rate_limited is not None:
+                            on_rate_limited(ticket.ready_at - now)
+                    else:
+                        queued = True
+                        if on_queued is not None:
+                            on_queued(position)
+                with self._cond:
+                    if not ticket.granted:
+                        wake_at = min([deadline] + [t.ready_at for t in self._queue if t.ready_at > now])
+                        self._cond.wait(timeout=min(1.0, max(0.01, wake_at - now)))
+        except BaseException:
+            # Timed out, or the caller was interrupted (e.g. the user pressed Stop while waiting)
+            with self._cond:
+                granted = ticket.granted
+                if not granted:
+                    self._queue.remove(ticket)
+            if granted:
+                self.release(ticket)
+            elif self.user_rate:
+                self._refund(uid)
+            raise
+        self.stats["admitted"] += 1
+        self.stats["rate_limited"] += rate_limited
+        self.stats["queued"] += queued
+        return ticket
+
+    def _refund(self, uid):
+        try:
+            self.store.refund(f"bucket:{uid}", 1.0 / self.user_rate)
+        except Exception:
+            return  # Never hide the timeout or interruption being handled behind a store error
+        self.stats["refunds"] += 1
+
+    def release(self, ticket, tokens_used=0):
+        """Frees the ticket's slot and adds `tokens_used` (from the response's usage metadata) to today's usage."""
+        now = self._clock()
+        with self._cond:
+            self._active -= 1
+            if not self._queue and not self._active:
+                self._finish_tags.clear()  # Idle: every user starts again from the current virtual time
+            self._dispatch(now)
+            self._cond.notify_all()
+        if tokens_used:
+            self.store.incr(self._usage_key(ticket.uid, now), tokens_used, ttl=2 * DAY_SECONDS)
@@ -0,0 +1,83 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+
+def default_reply(prompt):
+    """Deterministic canned answer derived from the last line of the prompt."""
+    lines = [line for line in prompt.strip().splitlines() if line.strip() and line.strip() != "Assistant:"]
+    question = lines[-1] if lines else ""
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    return (f"This is a simulated CIT Assistant reply ({digest}). "
+            f"You asked about: {question[:200]} "
+            "Please contact info@cit.edu or visit https://cit.edu/ for official details.")
+
+
+def _contents_text(contents):
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, dict):
+        return " ".join(_contents_text(part) for part in contents.get("parts", []))
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_contents_text(part) for part in contents)
+    return str(contents)
+
+
+class FakeResponse:
+    """Mimics `GenerateContentResponse`: `.text`, `.usage_metadata` and chunk iteration when streamed."""
+
+    def __init__(self, text, prompt_tokens, chunk_words=4, first_token_latency=0.0, chunk_delay=0.0):
+        self.text = text
+        words = text.split(" ")
+        self._chunks = [" ".join(words[i:i + chunk_words]) + (" " if i + chunk_words < len(words) else "")
+                        for i in range(0, len(words), chunk_words)]
+        self._first_token_latency = first_token_latency
+        self._chunk_delay = chunk_delay
+        output_tokens = max(1, len(text) // 4)
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._chunks):
+            time.sleep(self._first_token_latency if i == 0 else self._chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+    def resolve(self):
+        return self
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for `genai.GenerativeModel` with configurable latency.
+
+    `reply` may be a string or a callable taking the flattened prompt text.
+    """
+
+    def __init__(self, model_name="fake-gemini", reply=None, latency=0.0, first_token_latency=None,
+                 chunk_delay=0.0, chunk_words=4, system_instruction=None, error=None):
+        self.model_name = model_name
+        self.reply = reply or default_reply
+        self.latency = latency
+        self.first_token_latency = latency if first_token_latency is None else first_token_latency
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.system_instruction = system_instruction
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.error is not None:
+            raise self.error
+        prompt = _contents_text(contents)
+        text = self.reply(prompt) if callable(self.reply) else self.reply
+        prompt_tokens = max(1, (len(prompt) + len(self.system_instruction or "")) // 4)
+        if stream:
+            return FakeResponse(text, prompt_tokens, self.chunk_words, self.first_token_latency, self.chunk_delay)
+        time.sleep(self.latency)
+        return FakeResponse(text, prompt_tokens, self.chunk_words)
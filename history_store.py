@@ -0,0 +1,325 @@
+import atexit
+import collections
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+
+def new_conversation_id():
+    return uuid.uuid4().hex
+
+
+def is_permanent(error):
+    """True for errors a retry cannot fix (a malformed or oversized write), as opposed to outages and quotas."""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return isinstance(error, (ValueError, TypeError))
+    return isinstance(error, (ValueError, TypeError, exceptions.InvalidArgument, exceptions.FailedPrecondition))
+
+
+class SQLiteHistoryStore:
+    """Chat history in a local SQLite file, for development, tests and offline use."""
+
+    def __init__(self, path="chat_history.sqlite3"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "uid TEXT, id TEXT, user_role TEXT, created_at REAL, updated_at REAL, message_count INTEGER DEFAULT 0, "
+                "PRIMARY KEY (uid, id));"
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "uid TEXT, conversation_id TEXT, seq INTEGER, role TEXT, content TEXT, created_at REAL, "
+                "PRIMARY KEY (uid, conversation_id, seq));"
+            )
+
+    def write_batch(self, operations):
+        with self._lock, self._conn:
+            for operation in operations:
+                kind, uid, conversation_id = operation[:3]
+                if kind == "create":
+                    user_role, timestamp = operation[3:]
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO conversations (uid, id, user_role, created_at, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (uid, conversation_id, user_role, timestamp, timestamp),
+                    )
+                elif kind == "append":
+                    seq, role, content, timestamp = operation[3:]
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)",
+                        (uid, conversation_id, seq, role, content, timestamp),
+                    )
+                    self._conn.execute(
+                        "UPDATE conversations SET updated_at = ?, message_count = MAX(message_count, ?) "
+                        "WHERE uid = ? AND id = ?",
+                        (timestamp, seq + 1, uid, conversation_id),
+                    )
+                elif kind == "delete":
+                    self._conn.execute("DELETE FROM messages WHERE uid = ? AND conversation_id = ?",
+                                       (uid, conversation_id))
+                    self._conn.execute("DELETE FROM conversations WHERE uid = ? AND id = ?", (uid, conversation_id))
+                elif kind == "delete_all":
+                    self._conn.execute("DELETE FROM messages WHERE uid = ?", (uid,))
+                    self._conn.execute("DELETE FROM conversations WHERE uid = ?", (uid,))
+
+    def list_conversations(self, uid, limit=20):
+        """Most recently updated conversations first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, user_role, message_count FROM conversations WHERE uid = ? "
+                "ORDER BY updated_at DESC LIMIT ?",
+                (uid, limit),
+            ).fetchall()
+        return [{"id": row[0], "user_role": row[1], "message_count": row[2]} for row in rows]
+
+    def load_messages(self, uid, conversation_id, limit=50, before_seq=None):
+        """Returns `(messages, first_seq)` for the `limit` messages preceding `before_seq`, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages WHERE uid = ? AND conversation_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (uid, conversation_id, before_seq if before_seq is not None else 2 ** 62, limit),
+            ).fetchall()
+        rows.reverse()
+        first_seq = rows[0][0] if rows else (before_seq or 0)
+        return [{"role": role, "content": content} for _, role, content in rows], first_seq
+
+
+class FirestoreHistoryStore:
+    """Chat history in Firestore: users/{uid}/conversations/{id}/messages/{seq}."""
+
+    MAX_BATCH_WRITES = 450  # Firestore allows 500 writes per batch
+
+    def __init__(self, client=None, root_collection="users"):
+        if client is None:
+            from firebase_admin import firestore
+
+            client = firestore.client()
+        self.client = client
+        self.root_collection = root_collection
+
+    def _conversations(self, uid):
+        return self.client.collection(self.root_collection).document(uid).collection("conversations")
+
+    def _delete_conversation(self, conversation_ref):
+        while True:
+            docs = list(conversation_ref.collection("messages").limit(self.MAX_BATCH_WRITES).stream())
+            if not docs:
+                break
+            batch = self.client.batch()
+            for doc in docs:
+                batch.delete(doc.reference)
+            batch.commit()
+        conversation_ref.delete()
+
+    def write_batch(self, operations):
+        """Applies `operations`; safe to repeat after a failure, like SQLiteHistoryStore.write_batch.
+
+        `message_count` is the highest stored seq + 1 (a Maximum transform, not
+        an Increment), so a retried batch does not count its messages twice.
+        """
+        from google.cloud.firestore import Maximum
+
+        batch = self.client.batch()
+        pending = 0
+        counts = {}
+        latest = {}
+
+        def commit_if_full(batch, pending):
+            if pending >= self.MAX_BATCH_WRITES:
+                batch.commit()
+                return self.client.batch(), 0
+            return batch, pending
+
+        for operation in operations:
+            kind, uid, conversation_id = operation[:3]
+            if kind == "create":
+                user_role, timestamp = operation[3:]
+                batch.set(self._conversations(uid).document(conversation_id),
+                          {"user_role": user_role, "created_at": timestamp, "updated_at": Maximum(timestamp),
+                           "message_count": Maximum(0)}, merge=True)
+                pending += 1
+            elif kind == "append":
+                seq, role, content, timestamp = operation[3:]
+                message_ref = self._conversations(uid).document(conversation_id).collection("messages")
+                batch.set(message_ref.document(f"{seq:010d}"),
+                          {"seq": seq, "role": role, "content": content, "created_at": timestamp})
+                counts[(uid, conversation_id)] = max(counts.get((uid, conversation_id), 0), seq + 1)
+                latest[(uid, conversation_id)] = timestamp
+                pending += 1
+            elif kind == "delete":
+                if pending:
+                    batch.commit()
+                batch, pending = self.client.batch(), 0
+                counts.pop((uid, conversation_id), None)
+                self._delete_conversation(self._conversations(uid).document(conversation_id))
+            elif kind == "delete_all":
+                if pending:
+                    batch.commit()
+                batch, pending = self.client.batch(), 0
+                for key in [key for key in counts if key[0] == uid]:
+                    del counts[key]
+                for conversation in self._conversations(uid).stream():
+                    self._delete_conversation(conversation.reference)
+            batch, pending = commit_if_full(batch, pending)
+
+        # One metadata update per conversation per batch rather than per message
+        for (uid, conversation_id), count in counts.items():
+            batch.set(self._conversations(uid).document(conversation_id),
+                      {"updated_at": Maximum(latest[(uid, conversation_id)]), "message_count": Maximum(count)},
+                      merge=True)
+            pending += 1
+            batch, pending = commit_if_full(batch, pending)
+        if pending:
+            batch.commit()
+
+    def list_conversations(self, uid, limit=20):
+        from google.cloud.firestore import Query
+
+        query = self._conversations(uid).order_by("updated_at", direction=Query.DESCENDING).limit(limit)
+        return [{"id": doc.id, "user_role": doc.get("user_role"), "message_count": doc.get("message_count") or 0}
+                for doc in query.stream()]
+
+    def load_messages(self, uid, conversation_id, limit=50, before_seq=None):
+        from google.cloud.firestore import Query
+
+        query = (self._conversations(uid).document(conversation_id).collection("messages")
+                 .order_by("seq", direction=Query.DESCENDING))
+        if before_seq is not None:
+            query = query.start_after({"seq": before_seq})
+        docs = list(query.limit(limit).stream())
+        docs.reverse()
+        first_seq = docs[0].get("seq") if docs else (before_seq or 0)
+        return [{"role": doc.get("role"), "content": doc.get("content")} for doc in docs], first_seq
+
+
+class WriteBehindHistoryStore:
+    """Queues writes and flushes them to `backend` in batches from a background thread.
+
+    Appends never block a chat turn. Reads flush pending writes first so a
+    session always sees its own messages. A batch that fails with a transient
+    error is retried, in order, after `retry_delay` seconds (doubling up to
+    `max_retry_delay`) at most `max_retries` times; `last_error` is set until
+    a write succeeds again. A batch rejected with a permanent error (see
+    `is_permanent`) is split until the bad operations are isolated. Operations
+    that still fail are moved to `dead_letters` with their own error, so one
+    bad write does not hold up everyone else's history.
+    """
+
+    def __init__(self, backend, batch_size=100, flush_interval=1.0, retry_delay=1.0, max_retry_delay=60.0,
+                 max_retries=8, max_dead_letters=1000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.last_error = None
+        self.dead_letters = collections.deque(maxlen=max_dead_letters)
+        self._queue = queue.Queue()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "errors": 0, "splits": 0, "dead_letters": 0}
+        threading.Thread(target=self._run, daemon=True, name="history-write-behind").start()
+        atexit.register(self.flush)
+
+    def _enqueue(self, operation):
+        with self._idle:
+            self._pending += 1
+        self.stats["queued"] += 1
+        self._queue.put(operation)
+
+    def _run(self):
+        while True:
+            operations = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(operations) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    operations.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(operations)
+
+    def _write(self, operations):
+        batches = [operations]
+        while batches:
+            batch = batches.pop()
+            error = self._write_with_retries(batch)
+            if error is None:
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                self._finish(batch, None)
+            elif is_permanent(error) and len(batch) > 1:
+                # Halves go back on the stack first half last, so they are still written in order
+                self.stats["splits"] += 1
+                middle = len(batch) // 2
+                batches += [batch[middle:], batch[:middle]]
+            else:
+                self.stats["dead_letters"] += len(batch)
+                self._finish(batch, error)
+
+    def _write_with_retries(self, batch):
+        """Writes `batch`; returns None on success or the error once it is permanent or out of retries."""
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.backend.write_batch(batch)
+                return None
+            except Exception as e:
+                self.stats["errors"] += 1
+                if is_permanent(e) or attempt == self.max_retries:
+                    return e
+                with self._idle:
+                    self.last_error = e
+                    self._idle.notify_all()
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    def _finish(self, batch, error):
+        with self._idle:
+            if error is None:
+                self.last_error = None
+            else:
+                self.dead_letters.extend((operation, error) for operation in batch)
+            self._pending -= len(batch)
+            self._idle.notify_all()
+
+    def failed_writes(self, uid):
+        """The `(operation, error)` pairs of `uid`'s writes that were given up on."""
+        with self._idle:
+            return [(operation, error) for operation, error in self.dead_letters if operation[1] == uid]
+
+    def flush(self, timeout=10.0):
+        """Blocks until every queued write is stored; returns False on `timeout` or while the backend fails."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0 or self.last_error is not None, timeout) and (
+                self._pending == 0)
+
+    def create_conversation(self, uid, user_role=None):
+        conversation_id = new_conversation_id()
+        self._enqueue(("create", uid, conversation_id, user_role, time.time()))
+        return conversation_id
+
+    def append(self, uid, conversation_id, seq, role, content):
+        self._enqueue(("append", uid, conversation_id, seq, role, content, time.time()))
+
+    def delete_conversation(self, uid, conversation_id):
+        self._enqueue(("delete", uid, conversation_id))
+
+    def delete_all(self, uid):
+        self._enqueue(("delete_all", uid, None))
+
+    def list_conversations(self, uid, limit=20):
+        self.flush()
+        return self.backend.list_conversations(uid, limit)
+
+    def load_messages(self, uid, conversation_id, limit=50, before_seq=None):
+        self.flush()
+        return self.backend.load_messages(uid, conversation_id, limit, before_seq)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json")
+
+Fact = namedtuple("Fact", ["id", "section", "label", "value", "keywords", "answer"])
+Match = namedtuple("Match", ["fact", "score"])
+Route = namedtuple("Route", ["answer", "fact", "facts"])
+
+TOKEN_RE = re.compile(r"[a-z0-9@.+-]*[a-z0-9]")
+# Words that ask *for* a fact rather than describe it; they never lower a lookup's confidence
+LOOKUP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "of", "for", "to", "in", "at", "on", "me", "my", "i", "you", "your", "our", "us",
+    "what", "whats", "where", "wheres", "which", "how", "can", "could", "do", "does", "please", "pls", "give", "tell",
+    "show", "send", "get", "find", "know", "need", "want", "hi", "hello", "hey", "thanks", "again", "it", "there",
+    "link", "url", "site", "page", "number", "no", "address", "official", "cit", "citu", "university", "school",
+    "list", "all", "offer", "offered", "available", "current",
+}
+
+
+def tokenize(text):
+    """Lower-cased word tokens with apostrophes dropped and a naive plural 's' removed."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower().replace("'", "").replace("’", "")):
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class KnowledgeBase:
+    """Versioned CIT facts loaded from JSON; the system prompt and the intent router are built from it."""
+
+    def __init__(self, data):
+        self.version = data.get("version", "0")
+        self.fingerprint = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        self.sections = []
+        self.facts = []
+        for section in data["sections"]:
+            facts = [
+                Fact(fact["id"], section["id"], fact.get("label"), fact["value"], tuple(fact.get("keywords", ())),
+                     fact.get("answer"))
+                for fact in section["facts"]
+            ]
+            self.sections.append((section["title"], facts))
+            self.facts.extend(facts)
+
+    @classmethod
+    def load(cls, path=KNOWLEDGE_BASE_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def fact_lines(fact):
+        if isinstance(fact.value, list):
+            return [f"- {item}" for item in fact.value]
+        return [f"- {fact.label}: {fact.value}" if fact.label else f"- {fact.value}"]
+
+    def render_sections(self):
+        """Markdown for the system prompt, one `## title` block per section."""
+        blocks = []
+        for title, facts in self.sections:
+            lines = [line for fact in facts for line in self.fact_lines(fact)]
+            blocks.append(f"## {title}:\n" + "\n".join(lines))
+        return "\n\n".join(blocks)
+
+    def render_facts(self, facts):
+        return "\n".join(line for fact in facts for line in self.fact_lines(fact))
+
+    @staticmethod
+    def answer_for(fact):
+        if fact.answer is None:
+            return None
+        if isinstance(fact.value, list):
+            return fact.answer.format(items="\n".join(f"- {item}" for item in fact.value))
+        return fact.answer
+
+
+class IntentRouter:
+    """Keyword-trie intent matcher that answers plain fact lookups without calling the model.
+
+    Every keyword phrase of every fact is stored in a trie over tokens. A
+    question is answered from the knowledge base only when one fact's phrases
+    cover at least `threshold` of its descriptive words (everything except
+    LOOKUP_WORDS such as "what", "link", "number") and no other fact matched.
+    Otherwise the matched facts are returned so they can be put in the prompt.
+    """
+
+    def __init__(self, knowledge_base, threshold=0.75, max_facts=3):
+        self.knowledge_base = knowledge_base
+        self.threshold = threshold
+        self.max_facts = max_facts
+        self._trie = {}
+        for fact in knowledge_base.facts:
+            for phrase in fact.keywords:
+                node = self._trie
+                for token in tokenize(phrase):
+                    node = node.setdefault(token, {})
+                node.setdefault(None, set()).add(fact.id)
+        self._facts = {fact.id: fact for fact in knowledge_base.facts}
+
+    def matches(self, query):
+        """Facts whose keyword phrases occur in `query`, best coverage first."""
+        tokens = tokenize(query)
+        descriptive = {i for i, token in enumerate(tokens) if token not in LOOKUP_WORDS}
+        covered = {}
+        for start in range(len(tokens)):
+            node = self._trie
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                for fact_id in node.get(None, ()):
+                    covered.setdefault(fact_id, set()).update(range(start, end + 1))
+        matches = [
+            Match(self._facts[fact_id], len(positions & descriptive) / len(descriptive) if descriptive else 1.0)
+            for fact_id, positions in covered.items()
+        ]
+        return sorted(matches, key=lambda match: -match.score)
+
+    def route(self, query):
+        """Returns a Route: `answer` is set for a confident lookup; `facts` are the matches either way."""
+        matches = self.matches(query)
+        facts = [match.fact for match in matches[:self.max_facts]]
+        if len(matches) == 1 and matches[0].score >= self.threshold:
+            answer = self.knowledge_base.answer_for(matches[0].fact)
+            if answer is not None:
+                return Route(answer, matches[0].fact, facts)
+        return Route(None, None, facts)
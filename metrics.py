@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from collections import deque
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _NullSpan:
+    """Returned by a disabled `Metrics` so instrumented code pays only for a method call."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times a `with` block and records it under `stage`; an exception also counts as a stage error."""
+
+    __slots__ = ("metrics", "stage", "started_at", "seconds")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self.seconds = None
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started_at
+        self.metrics.observe(self.stage, self.seconds)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.metrics.inc(f"{self.stage}_errors")
+        return False
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a ring buffer of recent samples for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantiles(self, quantiles=QUANTILES):
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: None for q in quantiles}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+
+class Metrics:
+    """In-process spans, per-stage histograms and counters for the chat hot path.
+
+    Everything lives in memory: histograms keep cumulative buckets and the last
+    `window` samples per stage, and `events` is a ring buffer of the most recent
+    spans. `to_prometheus()` and `to_json()` expose the same data for scraping
+    or the admin page. With `enabled=False` every call returns immediately.
+    """
+
+    def __init__(self, enabled=True, window=1024, buckets=DEFAULT_BUCKETS, clock=time.time):
+        self.enabled = enabled
+        self.window = window
+        self.buckets = buckets
+        self._clock = clock
+        self.histograms = {}
+        self.counters = {}
+        self.events = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def span(self, stage):
+        """`with metrics.span("prompt_assembly"): ...`"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    def observe(self, stage, seconds):
+        if not self.enabled or seconds is None:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets, self.window)
+            histogram.observe(seconds)
+            self.events.append((self._clock(), stage, seconds))
+
+    def inc(self, counter, amount=1):
+        if not self.enabled or not amount:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def summary(self):
+        """Per-stage count, mean and p50/p95/p99 (over the recent window) in seconds, plus counters."""
+        with self._lock:
+            stages = {}
+            for stage, histogram in sorted(self.histograms.items()):
+                quantiles = histogram.quantiles()
+                stages[stage] = {
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": quantiles[0.5],
+                    "p95": quantiles[0.95],
+                    "p99": quantiles[0.99],
+                }
+            return {"stages": stages, "counters": dict(sorted(self.counters.items()))}
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2)
+
+    def to_prometheus(self, prefix="chatbot"):
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            for counter, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{counter}_total counter")
+                lines.append(f"{prefix}_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,232 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ModelBusyError(Exception):
+    """Raised when a request could not be completed within its deadline or retry budget."""
+
+
+def is_retryable(error):
+    """True for rate-limit (429) and transient server (5xx) errors from the Gemini SDK or HTTP clients."""
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    code = getattr(code, "value", code)  # grpc.StatusCode-style enums
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    name = type(error).__name__
+    return name in {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout", "BadGateway"}
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens=1.0):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, timeout=None, tokens=1.0):
+        """Blocks until a token is available; returns False if `timeout` seconds pass first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class ModelClient:
+    """Shared gateway for all model calls in the process.
+
+    Calls run on a bounded thread pool behind a global concurrency limit and a
+    token-bucket rate limiter. 429/5xx errors are retried with jittered
+    exponential backoff, every request has a deadline, and identical prompts
+    already in flight share a single call.
+    """
+
+    def __init__(self, max_concurrency=8, requests_per_second=5.0, burst=10, max_retries=3,
+                 base_delay=0.5, max_delay=8.0, timeout=30.0, max_workers=None):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max_concurrency * 4,
+                                            thread_name_prefix="model-client")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "retries": 0, "timeouts": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self, deadline):
+        if not self.rate_limiter.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise ModelBusyError("Rate limit: no request slot became available before the deadline")
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise ModelBusyError("Too many requests in flight; timed out waiting for a free slot")
+
+    def _with_retries(self, call, deadline):
+        """Runs `call()` inside a concurrency slot, retrying retryable errors until `deadline`."""
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            try:
+                self._count("calls")
+                return call()
+            except Exception as error:
+                if not is_retryable(error) or attempt >= self.max_retries:
+                    self._count("errors")
+                    raise
+                delay = self._backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    self._count("errors")
+                    raise ModelBusyError(f"Model still unavailable before the deadline: {error}") from error
+            finally:
+                self._slots.release()
+            self._count("retries")
+            time.sleep(delay)
+            attempt += 1
+
+    def _request_options(self, deadline):
+        return {"timeout": max(0.1, deadline - time.monotonic())}
+
+    def submit(self, model, contents, generation_config=None, timeout=None):
+        """Schedules a non-streaming call and returns a Future; identical in-flight calls share one Future."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        key = (id(model), repr(contents), repr(generation_config))
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+
+            def call():
+                return self._with_retries(
+                    lambda: model.generate_content(contents, generation_config=generation_config,
+                                                   request_options=self._request_options(deadline)),
+                    deadline,
+                )
+
+            future = self._executor.submit(call)
+            self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def generate(self, model, contents, generation_config=None, timeout=None):
+        """Blocking call with the client's limits, retries and deadline."""
+        timeout = timeout or self.timeout
+        try:
+            return self.submit(model, contents, generation_config, timeout).result(timeout=timeout)
+        except FutureTimeoutError as error:
+            self._count("timeouts")
+            raise ModelBusyError(f"The model did not answer within {timeout:.0f} s") from error
+
+    async def agenerate(self, model, contents, generation_config=None, timeout=None):
+        """Asyncio flavour of `generate`."""
+        future = self.submit(model, contents, generation_config, timeout)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+
+    def bind(self, model):
+        """Returns a drop-in replacement for `model` whose calls go through this client."""
+        return ManagedModel(self, model)
+
+
+class ManagedModel:
+    """Wraps a GenerativeModel so `generate_content` (streaming or not) respects the client's limits."""
+
+    def __init__(self, client, model):
+        self.client = client
+        self.model = model
+
+    def generate_content(self, contents, generation_config=None, stream=False, **kwargs):
+        if stream:
+            return ManagedStream(self.client, self.model, contents, generation_config)
+        return self.client.generate(self.model, contents, generation_config)
+
+
+class ManagedStream:
+    """Streaming response that holds a concurrency slot while chunks are being read."""
+
+    def __init__(self, client, model, contents, generation_config):
+        self.client = client
+        self.model = model
+        self.contents = contents
+        self.generation_config = generation_config
+        self.usage_metadata = None
+
+    def __iter__(self):
+        client = self.client
+        deadline = time.monotonic() + client.timeout
+        attempt = 0
+        while True:
+            client._acquire(deadline)
+            first_chunk_sent = False
+            try:
+                client._count("calls")
+                response = self.model.generate_content(
+                    self.contents, generation_config=self.generation_config, stream=True,
+                    request_options=client._request_options(deadline),
+                )
+                for chunk in response:
+                    first_chunk_sent = True
+                    yield chunk
+                self.usage_metadata = getattr(response, "usage_metadata", None)
+                return
+            except Exception as error:
+                # Once text has reached the user the stream cannot be replayed transparently
+                if first_chunk_sent or not is_retryable(error) or attempt >= client.max_retries:
+                    client._count("errors")
+                    raise
+                delay = client._backoff(attempt)
+                if time.monotonic() + delay >= deadline:
+                    client._count("errors")
+                    raise ModelBusyError(f"Model still unavailable before the deadline: {error}") from error
+            finally:
+                client._slots.release()
+            client._count("retries")
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,213 @@
+import re
+from collections import namedtuple
+
+# Costs are USD per million tokens
+ModelTier = namedtuple("ModelTier", ["name", "model", "max_output_tokens", "temperature", "top_p", "input_cost",
+                                     "output_cost"])
+RouteDecision = namedtuple("RouteDecision", ["tier", "score", "reasons"])
+
+DEFAULT_TIERS = (
+    ModelTier("light", "gemini-2.5-flash-lite", 512, 0.3, 0.9, 0.10, 0.40),
+    ModelTier("strong", "gemini-3-flash-preview", 1024, 0.7, 0.95, 0.50, 3.00),
+)
+DEFAULT_ROLE_BIAS = {"Teacher": 0.2, "Staff": 0.2}
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+# Words that ask for reasoning, writing or analysis rather than a quick fact
+COMPLEX_WORDS = {
+    "explain", "why", "compare", "comparison", "difference", "differences", "analyze", "analyse", "analysis",
+    "evaluate", "summarize", "summarise", "summary", "essay", "draft", "write", "outline", "plan", "calculate",
+    "compute", "solve", "debug", "prove", "derive", "pros", "cons", "recommend", "strategy", "justify", "critique",
+}
+HEDGE_RE = re.compile(
+    r"\b(i'?m not (sure|certain)|i am not (sure|certain)|i (don't|do not) (know|have (enough|specific|any|that|this) "
+    r"information)|i('m| am) (unable|not able) to|i (can't|cannot) (answer|determine|find|help)|"
+    r"unable to (answer|determine|find)|not enough information|beyond my knowledge)"
+)
+
+
+def generation_config(tier):
+    """Plain dict form of `genai.types.GenerationConfig` for one tier."""
+    return {"temperature": tier.temperature, "max_output_tokens": tier.max_output_tokens, "top_p": tier.top_p}
+
+
+def call_cost(tier, prompt_tokens, output_tokens):
+    """USD cost of one call on `tier`."""
+    return ((prompt_tokens or 0) * tier.input_cost + (output_tokens or 0) * tier.output_cost) / 1_000_000
+
+
+def tiers_from_settings(tier_settings, defaults=DEFAULT_TIERS):
+    """ModelTiers from a list of dicts (e.g. `[[model_cascade.tiers]]` in secrets), cheapest first.
+
+    Missing keys fall back to the default tier of the same name.
+    """
+    by_name = {tier.name: tier for tier in defaults}
+    tiers = []
+    for settings in tier_settings:
+        base = by_name.get(settings["name"], defaults[-1])
+        tiers.append(ModelTier(
+            settings["name"],
+            settings.get("model", base.model),
+            int(settings.get("max_output_tokens", base.max_output_tokens)),
+            float(settings.get("temperature", base.temperature)),
+            float(settings.get("top_p", base.top_p)),
+            float(settings.get("input_cost_per_million", base.input_cost)),
+            float(settings.get("output_cost_per_million", base.output_cost)),
+        ))
+    return tuple(tiers)
+
+
+def response_text(response):
+    # Gemini raises ValueError for responses without text parts (e.g. blocked by safety filters)
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
+
+
+def was_truncated(response):
+    """True when the model stopped because it hit `max_output_tokens`."""
+    for candidate in getattr(response, "candidates", None) or ():
+        reason = getattr(candidate, "finish_reason", None)
+        if getattr(reason, "name", reason) in ("MAX_TOKENS", 2):
+            return True
+    return False
+
+
+class CascadeRouter:
+    """Sends each query to the cheapest model tier likely to answer it well, escalating weak answers.
+
+    `classify` scores a query: up to 1.0 for length (between `short_words`
+    and `long_words` words), `intent_weight` for words that ask for
+    reasoning or writing, `multi_part_weight` for several questions in one
+    message, `document_weight` when PDF excerpts must be read, plus the role's
+    `role_bias`. Tier `i + 1` is chosen once the score reaches
+    `thresholds[i]`, so one threshold per tier after the first.
+
+    `generate` and `stream` call the chosen tier and, with `escalate`, retry
+    on the next tier when the answer is empty, truncated or opens with a
+    hedge ("I'm not sure..."). A streamed answer is held back until its first
+    `confidence_window` characters have arrived, so an escalated attempt never
+    reaches the user; truncation is only detected without streaming.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, thresholds=(0.5,), short_words=12, long_words=60, intent_weight=0.6,
+                 multi_part_weight=0.3, document_weight=1.0, role_bias=None, escalate=True, confidence_window=200):
+        if len(thresholds) != len(tiers) - 1:
+            raise ValueError(f"{len(tiers)} tiers need {len(tiers) - 1} threshold(s), got {len(thresholds)}")
+        self.tiers = tuple(tiers)
+        self.thresholds = tuple(thresholds)
+        self.short_words = short_words
+        self.long_words = long_words
+        self.intent_weight = intent_weight
+        self.multi_part_weight = multi_part_weight
+        self.document_weight = document_weight
+        self.role_bias = dict(DEFAULT_ROLE_BIAS if role_bias is None else role_bias)
+        self.escalate = escalate
+        self.confidence_window = confidence_window
+        self.stats = {f"routed_{tier.name}": 0 for tier in self.tiers}
+        self.stats["escalations"] = 0
+        self.stats["errors"] = 0
+
+    def classify(self, user_message, user_role="Student", pdf_context=""):
+        words = WORD_RE.findall(user_message.lower().replace("’", "'"))
+        score = 0.0
+        reasons = []
+        length = (len(words) - self.short_words) / max(1, self.long_words - self.short_words)
+        if length > 0:
+            score += min(1.0, length)
+            reasons.append("long")
+        if COMPLEX_WORDS.intersection(words):
+            score += self.intent_weight
+            reasons.append("complex")
+        if user_message.count("?") > 1:
+            score += self.multi_part_weight
+            reasons.append("multi-part")
+        if pdf_context:
+            score += self.document_weight
+            reasons.append("document")
+        if self.role_bias.get(user_role):
+            score += self.role_bias[user_role]
+            reasons.append("role")
+        level = sum(1 for threshold in self.thresholds if score >= threshold)
+        return RouteDecision(self.tiers[level], score, tuple(reasons))
+
+    def is_low_confidence(self, text, truncated=False):
+        opening = text[:self.confidence_window].strip().lower().replace("’", "'")
+        return not opening or truncated or HEDGE_RE.search(opening) is not None
+
+    def attempts(self, decision):
+        """Tiers to try for `decision`, in order: the chosen one and, with escalation, every stronger one."""
+        start = self.tiers.index(decision.tier)
+        return self.tiers[start:] if self.escalate else self.tiers[start:start + 1]
+
+    def _record(self, tier, stats, escalated):
+        self.stats[f"routed_{tier.name}"] += 1
+        if stats is not None:
+            stats.model_tier = tier.name
+            stats.escalated = escalated
+
+    def generate(self, decision, call, stats=None):
+        """Returns the first confident response of `call(tier)` along the decision's attempts.
+
+        An error from any but the last tier (model not found, quota, outage)
+        is counted and the next tier is tried; the last tier's error is raised.
+        """
+        tiers = self.attempts(decision)
+        escalated = False
+        for i, tier in enumerate(tiers):
+            if i == len(tiers) - 1:
+                response = call(tier)
+            else:
+                try:
+                    response = call(tier)
+                except Exception:
+                    self.stats["errors"] += 1
+                    continue
+            if i == len(tiers) - 1 or not self.is_low_confidence(response_text(response), was_truncated(response)):
+                self._record(tier, stats, escalated=escalated)
+                return response
+            self.stats["escalations"] += 1
+            escalated = True
+
+    def stream(self, decision, open_stream, stats=None):
+        """Yields the text chunks of the first confident stream `open_stream(tier)` along the decision's attempts.
+
+        Abandoned streams are closed, which releases their model slot. As in
+        `generate`, a tier that fails before its first `confidence_window`
+        characters arrive is skipped unless it is the last one.
+        """
+        tiers = self.attempts(decision)
+        escalated = False
+        for i, tier in enumerate(tiers):
+            held = []
+            if i == len(tiers) - 1:
+                chunks = open_stream(tier)
+            else:
+                chunks = None
+                try:
+                    chunks = open_stream(tier)
+                    size = 0
+                    for chunk in chunks:
+                        held.append(chunk)
+                        size += len(chunk)
+                        if size >= self.confidence_window:
+                            break
+                except Exception:
+                    if chunks is not None:
+                        chunks.close()
+                    self.stats["errors"] += 1
+                    if stats is not None:
+                        stats.discard_output()
+                    continue
+                if self.is_low_confidence("".join(held)):
+                    chunks.close()
+                    self.stats["escalations"] += 1
+                    escalated = True
+                    if stats is not None:
+                        stats.discard_output()
+                    continue
+            self._record(tier, stats, escalated=escalated)
+            yield from held
+            yield from chunks
+            return
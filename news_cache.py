@@ -0,0 +1,164 @@
+import threading
+import time
+
+import requests
+
+CIT_NEWS_URL = "https://cit.edu/news-and-updates/"
+USER_AGENT = "Mozilla/5.0"
+
+
+def parse_news(html, limit=5):
+    """Extracts the first `limit` news titles from the CIT news page."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    news_items = soup.find_all(["h2", "h3"], class_="entry-title")
+    return [item.get_text(strip=True) for item in news_items[:limit]]
+
+
+class CircuitBreaker:
+    """Stops calling a failing site for `reset_timeout` seconds after repeated errors."""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._clock() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                # Re-opening from half_open restarts the cool-down window
+                self._opened_at = self._clock()
+
+
+class NewsCache:
+    """Process-wide cache of CIT news headlines.
+
+    Fresh entries are served directly. Once `ttl` has passed the stale entry is
+    still served (up to `max_stale` seconds) while a background thread
+    revalidates it with a conditional GET, so chat turns never wait on cit.edu.
+    """
+
+    def __init__(
+        self,
+        url=CIT_NEWS_URL,
+        ttl=600.0,
+        max_stale=86400.0,
+        timeout=5.0,
+        limit=5,
+        session=None,
+        breaker=None,
+        clock=time.monotonic,
+    ):
+        self.url = url
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.limit = limit
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", USER_AGENT)
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._news = []
+        self._fetched_at = None
+        self._etag = None
+        self._last_modified = None
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0, "not_modified": 0, "errors": 0}
+
+    def get(self):
+        """Returns the cached news in the same shape as `scrape_cit_info`, never blocking on HTTP."""
+        with self._lock:
+            news = list(self._news)
+            fetched_at = self._fetched_at
+
+        if fetched_at is None:
+            self.stats["misses"] += 1
+            self.refresh_async()
+            return {"status": "error", "news": []}
+
+        age = self._clock() - fetched_at
+        if age > self.ttl:
+            self.refresh_async()
+            if age > self.ttl + self.max_stale:
+                self.stats["misses"] += 1
+                return {"status": "error", "news": []}
+            self.stats["stale_hits"] += 1
+        else:
+            self.stats["hits"] += 1
+
+        return {"status": "success" if news else "error", "news": news, "age": age}
+
+    def refresh_async(self):
+        """Starts a background revalidation unless one is already running or the breaker is open."""
+        with self._lock:
+            if self._refreshing or not self.breaker.allow():
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def refresh(self):
+        """Fetches the news page synchronously, honouring ETag/Last-Modified. Returns True on success."""
+        if not self.breaker.allow():
+            return False
+
+        headers = {}
+        with self._lock:
+            if self._etag:
+                headers["If-None-Match"] = self._etag
+            if self._last_modified:
+                headers["If-Modified-Since"] = self._last_modified
+
+        self.stats["fetches"] += 1
+        try:
+            response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                self.stats["not_modified"] += 1
+                with self._lock:
+                    self._fetched_at = self._clock()
+            elif response.status_code == 200:
+                news = parse_news(response.text, self.limit)
+                with self._lock:
+                    self._news = news
+                    self._fetched_at = self._clock()
+                    self._etag = response.headers.get("ETag")
+                    self._last_modified = response.headers.get("Last-Modified")
+            else:
+                raise requests.HTTPError(f"HTTP {response.status_code} from {self.url}")
+        except Exception:
+            self.stats["errors"] += 1
+            self.breaker.record_failure()
+            return False
+
+        self.breaker.record_success()
+        return True
@@ -0,0 +1,326 @@
+import hashlib
+import multiprocessing
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+CHUNK_SIZE = 1 << 20
+
+ExtractedPdf = namedtuple("ExtractedPdf", ["name", "digest", "pages", "status"])
+
+
+def file_digest(pdf_file, chunk_size=CHUNK_SIZE):
+    """Returns the SHA-256 of a file-like object, reading it in chunks and rewinding it."""
+    digest = hashlib.sha256()
+    pdf_file.seek(0)
+    for chunk in iter(lambda: pdf_file.read(chunk_size), b""):
+        digest.update(chunk)
+    pdf_file.seek(0)
+    return digest.hexdigest()
+
+
+def file_size(pdf_file):
+    pdf_file.seek(0, os.SEEK_END)
+    size = pdf_file.tell()
+    pdf_file.seek(0)
+    return size
+
+
+def count_pages(pdf_file):
+    import PyPDF2
+
+    return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def extract_page_range(path, start, stop, deadline=None):
+    """Process-pool task: `(page_number, compressed_text)` for pages `start..stop` of the PDF at `path`.
+
+    Stops early, returning the pages done so far, once `deadline` (a
+    `time.time()` value) has passed.
+    """
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(path)
+    pages = []
+    for number in range(start, min(stop, len(pdf_reader.pages))):
+        if deadline is not None and time.time() > deadline:
+            break
+        pages.append((number, PdfPages.compress(pdf_reader.pages[number].extract_text() or "")))
+    return pages
+
+
+class PdfPages:
+    """Extracted text of one PDF, held as one zlib-compressed blob per page.
+
+    `total_pages` is the page count of the file; `truncated` is True when
+    fewer pages were extracted because a page, size or time limit was hit.
+    """
+
+    __slots__ = ("blobs", "total_pages", "truncated")
+
+    def __init__(self, blobs, total_pages=None, truncated=False):
+        self.blobs = list(blobs)
+        self.total_pages = len(self.blobs) if total_pages is None else total_pages
+        self.truncated = truncated
+
+    @staticmethod
+    def compress(text):
+        return zlib.compress(text.encode("utf-8"), 6)
+
+    def __len__(self):
+        return len(self.blobs)
+
+    @property
+    def size_bytes(self):
+        return sum(len(blob) for blob in self.blobs)
+
+    def page(self, i):
+        return zlib.decompress(self.blobs[i]).decode("utf-8")
+
+    def iter_pages(self):
+        for i in range(len(self.blobs)):
+            yield self.page(i)
+
+    def text(self):
+        """The whole document as one string; build it only where it is needed (e.g. indexing)."""
+        return "\n".join(page for page in self.iter_pages() if page)
+
+    def to_bytes(self):
+        header = struct.pack("<III", len(self.blobs), self.total_pages, int(self.truncated))
+        lengths = struct.pack(f"<{len(self.blobs)}I", *(len(blob) for blob in self.blobs))
+        return header + lengths + b"".join(self.blobs)
+
+    @classmethod
+    def from_bytes(cls, data):
+        count, total_pages, truncated = struct.unpack_from("<III", data)
+        lengths = struct.unpack_from(f"<{count}I", data, 12)
+        blobs, offset = [], 12 + 4 * count
+        for length in lengths:
+            blobs.append(data[offset:offset + length])
+            offset += length
+        return cls(blobs, total_pages, bool(truncated))
+
+
+class PdfTextCache:
+    """LRU cache of extracted PDF pages keyed by file content hash.
+
+    Entries are `PdfPages` and are bounded by their total compressed size
+    (`max_bytes`). When `cache_dir` is set, pages are also written there so
+    they survive server restarts and entries evicted from memory can be
+    reloaded without re-parsing.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+    def _disk_path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.pages")
+
+    def get(self, digest):
+        """Returns cached `PdfPages` for `digest`, or None if it has never been extracted."""
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.stats["hits"] += 1
+                return self._entries[digest][0]
+
+        if self.cache_dir and os.path.exists(self._disk_path(digest)):
+            with open(self._disk_path(digest), "rb") as f:
+                pages = PdfPages.from_bytes(f.read())
+            self.stats["disk_hits"] += 1
+            self._remember(digest, pages)
+            return pages
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, digest, pages):
+        if self.cache_dir:
+            tmp_path = self._disk_path(digest) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(pages.to_bytes())
+            os.replace(tmp_path, self._disk_path(digest))
+        self._remember(digest, pages)
+
+    def _remember(self, digest, pages):
+        size = pages.size_bytes
+        if size > self.max_bytes:
+            return  # Too large for memory; served from disk (if enabled) instead
+        with self._lock:
+            if digest in self._entries:
+                self._size -= self._entries.pop(digest)[1]
+            self._entries[digest] = (pages, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.stats["evictions"] += 1
+
+
+class PdfExtractor:
+    """Parses uploaded PDFs on a bounded process pool, `pages_per_task` pages per task.
+
+    Parsing runs outside the Streamlit process's GIL, so one user's large
+    upload does not stall the other sessions. Each file is limited to
+    `max_pages` pages and `max_bytes` bytes, and a batch to `timeout`
+    seconds; whatever was extracted when a limit is hit is returned (and
+    cached) as a truncated result. With `max_workers=0` pages are parsed in
+    the calling thread. A file uploaded more than once in a batch is parsed
+    once.
+    """
+
+    def __init__(self, max_workers=2, pages_per_task=16, max_pages=500, max_bytes=50 * 1024 * 1024,
+                 timeout=60.0, cache=None):
+        self.max_workers = max_workers
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.cache = cache
+        self._executor = self._new_executor() if max_workers else None
+        self.stats = {"files": 0, "cached": 0, "duplicates": 0, "pages": 0, "truncated": 0, "skipped": 0}
+
+    def stopped_early(self, pages):
+        """True when `pages` was cut short by the time limit rather than by `max_pages`."""
+        return pages.truncated and 0 < pages.total_pages and len(pages) < min(pages.total_pages, self.max_pages)
+
+    def _new_executor(self):
+        # Streamlit runs app.py as __main__, and "spawn"/"forkserver" workers would re-run it on start-up.
+        # Forked workers begin as a copy of the server instead; PyPDF2 is imported first so they never
+        # need the import lock another thread might have held at fork time.
+        import PyPDF2  # noqa: F401
+
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context(method))
+
+    def _run_tasks(self, tasks, deadline, progress):
+        """Runs `(path, start, stop)` tasks and returns {path: {page_number: blob}} for the pages that finished."""
+        results = {path: {} for path, _, _ in tasks}
+        if self._executor is None:
+            for path, start, stop in tasks:
+                results[path].update(extract_page_range(path, start, stop, deadline))
+                progress(sum(len(pages) for pages in results.values()))
+            return results
+
+        try:
+            futures = {self._executor.submit(extract_page_range, path, start, stop, deadline): path
+                       for path, start, stop in tasks}
+        except BrokenProcessPool:
+            self._executor = self._new_executor()  # A worker died (e.g. out of memory); start a fresh pool
+            return results
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.time()) + 1.0,
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break  # Past the deadline: keep what finished, drop the rest
+            for future in done:
+                if future.exception() is None:
+                    results[futures[future]].update(future.result())
+                elif isinstance(future.exception(), BrokenProcessPool):
+                    self._executor = self._new_executor()
+                    pending = set()
+                    break
+            progress(sum(len(pages) for pages in results.values()))
+        for future in pending:
+            future.cancel()
+        return results
+
+    def extract(self, pdf_files, progress=None, reparse=()):
+        """Returns one `ExtractedPdf` per file.
+
+        `status` is "cached", "complete", "truncated" (a page or time limit was
+        hit) or "skipped" (over the byte limit or unreadable). The page and byte
+        limits apply to each file on its own. Truncated results are cached like
+        complete ones, so a document that timed out is only parsed again when its
+        digest is passed in `reparse`. `progress` is called with
+        (pages_done, pages_total) while parsing runs.
+        """
+        started = time.time()
+        deadline = started + self.timeout
+        progress = progress or (lambda done, total: None)
+        results, to_parse, duplicates = [], [], []
+        first_with_digest = {}
+
+        with tempfile.TemporaryDirectory(prefix="pdf-extract-") as tmp_dir:
+            for pdf_file in pdf_files:
+                self.stats["files"] += 1
+                digest = file_digest(pdf_file)
+                if digest in first_with_digest:
+                    self.stats["duplicates"] += 1
+                    results.append(ExtractedPdf(pdf_file.name, digest, None, None))
+                    duplicates.append((len(results) - 1, first_with_digest[digest]))
+                    continue
+                first_with_digest[digest] = len(results)
+                cached = self.cache.get(digest) if self.cache is not None and digest not in reparse else None
+                if cached is not None:
+                    self.stats["cached"] += 1
+                    results.append(ExtractedPdf(pdf_file.name, digest, cached, "cached"))
+                    continue
+
+                size = file_size(pdf_file)
+                try:
+                    total_pages = count_pages(pdf_file) if size <= self.max_bytes else None
+                except Exception:
+                    total_pages = None
+                pdf_file.seek(0)
+                if total_pages is None:
+                    self.stats["skipped"] += 1
+                    results.append(ExtractedPdf(pdf_file.name, digest, PdfPages([], 0, True), "skipped"))
+                    continue
+                page_budget = min(total_pages, self.max_pages)
+
+                # Workers read the upload from a temporary file instead of receiving its bytes per task
+                path = os.path.join(tmp_dir, f"{digest}.pdf")
+                with open(path, "wb") as f:
+                    f.write(pdf_file.read())
+                pdf_file.seek(0)
+                results.append(ExtractedPdf(pdf_file.name, digest, None, None))
+                to_parse.append((len(results) - 1, path, total_pages, page_budget))
+
+            tasks = [(path, start, min(start + self.pages_per_task, page_budget))
+                     for _, path, _, page_budget in to_parse
+                     for start in range(0, page_budget, self.pages_per_task)]
+            pages_total = sum(page_budget for _, _, _, page_budget in to_parse)
+            if tasks:
+                progress(0, pages_total)
+                pages_by_path = self._run_tasks(tasks, deadline, lambda done: progress(done, pages_total))
+            else:
+                pages_by_path = {}
+
+        for index, path, total_pages, page_budget in to_parse:
+            extracted = pages_by_path.get(path, {})
+            # Pages after the first missing one are dropped so a truncated document stays contiguous
+            blobs = []
+            while len(blobs) in extracted:
+                blobs.append(extracted[len(blobs)])
+            truncated = len(blobs) < total_pages
+            pages = PdfPages(blobs, total_pages, truncated)
+            self.stats["pages"] += len(blobs)
+            if self.cache is not None:
+                self.cache.put(results[index].digest, pages)
+            if truncated:
+                self.stats["truncated"] += 1
+            results[index] = results[index]._replace(pages=pages, status="truncated" if truncated else "complete")
+        for index, first in duplicates:
+            results[index] = results[index]._replace(pages=results[first].pages, status=results[first].status)
+        return results
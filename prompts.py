@@ -0,0 +1,101 @@
+from knowledge_base import KnowledgeBase
+
+# ✅ **Knowledge Base: the facts below are generated from knowledge_base.json**
+KNOWLEDGE_BASE = KnowledgeBase.load()
+
+# ✅ **School Chatbot System Prompt**
+SCHOOL_SYSTEM_PROMPT_TEMPLATE = """You are an intelligent and friendly CIT University (Cebu Institute of Technology) Universal Assistant Chatbot.
+
+## Your Role:
+- Provide helpful information about CIT University to students, teachers, and staff
+- Answer questions about programs, admissions, scholarships, and campus life
+- Help with academic matters, assignments, and learning support
+- Assist teachers and staff with school policies, procedures, and administrative matters
+- Maintain a professional and welcoming tone
+- Be adaptive to the user's role (Student, Teacher, or Staff)
+
+{knowledge_base}
+
+## Important Guidelines:
+- Always be helpful, professional, and courteous
+- If you don't have specific information, direct users to contact the appropriate office
+- For Students: Encourage academic success and school involvement
+- For Teachers/Staff: Provide information about policies, procedures, and professional matters
+- Be welcoming and supportive to all users
+- Do not provide false information about programs or policies
+"""
+SCHOOL_SYSTEM_PROMPT = SCHOOL_SYSTEM_PROMPT_TEMPLATE.format(knowledge_base=KNOWLEDGE_BASE.render_sections())
+
+# ✅ **Role-Specific System Prompts**
+ROLE_SPECIFIC_PROMPTS = {
+    "Student": """
+## Additional Guidelines for Students:
+- Help with schoolwork, assignments, and academic questions
+- Provide study tips and learning strategies
+- Direct to academic support services
+- Encourage participation in school activities
+- Provide information about student services and resources
+- Help navigate the enrollment and registration process
+""",
+    "Teacher": """
+## Additional Guidelines for Teachers:
+- Provide information about school policies and procedures
+- Help with administrative and classroom management matters
+- Assist with professional development information
+- Provide guidance on leave procedures and HR policies
+- Help with curriculum and teaching resources
+- Support with school events and activities coordination
+""",
+    "Staff": """
+## Additional Guidelines for Staff:
+- Provide information about school administrative procedures
+- Help with HR-related questions and policies
+- Assist with workplace matters and staff services
+- Direct to appropriate departments for specific requests
+- Provide information about staff benefits and opportunities
+- Help with facility and operational matters
+"""
+}
+
+
+# ✅ **Static system instruction per role, built once at import**
+SYSTEM_INSTRUCTIONS = {
+    role: SCHOOL_SYSTEM_PROMPT + role_prompt for role, role_prompt in ROLE_SPECIFIC_PROMPTS.items()
+}
+DEFAULT_ROLE = "Student"
+
+# Only the per-turn parts are formatted on each request
+NEWS_SECTION = "## Recent News & Updates:\n{items}\n\n"
+SITE_SECTION = "## From the CIT Website:\n{pages}\n\n"
+FACTS_SECTION = "## Relevant CIT Facts:\n{facts}\n\n"
+PDF_SECTION = "## Relevant Excerpts from Uploaded PDFs:\n{context}\n\n"
+HISTORY_SECTION = "## Conversation So Far:\n{history}\n\n"
+TURN_TEMPLATE = "{sections}---\n\nUser Role: {role}\n\n{role}: {message}\nAssistant:"
+
+
+def system_instruction_for(user_role):
+    return SYSTEM_INSTRUCTIONS.get(user_role, SYSTEM_INSTRUCTIONS[DEFAULT_ROLE])
+
+
+def build_turn_prompt(user_message, user_role="Student", news=(), pdf_context="", history="", facts="", site_pages=()):
+    """Formats the dynamic part of a request; the static part is sent as `system_instruction`."""
+    sections = []
+    if facts:
+        sections.append(FACTS_SECTION.format(facts=facts))
+    if news:
+        sections.append(NEWS_SECTION.format(items="\n".join(f"- {item}" for item in news)))
+    if site_pages:
+        sections.append(SITE_SECTION.format(
+            pages="\n".join(f"- {page.title} ({page.url}): {page.snippet}" for page in site_pages)
+        ))
+    if pdf_context:
+        sections.append(PDF_SECTION.format(context=pdf_context))
+    if history:
+        sections.append(HISTORY_SECTION.format(history=history))
+    return TURN_TEMPLATE.format(sections="".join(sections), role=user_role, message=user_message)
+
+
+def build_role_models(model_factory, model_name):
+    """Creates one model per role with its system instruction attached."""
+    return {role: model_factory(model_name, system_instruction=instruction)
+            for role, instruction in SYSTEM_INSTRUCTIONS.items()}
@@ -0,0 +1,171 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+CacheEntry = namedtuple("CacheEntry", ["key", "role", "query", "response", "version", "created_at"])
+
+PUNCTUATION_RE = re.compile(r"[^\w\s]")
+FILLER_WORDS = {"please", "pls", "hi", "hello", "hey", "can", "could", "you", "tell", "me", "i", "the", "a", "an", "is",
+                "what", "whats", "where", "how", "do", "does", "to", "for", "of", "my", "our", "us", "know"}
+# Words that do not change what is asked; all other words are part of the cache key
+FUNCTION_WORDS = FILLER_WORDS | {"are", "am", "was", "were", "be", "there", "any", "in", "on", "at", "and", "or", "with",
+                                 "about", "it", "this", "that", "get", "your"}
+
+
+def normalize_query(query):
+    """Lower-cases, strips punctuation and filler words so trivial rephrasings share a key."""
+    words = PUNCTUATION_RE.sub(" ", query.lower().replace("'", "").replace("’", "")).split()
+    kept = [word for word in words if word not in FILLER_WORDS]
+    return " ".join(kept or words)
+
+
+def content_terms(normalized):
+    """The words of a normalized question that carry its meaning, with plural "s" dropped."""
+    return {word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in normalized.split() if word not in FUNCTION_WORDS}
+
+
+def cache_version(*parts):
+    """Fingerprint of everything an answer depends on besides the question (role prompt, news...)."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class MemoryCacheBackend:
+    """Process-local backend; entries are kept in least-recently-used order."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, entry):
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+
+    def touch(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def evict(self, max_entries):
+        evicted = 0
+        with self._lock:
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        return evicted
+
+
+class SQLiteCacheBackend:
+    """SQLite backend, so cached answers survive restarts and can be shared by processes on one host."""
+
+    def __init__(self, path="response_cache.sqlite3"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, role TEXT, query TEXT, response TEXT, version TEXT, created_at REAL, "
+                "last_used REAL)"
+            )
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, role, query, response, version, created_at FROM response_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return CacheEntry(*row) if row else None
+
+    def put(self, entry):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, role, query, response, version, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*entry, time.time()),
+            )
+
+    def touch(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def evict(self, max_entries):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (max_entries,),
+            )
+            return cursor.rowcount
+
+
+class ResponseCache:
+    """Cache of model answers keyed by role and the content words of the question.
+
+    Questions that differ only in filler words, word order, punctuation or a
+    plural "s" share an entry, so a lookup is a single key read. Any other
+    difference in wording is a miss: "nursing scholarships" and "engineering
+    scholarships", or "room 301" and "room 302", need different answers.
+    Entries expire after `ttl` seconds and are dropped as soon as they are
+    found with a different `version`, e.g. after the news or role prompt changed.
+    """
+
+    def __init__(self, backend=None, ttl=3600.0, max_entries=1000, clock=time.time):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(role, normalized):
+        return f"{role}:{' '.join(sorted(content_terms(normalized))) or normalized}"
+
+    def _usable(self, entry, version):
+        if entry.version != version or self._clock() - entry.created_at > self.ttl:
+            self.backend.delete(entry.key)
+            self.stats["invalidations"] += 1
+            return False
+        return True
+
+    def lookup(self, role, query, version):
+        """Returns a cached answer for `query`, or None on a miss."""
+        entry = self.backend.get(self._key(role, normalize_query(query)))
+        if entry is not None and self._usable(entry, version):
+            self.backend.touch(entry.key)
+            self.stats["hits"] += 1
+            return entry.response
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, role, query, version, response):
+        normalized = normalize_query(query)
+        self.backend.put(CacheEntry(self._key(role, normalized), role, normalized, response, version, self._clock()))
+        self.stats["stores"] += 1
+        self.stats["evictions"] += self.backend.evict(self.max_entries)
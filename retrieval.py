@@ -0,0 +1,145 @@
+import re
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+Chunk = namedtuple("Chunk", ["id", "source", "text"])
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+def chunk_text(text, source, chunk_words=180, overlap_words=30):
+    """Splits `text` into overlapping word windows labelled `source#n`."""
+    words = text.split()
+    step = max(1, chunk_words - overlap_words)
+    chunks = []
+    for n, start in enumerate(range(0, max(len(words) - overlap_words, 1), step)):
+        chunk_words_slice = words[start:start + chunk_words]
+        if chunk_words_slice:
+            chunks.append(Chunk(f"{source}#{n}", source, " ".join(chunk_words_slice)))
+    return chunks
+
+
+class HashingEmbedder:
+    """Offline bag-of-words embedder using the hashing trick.
+
+    Produces raw term counts; `VectorIndex` applies IDF weighting and
+    normalisation on top, which gives TF-IDF cosine similarity.
+    """
+
+    sparse_counts = True
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _bucket_ids(self, text):
+        return [zlib.crc32(word.encode()) % self.dim for word in WORD_RE.findall(text.lower())]
+
+    def embed(self, texts, task="document"):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            bucket_ids = self._bucket_ids(text)
+            if bucket_ids:
+                vectors[row] = np.bincount(bucket_ids, minlength=self.dim)
+        return vectors
+
+
+class GeminiEmbedder:
+    """Embeds text with the Gemini embedding API (requires network and an API key)."""
+
+    sparse_counts = False
+
+    def __init__(self, model="models/text-embedding-004", batch_size=100):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts, task="document"):
+        import google.generativeai as genai
+
+        task_type = "retrieval_document" if task == "document" else "retrieval_query"
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = list(texts[start:start + self.batch_size])
+            result = genai.embed_content(model=self.model, content=batch, task_type=task_type)
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+
+class VectorIndex:
+    """In-memory cosine-similarity index over text chunks, stored as one NumPy matrix."""
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.chunks = []
+        self._counts = None
+        self._matrix = None
+        self._idf = None
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def add(self, chunks):
+        chunks = list(chunks)
+        if not chunks:
+            return
+        vectors = self.embedder.embed([chunk.text for chunk in chunks], task="document")
+        self.chunks.extend(chunks)
+        self._counts = vectors if self._counts is None else np.vstack([self._counts, vectors])
+        self._reweight()
+
+    def _reweight(self):
+        if self.embedder.sparse_counts:
+            document_frequency = np.count_nonzero(self._counts, axis=0)
+            self._idf = (np.log((1 + len(self.chunks)) / (1 + document_frequency)) + 1).astype(np.float32)
+            weighted = np.log1p(self._counts) * self._idf
+        else:
+            weighted = self._counts
+        norms = np.linalg.norm(weighted, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._matrix = weighted / norms
+
+    def search(self, query, k=5):
+        """Returns up to `k` (score, chunk) pairs, best first."""
+        if not self.chunks:
+            return []
+        query_vector = self.embedder.embed([query], task="query")[0]
+        if self.embedder.sparse_counts:
+            query_vector = np.log1p(query_vector) * self._idf
+        norm = np.linalg.norm(query_vector)
+        if norm == 0:
+            return []
+        scores = self._matrix @ (query_vector / norm)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top if scores[i] > 0]
+
+
+def build_index(documents, embedder=None, chunk_words=180, overlap_words=30):
+    """Builds a VectorIndex from `(source, text)` pairs."""
+    index = VectorIndex(embedder)
+    chunks = []
+    for source, text in documents:
+        chunks.extend(chunk_text(text, source, chunk_words, overlap_words))
+    index.add(chunks)
+    return index
+
+
+def select_context(index, query, k=5, token_budget=1500):
+    """Returns (context_text, chunk_ids) for the top-k chunks that fit in `token_budget`."""
+    selected = []
+    used_tokens = 0
+    for _, chunk in index.search(query, k):
+        chunk_tokens = estimate_tokens(chunk.text)
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += chunk_tokens
+    context = "\n\n".join(f"[{chunk.id}]\n{chunk.text}" for chunk in selected)
+    return context, [chunk.id for chunk in selected]
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+
+from conversation import Conversation
+
+COMPRESS_MIN_BYTES = 512
+OWNER_FIELD = "__owner__"
+
+
+def new_session_id():
+    return secrets.token_urlsafe(24)
+
+
+def _to_json(value):
+    """JSON-ready copy of `value`; dicts with non-string keys (e.g. chat indexes) become {"__items__": [...]}
+    and Conversations {"__conversation__": state}."""
+    if isinstance(value, Conversation):
+        return {"__conversation__": value.to_state()}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: _to_json(item) for key, item in value.items()}
+        return {"__items__": [[_to_json(key), _to_json(item)] for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict) and set(value) == {"__items__"}:
+        return {tuple(key) if isinstance(key, list) else key: item for key, item in value["__items__"]}
+    if isinstance(value, dict) and set(value) == {"__conversation__"}:
+        return Conversation.from_state(value["__conversation__"])
+    return value
+
+
+def conversation_versions(value):
+    """Versions of the Conversations `value` consists of, or None if it holds anything else."""
+    if isinstance(value, Conversation):
+        return (value.version,)
+    if isinstance(value, list) and value and all(isinstance(item, Conversation) for item in value):
+        return tuple(item.version for item in value)
+    return None
+
+
+def dumps(value):
+    return json.dumps(_to_json(value), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def encode(raw):
+    """Field blob: b"j" + JSON, or b"z" + zlib-compressed JSON for larger values."""
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(raw, 6)
+    return b"j" + raw
+
+
+def unpack(blob):
+    return zlib.decompress(blob[1:]) if blob[:1] == b"z" else blob[1:]
+
+
+def loads(raw):
+    return json.loads(raw.decode("utf-8"), object_hook=_from_json)
+
+
+class MemorySessionBackend:
+    """Process-local backend: sessions only survive reruns and reloads on the same server process."""
+
+    def __init__(self, clock=time.time):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[1] <= self._clock():
+                self._sessions.pop(session_id, None)
+                return {}
+            return dict(entry[0])
+
+    def save(self, session_id, changed, deleted, ttl):
+        with self._lock:
+            fields = self._sessions.get(session_id, ({}, 0))[0]
+            fields.update(changed)
+            for field in deleted:
+                fields.pop(field, None)
+            self._sessions[session_id] = (fields, self._clock() + ttl)
+            now = self._clock()
+            for expired in [sid for sid, (_, expires_at) in self._sessions.items() if expires_at <= now]:
+                del self._sessions[expired]
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite file, shared by server processes on one host (WAL mode, one row per field)."""
+
+    def __init__(self, path="sessions.sqlite3", clock=time.time):
+        self._clock = clock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, expires_at REAL);"
+                "CREATE TABLE IF NOT EXISTS session_fields ("
+                "session_id TEXT, field TEXT, value BLOB, PRIMARY KEY (session_id, field));"
+            )
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None or row[0] <= self._clock():
+                return {}
+            rows = self._conn.execute(
+                "SELECT field, value FROM session_fields WHERE session_id = ?", (session_id,)
+            ).fetchall()
+        return {field: bytes(value) for field, value in rows}
+
+    def save(self, session_id, changed, deleted, ttl):
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?)", (session_id, now + ttl))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO session_fields VALUES (?, ?, ?)",
+                [(session_id, field, value) for field, value in changed.items()],
+            )
+            self._conn.executemany(
+                "DELETE FROM session_fields WHERE session_id = ? AND field = ?",
+                [(session_id, field) for field in deleted],
+            )
+            self._conn.execute(
+                "DELETE FROM session_fields WHERE session_id IN (SELECT id FROM sessions WHERE expires_at <= ?)", (now,)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+
+    def delete(self, session_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM session_fields WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+class RedisSessionBackend:
+    """One Redis hash per session (`{prefix}{id}`), expiring after `ttl` idle seconds.
+
+    Works with any Redis-protocol server (Redis, Valkey, KeyDB, ...); needs the
+    optional `redis` package.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", prefix="cit-chatbot:session:", client=None):
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def load(self, session_id):
+        return {field.decode("utf-8"): value for field, value in self.client.hgetall(self.prefix + session_id).items()}
+
+    def save(self, session_id, changed, deleted, ttl):
+        key = self.prefix + session_id
+        pipeline = self.client.pipeline()
+        if changed:
+            pipeline.hset(key, mapping=changed)
+        if deleted:
+            pipeline.hdel(key, *deleted)
+        pipeline.expire(key, int(ttl))
+        pipeline.execute()
+
+    def delete(self, session_id):
+        self.client.delete(self.prefix + session_id)
+
+
+class SessionStateSync:
+    """Mirrors selected `st.session_state` keys to a shared backend so any replica can serve the session.
+
+    Each key is stored as its own field, serialized as compact (and, when
+    large, compressed) JSON. `save` only writes the fields whose serialized
+    value changed since the last save or restore, and deletes the fields of
+    keys that were removed. Keys holding Conversations are only serialized
+    when a conversation's `version` moved, so a rerun that changed no chat
+    does not decompress every message. Untouched sessions are re-saved at most every
+    `ttl / 4` seconds to keep them from expiring.
+
+    The session id is not a credential: with an `owner` (the signed-in user's
+    uid), the stored session is only restored for that owner, and anyone else
+    presenting the id starts a new session instead.
+    """
+
+    def __init__(self, backend, keys, ttl=86400.0, session_id=None, owner=None, clock=time.time):
+        self.backend = backend
+        self.keys = tuple(keys)
+        self.ttl = ttl
+        self.session_id = session_id
+        self.owner = owner
+        self.restored = False
+        self._clock = clock
+        self._digests = {}
+        self._versions = {}
+        self._saved_at = None
+        self.stats = {"saves": 0, "fields_written": 0, "fields_deleted": 0, "bytes_written": 0, "restored_fields": 0,
+                      "rejected": 0}
+
+    def restore(self, state):
+        """Copies the stored fields into `state`; returns how many were restored."""
+        if self.session_id is None:
+            return 0
+        stored = self.backend.load(self.session_id)
+        if self.owner is not None and stored.get(OWNER_FIELD) != self.owner.encode("utf-8"):
+            # Unknown, expired or someone else's: never write into an id this browser was handed
+            self.stats["rejected"] += bool(stored)
+            self.session_id = None
+            return 0
+        fields = {key: blob for key, blob in stored.items() if key in self.keys}
+        for key, blob in fields.items():
+            raw = unpack(blob)
+            state[key] = loads(raw)
+            self._digests[key] = hashlib.blake2b(raw, digest_size=16).digest()
+            self._versions[key] = conversation_versions(state[key])
+        self.restored = bool(fields)
+        self._saved_at = self._clock()
+        self.stats["restored_fields"] += len(fields)
+        return len(fields)
+
+    def save(self, state):
+        """Writes the changed keys of `state`; returns (fields_written, fields_deleted)."""
+        if self.session_id is None:
+            return 0, 0
+        changed, deleted = {}, []
+        for key in self.keys:
+            if key in state:
+                versions = conversation_versions(state[key])
+                if versions is not None and self._versions.get(key) == versions:
+                    continue
+                raw = dumps(state[key])
+                digest = hashlib.blake2b(raw, digest_size=16).digest()
+                self._versions[key] = versions
+                if self._digests.get(key) != digest:
+                    changed[key] = encode(raw)
+                    self._digests[key] = digest
+            elif self._digests.pop(key, None) is not None:
+                self._versions.pop(key, None)
+                deleted.append(key)
+
+        now = self._clock()
+        if changed or deleted or self._saved_at is None or now - self._saved_at > self.ttl / 4:
+            fields = dict(changed, **{OWNER_FIELD: self.owner.encode("utf-8")}) if self.owner is not None else changed
+            self.backend.save(self.session_id, fields, deleted, self.ttl)
+            self._saved_at = now
+            self.stats["saves"] += 1
+            self.stats["fields_written"] += len(changed)
+            self.stats["fields_deleted"] += len(deleted)
+            self.stats["bytes_written"] += sum(len(blob) for blob in changed.values())
+        return len(changed), len(deleted)
+
+    def clear(self):
+        """Deletes the stored session; the next `save` needs a new `session_id`."""
+        if self.session_id is not None:
+            self.backend.delete(self.session_id)
+        self.session_id = None
+        self._digests.clear()
+        self._versions.clear()
+        self._saved_at = None
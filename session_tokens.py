@@ -0,0 +1,304 @@
+import hashlib
+import heapq
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+def _hash_key(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def firebase_verify_id_token(id_token):
+    """`firebase_admin.auth.verify_id_token`; the SDK keeps Google's public certs for as long as their Cache-Control allows."""
+    from firebase_admin import auth
+
+    return auth.verify_id_token(id_token)
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens and keeps the decoded claims until the token's own `exp`.
+
+    A session's token is checked against Google's public keys once; every later
+    rerun that presents the same token is a dictionary lookup. `verify` can be
+    replaced by a stub (or run against the Auth emulator) in tests.
+    """
+
+    def __init__(self, verify=None, max_entries=10000, clock=time.time):
+        self._verify = verify or firebase_verify_id_token
+        self.max_entries = max_entries
+        self._clock = clock
+        self._claims = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "verifications": 0, "failures": 0}
+
+    def verify(self, id_token):
+        """Returns the token's claims or raises whatever the underlying verifier raises."""
+        with self._lock:
+            claims = self._claims.get(id_token)
+            if claims is not None and claims["exp"] > self._clock():
+                self._claims.move_to_end(id_token)
+                self.stats["hits"] += 1
+                return claims
+            self._claims.pop(id_token, None)
+
+        try:
+            claims = self._verify(id_token)
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        with self._lock:
+            self.stats["verifications"] += 1
+            self._claims[id_token] = claims
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+        return claims
+
+
+class MemoryRememberStore:
+    """Process-local "remember me" records, keyed by the hash of the key handed to the browser."""
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def get(self, key_hash):
+        with self._lock:
+            return self._records.get(key_hash)
+
+    def put(self, key_hash, record):
+        with self._lock:
+            self._records[key_hash] = dict(record)
+
+    def delete(self, key_hash):
+        with self._lock:
+            self._records.pop(key_hash, None)
+
+
+class SQLiteRememberStore:
+    """"Remember me" records in SQLite so they survive restarts; only a hash of each key is stored."""
+
+    FIELDS = ("uid", "email", "id_token", "refresh_token", "expires_at", "remember_until")
+
+    def __init__(self, path="sessions.sqlite3", clock=time.time):
+        self._clock = clock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS remembered_sessions ("
+                "key_hash TEXT PRIMARY KEY, uid TEXT, email TEXT, id_token TEXT, refresh_token TEXT, "
+                "expires_at REAL, remember_until REAL)"
+            )
+
+    def get(self, key_hash):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.FIELDS)} FROM remembered_sessions WHERE key_hash = ?", (key_hash,)
+            ).fetchone()
+        return dict(zip(self.FIELDS, row)) if row else None
+
+    def put(self, key_hash, record):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO remembered_sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key_hash, *(record[field] for field in self.FIELDS)),
+            )
+            self._conn.execute("DELETE FROM remembered_sessions WHERE remember_until < ?", (self._clock(),))
+
+    def delete(self, key_hash):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM remembered_sessions WHERE key_hash = ?", (key_hash,))
+
+
+class TokenSession:
+    """Tokens of one signed-in browser session; only `id` is kept in `st.session_state`."""
+
+    def __init__(self, uid, email, id_token, refresh_token, expires_at, remember_hash=None, remember_until=None,
+                 remember=False, clock=time.time):
+        self.id = uuid.uuid4().hex
+        self.uid = uid
+        self.email = email
+        self.id_token = id_token
+        self.refresh_token = refresh_token
+        self.expires_at = expires_at
+        self.remember_hash = remember_hash
+        self.remember_until = remember_until
+        self.remember = remember
+        self.refresh_due = None
+        self.last_used = clock()
+        self.lock = threading.Lock()
+
+
+class TokenManager:
+    """Signs sessions in once, then keeps their ID tokens fresh in the background.
+
+    `current()` verifies a session's token from the verifier's claims cache, so
+    a rerun costs no network call. A daemon thread refreshes each token
+    `refresh_margin` seconds before it expires; sessions idle for longer than
+    `idle_timeout` are left alone and refreshed by `current()` when they return,
+    and sessions unused for `max_idle` seconds are dropped (their key can still
+    resume them). `sign_in` returns an opaque key that `resume()` later turns
+    back into a session without the password, in this or another server
+    process sharing the `remember_store`: the stored ID token is reused while
+    it is valid, otherwise a single refresh-token exchange replaces it. Each
+    key resumes once and is replaced by a new one, and the sign-in stays
+    resumable for `remember_ttl` seconds with `remember=True` and for
+    `session_ttl` seconds otherwise.
+    """
+
+    def __init__(self, verifier, refresh, remember_store=None, refresh_margin=300.0, idle_timeout=3600.0,
+                 remember_ttl=30 * 86400.0, session_ttl=86400.0, retry_delay=30.0, max_idle=86400.0, sweep_interval=60.0, clock=time.time):
+        self.verifier = verifier
+        self._refresh_call = refresh
+        self.remember_store = remember_store if remember_store is not None else MemoryRememberStore()
+        self.refresh_margin = refresh_margin
+        self.idle_timeout = idle_timeout
+        self.remember_ttl = remember_ttl
+        self.session_ttl = session_ttl
+        self.retry_delay = retry_delay
+        self.max_idle = max_idle
+        self.sweep_interval = sweep_interval
+        self._clock = clock
+        self._sessions = {}
+        self._swept_at = clock()
+        self._due = []
+        self._wakeup = threading.Condition()
+        self.stats = {"sign_ins": 0, "resumes": 0, "refreshes": 0, "refresh_errors": 0, "expired": 0,
+                      "evicted": 0}
+        threading.Thread(target=self._run, daemon=True, name="token-refresher").start()
+
+    # Scheduling
+    def _schedule(self, session, due):
+        with self._wakeup:
+            session.refresh_due = due
+            heapq.heappush(self._due, (due, session.id))
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._due or self._due[0][0] > self._clock():
+                    self._wakeup.wait(self._due[0][0] - self._clock() if self._due else None)
+                due, session_id = heapq.heappop(self._due)
+            session = self._sessions.get(session_id)
+            if session is None or session.refresh_due != due:
+                continue  # Signed out or already refreshed on another path
+            if self._clock() - session.last_used > self.idle_timeout:
+                continue  # Idle tabs are refreshed on their next rerun instead
+            try:
+                self._refresh(session)
+            except Exception:
+                self._schedule(session, self._clock() + self.retry_delay)
+
+    # Token lifecycle
+    def _refresh(self, session):
+        with session.lock:
+            try:
+                result = self._refresh_call(session.refresh_token)
+                claims = self.verifier.verify(result["idToken"])
+            except Exception:
+                self.stats["refresh_errors"] += 1
+                raise
+            session.id_token = result["idToken"]
+            session.refresh_token = result.get("refreshToken", session.refresh_token)
+            session.expires_at = claims["exp"]
+            self.stats["refreshes"] += 1
+        self._schedule(session, session.expires_at - self.refresh_margin)
+        if session.remember_hash is not None:
+            self._remember(session)
+        return claims
+
+    def _remember(self, session):
+        self.remember_store.put(session.remember_hash, {
+            "uid": session.uid, "email": session.email, "id_token": session.id_token,
+            "refresh_token": session.refresh_token, "expires_at": session.expires_at,
+            "remember_until": session.remember_until, "remember": session.remember,
+        })
+
+    def _evict_idle(self):
+        now = self._clock()
+        if now - self._swept_at < self.sweep_interval:
+            return
+        self._swept_at = now
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used > self.max_idle:
+                self._sessions.pop(session_id, None)
+                self.stats["evicted"] += 1
+
+    def _start(self, session):
+        self._evict_idle()
+        self._sessions[session.id] = session
+        self._schedule(session, session.expires_at - self.refresh_margin)
+        return session
+
+    def sign_in(self, user, remember=False):
+        """Starts a session from a Pyrebase sign-in response; returns `(session, key)` for a later `resume`."""
+        claims = self.verifier.verify(user["idToken"])
+        session = TokenSession(claims.get("uid", user["localId"]), user.get("email") or claims.get("email"),
+                               user["idToken"], user["refreshToken"], claims["exp"], clock=self._clock)
+        remember_key = secrets.token_urlsafe(32)
+        session.remember_hash = _hash_key(remember_key)
+        session.remember_until = self._clock() + (self.remember_ttl if remember else self.session_ttl)
+        session.remember = remember
+        self._remember(session)
+        self.stats["sign_ins"] += 1
+        return self._start(session), remember_key
+
+    def resume(self, remember_key):
+        """Rebuilds a session from a `sign_in` or `resume` key; returns `(session, key)` for the next `resume`.
+
+        The old key is deleted, so a copied key stops working once its owner
+        comes back. Returns `(None, None)` if the key is unknown or expired.
+        """
+        key_hash = _hash_key(remember_key)
+        record = self.remember_store.get(key_hash)
+        if record is None or record["remember_until"] < self._clock():
+            return None, None
+        self.remember_store.delete(key_hash)
+        new_key = secrets.token_urlsafe(32)
+        session = self.adopt(dict(record, remember_hash=_hash_key(new_key)))
+        if session is None:
+            return None, None
+        self._remember(session)
+        self.stats["resumes"] += 1
+        return session, new_key
+
+    def adopt(self, record):
+        """Continues a session from stored tokens; returns None if they no longer work."""
+        session = TokenSession(record["uid"], record["email"], record["id_token"], record["refresh_token"],
+                               record["expires_at"], remember_hash=record.get("remember_hash"),
+                               remember_until=record.get("remember_until"), remember=record.get("remember", False),
+                               clock=self._clock)
+        try:
+            if session.expires_at - self.refresh_margin > self._clock():
+                self.verifier.verify(session.id_token)
+            else:
+                self._refresh(session)
+        except Exception:
+            return None
+        return self._start(session)
+
+    def current(self, session_id):
+        """Verified claims for a live session, or None if the user has to sign in again."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        session.last_used = self._clock()
+        try:
+            if session.expires_at <= self._clock():
+                # The background refresh did not run in time (e.g. the process was suspended)
+                return self._refresh(session)
+            return self.verifier.verify(session.id_token)
+        except Exception:
+            self.stats["expired"] += 1
+            self._sessions.pop(session_id, None)
+            return None
+
+    def sign_out(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None and session.remember_hash is not None:
+            self.remember_store.delete(session.remember_hash)
@@ -0,0 +1,309 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from news_cache import CircuitBreaker
+
+CRAWLER_USER_AGENT = "CITAssistantBot/1.0 (+https://cit.edu/)"
+
+# Pages the assistant may quote; only these URLs are ever fetched. The news page is left to NewsCache,
+# which already polls it
+CIT_SITE_PAGES = (
+    "https://cit.edu/scholarships/",
+    "https://cit.edu/admissions/",
+    "https://cit.edu/about/",
+    "https://cit.edu/academics/",
+    "https://cit.edu/student-services/",
+)
+
+SearchHit = namedtuple("SearchHit", ["url", "title", "snippet", "score"])
+
+QUERY_TOKEN_RE = re.compile(r"\w+")
+# Question words that would otherwise match every page
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "were", "has", "have", "had", "how", "what", "when", "where", "which", "who",
+    "whom", "why", "does", "did", "can", "could", "would", "should", "will", "there", "their", "they", "them", "this",
+    "that", "these", "those", "with", "from", "into", "about", "any", "some", "you", "your", "our", "his", "her", "its",
+    "not", "but", "all", "get", "tell", "know", "like", "please", "also", "than", "then", "just",
+}
+
+
+def parse_page(html, max_chars=200_000):
+    """Returns (title, text) of a page with scripts, navigation and footers removed."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    for element in soup(["script", "style", "noscript", "nav", "header", "footer", "form"]):
+        element.decompose()
+    body = soup.find("main") or soup.find("article") or soup.body or soup
+    text = " ".join(body.get_text(" ", strip=True).split())
+    return title, text[:max_chars]
+
+
+def fts_query(text, max_terms=12):
+    """An FTS5 MATCH expression OR-ing the quoted words of `text` (so user input cannot break the syntax),
+    without stopwords."""
+    terms = []
+    for token in QUERY_TOKEN_RE.findall(text.lower()):
+        if len(token) > 2 and token not in STOPWORDS and token not in terms:
+            terms.append(token)
+    return " OR ".join(f'"{term}"' for term in terms[:max_terms])
+
+
+class SiteIndex:
+    """Full-text index of crawled pages in a local SQLite file (FTS5, ranked with bm25).
+
+    `pages` keeps each URL's content hash and HTTP validators so the crawler
+    can skip unchanged pages; `generation` increases whenever indexed content
+    changes, so answers cached against an older snapshot can be invalidated.
+    """
+
+    def __init__(self, path="site_index.sqlite3"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, title TEXT, content_hash TEXT, etag TEXT, last_modified TEXT, "
+                "fetched_at REAL, changed_at REAL);"
+                "CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(url UNINDEXED, title, body);"
+                "CREATE TABLE IF NOT EXISTS index_meta (key TEXT PRIMARY KEY, value INTEGER);"
+                "INSERT OR IGNORE INTO index_meta VALUES ('generation', 0);"
+            )
+        self.stats = {"searches": 0, "hits": 0}
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._conn.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()[0]
+
+    def validators(self, url):
+        """Returns (content_hash, etag, last_modified) stored for `url`, or None if it was never indexed."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT content_hash, etag, last_modified FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+
+    def put(self, url, title, text, content_hash, etag=None, last_modified=None, fetched_at=None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM pages_fts WHERE url = ?", (url,))
+            self._conn.execute("INSERT INTO pages_fts (url, title, body) VALUES (?, ?, ?)", (url, title, text))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, title, content_hash, etag, last_modified, fetched_at, fetched_at),
+            )
+            self._conn.execute("UPDATE index_meta SET value = value + 1 WHERE key = 'generation'")
+
+    def touch(self, url, etag=None, last_modified=None, fetched_at=None):
+        """Records that `url` was revalidated without its content changing."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE url = ?",
+                (time.time() if fetched_at is None else fetched_at, etag, last_modified, url),
+            )
+
+    def remove(self, url):
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM pages WHERE url = ?", (url,)).rowcount
+            self._conn.execute("DELETE FROM pages_fts WHERE url = ?", (url,))
+            if deleted:
+                self._conn.execute("UPDATE index_meta SET value = value + 1 WHERE key = 'generation'")
+
+    def search(self, query, k=3, snippet_tokens=48, min_score=0.5):
+        """Returns up to `k` SearchHits for `query` scoring at least `min_score`, best match first, each with a
+        short snippet (pages matching only words found on most pages score near 0)."""
+        match = fts_query(query)
+        self.stats["searches"] += 1
+        if not match:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, title, snippet(pages_fts, 2, '', '', ' … ', ?), bm25(pages_fts, 0.0, 5.0, 1.0) AS rank "
+                "FROM pages_fts WHERE pages_fts MATCH ? ORDER BY rank LIMIT ?",
+                (snippet_tokens, match, k),
+            ).fetchall()
+        rows = [row for row in rows if -row[3] >= min_score]
+        if rows:
+            self.stats["hits"] += 1
+        return [SearchHit(url, title, snippet, -rank) for url, title, snippet, rank in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimiter:
+    """Spaces requests to the same host at least `interval` seconds apart, across threads."""
+
+    def __init__(self, interval=1.0, clock=time.monotonic, sleep=time.sleep):
+        self.interval = interval
+        self._clock = clock
+        self._sleep = sleep
+        self._next_at = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host, interval=None):
+        interval = self.interval if interval is None else interval
+        with self._lock:
+            now = self._clock()
+            start_at = max(now, self._next_at.get(host, now))
+            self._next_at[host] = start_at + interval
+        if start_at > now:
+            self._sleep(start_at - now)
+
+
+class SiteCrawler:
+    """Keeps a SiteIndex up to date with an allowlist of pages.
+
+    Pages are fetched concurrently (`max_workers` threads sharing one pooled
+    `requests.Session`), each host's robots.txt is honoured including its
+    Crawl-delay, and requests to a host are spaced by `min_interval` seconds.
+    Pages are revalidated with ETag/Last-Modified, and a 200 whose extracted
+    text hashes the same as before is not re-indexed.
+    """
+
+    def __init__(self, urls=CIT_SITE_PAGES, index=None, max_workers=4, min_interval=1.0, timeout=10.0,
+                 user_agent=CRAWLER_USER_AGENT, session=None, rate_limiter=None, breaker=None):
+        self.urls = list(urls)
+        self.index = index if index is not None else SiteIndex()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.user_agent = user_agent
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(1, max_workers))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+        self.session.headers.setdefault("User-Agent", user_agent)
+        self.rate_limiter = rate_limiter or RateLimiter(min_interval)
+        self.breaker = breaker or CircuitBreaker()
+        self._robots = {}
+        self._robots_lock = threading.Lock()
+        self._crawling = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"crawls": 0, "fetches": 0, "updated": 0, "unchanged": 0, "not_modified": 0,
+                      "removed": 0, "disallowed": 0, "errors": 0, "last_crawl_seconds": None}
+
+    def _robots_for(self, url):
+        """Returns (RobotFileParser, crawl_delay) for the host of `url`, fetched once per crawl."""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._robots_lock:
+            if origin not in self._robots:
+                self._robots[origin] = self._fetch_robots(origin, parts.netloc)
+            return self._robots[origin]
+
+    def _fetch_robots(self, origin, host):
+        parser = RobotFileParser(origin + "/robots.txt")
+        try:
+            self.rate_limiter.wait(host)
+            response = self.session.get(origin + "/robots.txt", timeout=self.timeout)
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.RequestException:
+            parser.disallow_all = True  # Unknown rules: do not crawl this host until the next run
+        return parser, parser.crawl_delay(self.user_agent)
+
+    def _fetch(self, url):
+        """Fetches and indexes one page; returns the name of the stats counter it falls under."""
+        robots, crawl_delay = self._robots_for(url)
+        if not robots.can_fetch(self.user_agent, url):
+            return "disallowed"
+
+        headers = {}
+        stored = self.index.validators(url)
+        if stored is not None:
+            _, etag, last_modified = stored
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        host = urlsplit(url).netloc
+        self.rate_limiter.wait(host, max(self.rate_limiter.interval, float(crawl_delay or 0)))
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            self.index.touch(url)
+            return "not_modified"
+        if response.status_code in (404, 410):
+            self.index.remove(url)
+            return "removed"
+        if response.status_code != 200:
+            raise requests.HTTPError(f"HTTP {response.status_code} from {url}")
+
+        title, text = parse_page(response.text)
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        if stored is not None and stored[0] == content_hash:
+            self.index.touch(url, etag, last_modified)
+            return "unchanged"
+        self.index.put(url, title, text, content_hash, etag, last_modified)
+        return "updated"
+
+    def _fetch_counted(self, url):
+        try:
+            outcome = self._fetch(url)
+        except Exception:
+            self.breaker.record_failure()
+            return "errors"
+        self.breaker.record_success()
+        return outcome
+
+    def crawl(self):
+        """Revalidates every allowlisted page once. Returns {outcome: count} for this run."""
+        if not self.breaker.allow() or not self._crawling.acquire(blocking=False):
+            return {}
+        started = time.perf_counter()
+        try:
+            self._robots = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="site-crawler") as pool:
+                outcomes = list(pool.map(self._fetch_counted, self.urls))
+        finally:
+            self._crawling.release()
+        counts = {}
+        for outcome in outcomes:
+            counts[outcome] = counts.get(outcome, 0) + 1
+            self.stats[outcome] += 1
+        self.stats["crawls"] += 1
+        self.stats["fetches"] += len(outcomes) - counts.get("disallowed", 0)
+        self.stats["last_crawl_seconds"] = time.perf_counter() - started
+        return counts
+
+    def start(self, interval=3600.0):
+        """Crawls now and then every `interval` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self.crawl()
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=run, name="site-crawler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
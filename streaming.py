@@ -0,0 +1,96 @@
+import time
+
+
+class StreamStats:
+    """Timing and size of one reply: prompt assembly, time-to-first-token and total latency (seconds)."""
+
+    def __init__(self):
+        self.started_at = None
+        self.first_token_at = None
+        self.finished_at = None
+        self.chunks = 0
+        self.characters = 0
+        self.cancelled = False
+        self.cache_hit = False
+        self.kb_hit = False
+        self.prompt_tokens = None
+        self.prompt_bytes = 0
+        self.assembly_seconds = 0.0
+        self.output_tokens = None
+        self.model_tier = None
+        self.escalated = False
+
+    def start(self):
+        # An escalated answer keeps the first attempt's start, so its latency includes the abandoned attempt
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+
+    def discard_output(self):
+        """Forgets the chunks of an abandoned attempt before the answer is streamed again by another model."""
+        self.first_token_at = None
+        self.chunks = 0
+        self.characters = 0
+        self.cancelled = False
+        self.output_tokens = None
+
+    def record_chunk(self, text):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.characters += len(text)
+
+    def record_usage(self, response):
+        """Copies token counts from a response's `usage_metadata`, when the backend reports them."""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, "prompt_token_count", None)
+            self.output_tokens = getattr(usage, "candidates_token_count", None)
+
+    def finish(self):
+        self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def total_time(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+def _chunk_text(chunk):
+    # Gemini raises ValueError for chunks without text parts (e.g. the final finish-reason chunk)
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+def stream_response(model, contents, generation_config=None, cancel_event=None, stats=None):
+    """Yields text chunks from `model.generate_content(..., stream=True)`.
+
+    Stops early when `cancel_event` is set or the consumer closes the
+    generator; either way `stats.cancelled` is set and timings are recorded.
+    """
+    stats = stats if stats is not None else StreamStats()
+    stats.start()
+    try:
+        response = model.generate_content(contents, generation_config=generation_config, stream=True)
+        for chunk in response:
+            if cancel_event is not None and cancel_event.is_set():
+                stats.cancelled = True
+                return
+            text = _chunk_text(chunk)
+            if text:
+                stats.record_chunk(text)
+                yield text
+        stats.record_usage(response)
+    except GeneratorExit:
+        stats.cancelled = True
+        raise
+    finally:
+        stats.finish()